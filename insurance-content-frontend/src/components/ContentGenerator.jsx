@@ -1,5 +1,5 @@
 import { useState, useEffect } from 'react';
-import { contentAPI } from '../lib/api';
+import { contentAPI, waitForJob } from '../lib/api';
 import { Button } from '@/components/ui/button';
 import { Input } from '@/components/ui/input';
 import { Label } from '@/components/ui/label';
@@ -81,9 +81,15 @@ const ContentGenerator = ({ onScheduleGenerated, onCancel }) => {
 
     try {
       const response = await contentAPI.generateSchedule(formData);
-      onScheduleGenerated(response.data.schedule);
+      const job = await waitForJob(response);
+      if (job) {
+        const scheduleResponse = await contentAPI.getSchedule(job.result.schedule_id);
+        onScheduleGenerated(scheduleResponse.data.schedule);
+      } else {
+        onScheduleGenerated(response.data.schedule);
+      }
     } catch (error) {
-      setError(error.response?.data?.error || 'Failed to generate content. Please try again.');
+      setError(error.response?.data?.error || error.job?.last_error || 'Failed to generate content. Please try again.');
     } finally {
       setLoading(false);
     }
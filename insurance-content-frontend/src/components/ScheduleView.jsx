@@ -1,5 +1,5 @@
 import { useState } from 'react';
-import { imagesAPI, contentAPI } from '../lib/api';
+import { imagesAPI, contentAPI, waitForJob } from '../lib/api';
 import { Button } from '@/components/ui/button';
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from '@/components/ui/card';
 import { Badge } from '@/components/ui/badge';
@@ -59,10 +59,14 @@ const ScheduleView = ({ schedule, onBack, onRefresh }) => {
     setError('');
 
     try {
-      await imagesAPI.generateAllImages(schedule.id);
+      const response = await imagesAPI.generateAllImages(schedule.id);
+      await waitForJob(response);
       onRefresh(); // Refresh the schedule to show the new images
     } catch (error) {
-      setError(error.response?.data?.error || 'Failed to generate images');
+      if (error.job) {
+        onRefresh(); // Images generated before the failure are kept
+      }
+      setError(error.response?.data?.error || error.job?.last_error || 'Failed to generate images');
     } finally {
       setLoading(false);
     }
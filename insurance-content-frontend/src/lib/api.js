@@ -64,6 +64,33 @@ export const imagesAPI = {
   downloadImage: (postId) => api.get(`/images/download-image/${postId}`),
 };
 
+// Jobs API calls
+export const jobsAPI = {
+  getJob: (jobId) => api.get(`/jobs/${jobId}`),
+  retryJob: (jobId) => api.post(`/jobs/${jobId}/retry`),
+};
+
+// Schedule and bulk image generation answer 202 with a background job; poll it until it finishes.
+// Returns the finished job, or null for a response that was already complete.
+export const waitForJob = async (response, interval = 2000) => {
+  if (response.status !== 202 || !response.data.job) {
+    return null;
+  }
+
+  let job = response.data.job;
+  while (job.status === 'queued' || job.status === 'running') {
+    await new Promise((resolve) => setTimeout(resolve, interval));
+    job = (await jobsAPI.getJob(job.id)).data.job;
+  }
+
+  if (job.status !== 'succeeded') {
+    const error = new Error(job.last_error || 'Job failed');
+    error.job = job;
+    throw error;
+  }
+  return job;
+};
+
 // Subscription API calls
 export const subscriptionAPI = {
   createCheckoutSession: (planData) => api.post('/subscription/create-checkout-session', planData),
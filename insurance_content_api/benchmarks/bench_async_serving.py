@@ -0,0 +1,166 @@
+"""Load test: sync WSGI workers vs. the ASGI serving mode under slow AI calls.
+
+Starts a fake OpenAI server whose completions take --upstream-delay seconds,
+then runs the API twice against it:
+  sync:  gunicorn with --sync-workers sync workers (src.app:create_app())
+  async: uvicorn with one worker (src.asgi:create_asgi_app)
+Each run registers --clients agents. Each agent fires one generate-schedule
+request at the same moment, while a reader polls GET /api/auth/me the way
+the dashboard does. Reports wall time for all generations and read latency.
+
+Usage (from insurance_content_api/, needs gunicorn and uvicorn installed):
+    python benchmarks/bench_async_serving.py --clients 64 --upstream-delay 1.0 --sync-workers 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+
+import requests
+import uvicorn
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def fake_openai(delay):
+    """ASGI app answering chat completions after `delay` seconds"""
+    posts = [{'post_text': f'Post {day}', 'image_description': 'Family at home',
+              'hashtags': ['#Insurance'], 'content_theme': 'general'} for day in range(1, 8)]
+    completion = json.dumps({
+        'id': 'chatcmpl-bench', 'object': 'chat.completion', 'created': 0, 'model': 'gpt-4',
+        'choices': [{'index': 0, 'finish_reason': 'stop',
+                     'message': {'role': 'assistant', 'content': json.dumps(posts)}}],
+        'usage': {'prompt_tokens': 50, 'completion_tokens': 50, 'total_tokens': 100}
+    }).encode()
+
+    async def app(scope, receive, send):
+        if scope['type'] != 'http':
+            return
+        while (await receive()).get('more_body'):
+            pass
+        await asyncio.sleep(delay)
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': [(b'content-type', b'application/json')]})
+        await send({'type': 'http.response.body', 'body': completion})
+
+    return app
+
+def start_fake_openai(delay):
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(fake_openai(delay), port=port, log_level='warning',
+                                           backlog=4096, limit_concurrency=None))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f'http://127.0.0.1:{port}/v1'
+
+def start_server(mode, port, env, sync_workers):
+    if mode == 'sync':
+        command = ['gunicorn', '--workers', str(sync_workers), '--timeout', '300', '--backlog', '4096',
+                   '--bind', f'127.0.0.1:{port}', 'src.app:create_app()']
+    else:
+        command = ['uvicorn', '--factory', 'src.asgi:create_asgi_app', '--port', str(port),
+                   '--log-level', 'warning', '--backlog', '4096']
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    base = f'http://127.0.0.1:{port}'
+    for _ in range(200):
+        try:
+            requests.get(f'{base}/api/health', timeout=1)
+            return process, base
+        except requests.RequestException:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f'{mode} server did not start')
+
+def register(base, index):
+    response = requests.post(f'{base}/api/auth/register', json={
+        'email': f'agent{index}@example.com', 'password': 'benchmark123',
+        'first_name': 'Bench', 'last_name': f'Agent{index}'
+    }, timeout=30)
+    response.raise_for_status()
+    # Production config sets Secure cookies, so carry the session cookie by hand over http
+    return {'Cookie': f"session={response.cookies['session']}"}
+
+def run(mode, args, upstream):
+    port = free_port()
+    env = dict(os.environ,
+               FLASK_CONFIG='production',
+               DATABASE_URL=f"sqlite:///{tempfile.mktemp(suffix='.db')}",
+               OPENAI_API_KEY='sk-bench', OPENAI_BASE_URL=upstream,
+               PASSWORD_HASH_METHOD='pbkdf2:sha256:1000', PASSWORD_HASH_WORKERS='0',
+               STRIPE_WEBHOOK_WORKERS='0',
+               JOB_QUEUE_MODE='inline')  # generate inside the request, as before the job queue
+    process, base = start_server(mode, port, env, args.sync_workers)
+
+    try:
+        sessions = [register(base, i) for i in range(args.clients)]
+        reader = register(base, 'reader')
+
+        statuses, read_latencies = {}, []
+        lock = threading.Lock()
+        done = threading.Event()
+        start_barrier = threading.Barrier(args.clients + 1)
+
+        def generate(headers):
+            start_barrier.wait()
+            response = requests.post(f'{base}/api/content/generate-schedule', headers=headers,
+                                     json={'insurance_types': ['final_expense'], 'tone': 'professional'},
+                                     timeout=600)
+            status = response.json()['job']['status'] if response.status_code == 202 else response.status_code
+            with lock:
+                statuses[status] = statuses.get(status, 0) + 1
+
+        def read():
+            while not done.is_set():
+                started = time.perf_counter()
+                requests.get(f'{base}/api/auth/me', headers=reader, timeout=600)
+                read_latencies.append(time.perf_counter() - started)
+                time.sleep(0.05)
+
+        threads = [threading.Thread(target=generate, args=(headers,)) for headers in sessions]
+        for thread in threads:
+            thread.start()
+        reader_thread = threading.Thread(target=read)
+
+        start_barrier.wait()
+        started = time.perf_counter()
+        reader_thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        done.set()
+        reader_thread.join()
+    finally:
+        process.terminate()
+        process.wait()
+
+    ms = sorted(latency * 1000 for latency in read_latencies)
+    p99 = ms[min(len(ms) - 1, int(len(ms) * 0.99))]
+    print(f"{mode:<6} {args.clients} generations in {elapsed:6.2f}s ({args.clients / elapsed:6.1f}/s)  "
+          f"statuses {statuses}  dashboard read p50 {statistics.median(ms):7.1f}ms p99 {p99:7.1f}ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=64)
+    parser.add_argument('--upstream-delay', type=float, default=1.0)
+    parser.add_argument('--sync-workers', type=int, default=4)
+    parser.add_argument('--modes', default='sync,async')
+    args = parser.parse_args()
+
+    upstream = start_fake_openai(args.upstream_delay)
+    for mode in args.modes.split(','):
+        run(mode, args, upstream)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Cold-start time of a worker: fresh interpreter -> create_app() -> first request.
+
+Each run is a new Python process, so nothing is shared between runs except
+the OS file cache (the first run is a warm-up and is not reported). Also
+reports which heavy SDKs ended up imported, and what importing them eagerly
+would have cost.
+
+Usage (from insurance_content_api/):
+    python benchmarks/bench_cold_start.py --runs 10 --config production
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ('openai', 'stripe', 'requests')
+
+BOOT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from src.app import create_app
+app = create_app(sys.argv[1])
+booted = time.perf_counter()
+app.test_client().get('/api/health')
+served = time.perf_counter()
+print(json.dumps({
+    'boot': booted - start,
+    'first_request': served - booted,
+    'loaded': [m for m in %r if m in sys.modules]
+}))
+""" % (HEAVY_MODULES,)
+
+SDK_SCRIPT = """
+import json, time
+start = time.perf_counter()
+import %s
+print(json.dumps({'sdk_import': time.perf_counter() - start}))
+""" % ', '.join(HEAVY_MODULES)
+
+def run_once(script, args, env):
+    output = subprocess.run([sys.executable, '-c', script] + args, cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def summarize(label, samples):
+    ms = sorted(s * 1000 for s in samples)
+    print(f"{label:<16} median {statistics.median(ms):7.1f}ms  min {ms[0]:7.1f}ms  max {ms[-1]:7.1f}ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--config', default='production')
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env['DATABASE_URL'] = f"sqlite:///{tempfile.mktemp(suffix='.db')}"
+
+    run_once(BOOT_SCRIPT, [args.config], env)  # warm the file cache
+    results = [run_once(BOOT_SCRIPT, [args.config], env) for _ in range(args.runs)]
+    sdk = [run_once(SDK_SCRIPT, [], env)['sdk_import'] for _ in range(args.runs)]
+
+    summarize('create_app()', [r['boot'] for r in results])
+    summarize('first request', [r['first_request'] for r in results])
+    summarize('eager SDKs', sdk)
+    print(f"SDKs loaded at boot: {', '.join(results[-1]['loaded']) or 'none'}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""Compliance scan throughput: one Aho-Corasick pass vs. one alternation regex of all phrases.
+
+Scans the post_text and image_description of generated-looking weeks (7
+posts each), as batch pre-generation would, with the configured phrase
+lists plus --extra-phrases synthetic ones to show how each approach scales
+with list size. The regex baseline is a single compiled
+\b(?:phrase1|phrase2|...)\b, longest phrases first, with the same
+whitespace and punctuation normalisation as the scanner.
+
+Usage (from insurance_content_api/):
+    python benchmarks/bench_compliance_scan.py --weeks 1000 --extra-phrases 0 500
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from src.config import config
+from src.services.compliance import _NORMALIZE, compliance_scanner
+
+SENTENCES = [
+    "Planning ahead is one of the kindest things you can do for the people you love.",
+    "A lot of folks ask me what happens to the house if something happens to them.",
+    "Final expense coverage helps your family focus on each other instead of the bills.",
+    "Annuities can turn savings into predictable income for retirement.",
+    "No pressure, just happy to answer questions over coffee this week.",
+    "This plan is risk-free and the returns are guaranteed!",
+    "Living benefits may help if you are diagnosed with a qualifying illness.",
+    "Open enrollment is a good time to review what your current plan covers.",
+]
+IMAGES = [
+    "A family laughing on a front porch at golden hour, warm tones",
+    "Grandparents reading with a grandchild on a sunny couch",
+    "A couple reviewing papers at a kitchen table with coffee, soft light",
+]
+
+def build_weeks(weeks, seed=7):
+    rng = random.Random(seed)
+    return [[{
+        'post_text': ' '.join(rng.choice(SENTENCES) for _ in range(4)),
+        'image_description': rng.choice(IMAGES)
+    } for _ in range(7)] for _ in range(weeks)]
+
+def synthetic_phrases(count, seed=11):
+    rng = random.Random(seed)
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    return [' '.join(''.join(rng.choice(letters) for _ in range(rng.randint(4, 9))) for _ in range(rng.randint(1, 3)))
+            for _ in range(count)]
+
+def alternation(phrases):
+    """One regex matching any phrase as whole words, any whitespace run standing for a space"""
+    ordered = sorted(phrases, key=len, reverse=True)  # the longest phrase wins at a position
+    return re.compile(r'\b(?:' + '|'.join(re.escape(phrase).replace(r'\ ', r'\s+') for phrase in ordered) + r')\b')
+
+def regex_scan(pattern, phrases, fields):
+    findings = []
+    for field, text in fields.items():
+        seen = set()
+        for match in pattern.finditer(text.lower().translate(_NORMALIZE)):
+            phrase = ' '.join(match.group().split())
+            if phrase not in seen:
+                seen.add(phrase)
+                findings.append((field, phrase, phrases[phrase], match.start()))
+    return findings
+
+def run(label, scan, weeks, chars):
+    start = time.perf_counter()
+    for week in weeks:
+        for post in week:
+            scan(post)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:>14}: {len(weeks) / elapsed:,.0f} weeks/s, {elapsed / len(weeks) * 1e6:.1f} us/week, "
+          f"{chars / elapsed / 1e6:.1f} MB/s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--weeks', type=int, default=1000)
+    parser.add_argument('--extra-phrases', type=int, nargs='+', default=[0, 500])
+    parser.add_argument('--insurance-type', default='annuities')
+    parser.add_argument('--state', default='NY')
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    app.config.from_object(config['testing'])
+    base_phrases = app.config['COMPLIANCE_PHRASES']
+    weeks = build_weeks(args.weeks)
+    chars = sum(len(post['post_text']) + len(post['image_description']) for week in weeks for post in week)
+
+    with app.app_context():
+        for extra in args.extra_phrases:
+            phrases = dict(base_phrases, all=dict(base_phrases['all'], warning=(
+                base_phrases['all']['warning'] + synthetic_phrases(extra))))
+            app.config['COMPLIANCE_PHRASES'] = phrases
+            compliance_scanner.reset()
+
+            start = time.perf_counter()
+            automaton = compliance_scanner.automaton(args.insurance_type, args.state)
+            compile_ms = (time.perf_counter() - start) * 1000
+            compiled = compliance_scanner._phrases(args.insurance_type, args.state.upper())
+            pattern = alternation(compiled)
+
+            print(f"{len(compiled)} phrases ({len(automaton.delta)} automaton states, compiled in {compile_ms:.1f} ms):")
+            run('aho-corasick', lambda post: compliance_scanner.scan(post, args.insurance_type, args.state),
+                weeks, chars)
+            run('regex', lambda post: regex_scan(pattern, compiled, post), weeks, chars)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""Login latency under concurrent load, inline vs. process-pool password hashing.
+
+Usage (from insurance_content_api/):
+    python benchmarks/bench_login.py --clients 32 --logins 8 --workers 4
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from src.config import config
+from src.models.insurance_models import db
+from src.routes.auth import auth_bp
+from src.services.password_hasher import password_hasher
+
+EMAIL = 'bench@example.com'
+PASSWORD = 'benchmark123'
+
+def build_app(workers, max_queue):
+    app = Flask(__name__)
+    app.config.from_object(config['testing'])
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tempfile.mktemp(suffix='.db')}"
+    app.config['PASSWORD_HASH_WORKERS'] = workers
+    app.config['PASSWORD_HASH_MAX_QUEUE'] = max_queue
+    db.init_app(app)
+    app.register_blueprint(auth_bp, url_prefix='/api/auth')
+    with app.app_context():
+        db.create_all()
+    return app
+
+def run(app, clients, logins):
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+
+    def client():
+        test_client = app.test_client()
+        for _ in range(logins):
+            start = time.perf_counter()
+            response = test_client.post('/api/auth/login', json={'email': EMAIL, 'password': PASSWORD})
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    return {
+        'requests': len(latencies),
+        'wall_s': round(wall, 2),
+        'p50_ms': round(statistics.median(latencies) * 1000, 1),
+        'p99_ms': round(p99 * 1000, 1),
+        'statuses': statuses
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--logins', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--max-queue', type=int, default=32)
+    args = parser.parse_args()
+
+    for label, workers in (('inline', 0), (f'pool x{args.workers}', args.workers)):
+        app = build_app(workers, args.max_queue)
+        client = app.test_client()
+        client.post('/api/auth/register', json={
+            'email': EMAIL, 'password': PASSWORD, 'first_name': 'Bench', 'last_name': 'Mark'
+        })
+        result = run(app, args.clients, args.logins)
+        print(f"{label:>10}: {result}")
+        password_hasher.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""Cost of turning an AI response into savable posts: dict.get parsing vs. compiled pydantic schemas.
+
+The dict path is the code this replaced: json.loads, dict.get defaults in
+_enhance_posts, then a second pass in _save_schedule (strptime of
+post_date, InsuranceType lookup). The schema path is the current
+AIContentService._parse_ai_response + _enhance_posts with the compliance
+scan switched off, so the two rows compare validation alone; the
+compliance row is the scan _enhance_posts adds on top (see
+bench_compliance_scan.py). All run on a clean response and on one with
+invalid fields, which the schema path repairs post by post.
+
+Usage (from insurance_content_api/):
+    python benchmarks/bench_post_validation.py --iterations 2000
+"""
+import argparse
+import contextlib
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from src.config import config
+from src.models.insurance_models import InsuranceType
+from src.services.ai_service import AIContentService
+from src.services.compliance import compliance_scanner
+
+WEEK_START = date(2025, 3, 3)
+INSURANCE_TYPES = ['final_expense', 'mortgage_protection']
+
+def build_response(invalid):
+    posts = [{
+        'day': i + 1,
+        'post_text': f"Post {i + 1}: planning ahead is one of the kindest things you can do for your family. " * 3,
+        'image_description': 'A family at the kitchen table at golden hour, warm tones',
+        'hashtags': ['#FinalExpense', '#FamilyFirst', '#PeaceOfMind', '#Planning'],
+        'insurance_focus': INSURANCE_TYPES[i % 2],
+        'content_theme': 'educational',
+        'engagement_hook': 'What would you want your family to know?'
+    } for i in range(7)]
+    if invalid:
+        posts[1]['hashtags'] = 'FamilyFirst, Planning'
+        posts[3]['insurance_focus'] = 'auto'
+        posts[5]['hashtags'] = 7
+    return json.dumps(posts)
+
+def dict_path(service, content_text):
+    """json.loads, dict.get defaults, then the save-time re-parse"""
+    posts_data = json.loads(content_text)
+    enhanced_posts = []
+    for i, post_data in enumerate(posts_data[:7]):
+        post_date = WEEK_START + timedelta(days=i)
+        enhanced_post = {
+            'day': i + 1,
+            'post_date': post_date.isoformat(),
+            'post_text': post_data.get('post_text', ''),
+            'image_description': post_data.get('image_description', 'Professional insurance-related image'),
+            'hashtags': post_data.get('hashtags', ['#Insurance', '#FinancialPlanning']),
+            'insurance_focus': post_data.get('insurance_focus', random.choice(INSURANCE_TYPES)),
+            'content_theme': post_data.get('content_theme', 'general'),
+            'engagement_hook': post_data.get('engagement_hook', 'What are your thoughts?')
+        }
+        hashtags = enhanced_post['hashtags']
+        # The old code raised TypeError on non-list hashtags; guarded so it survives the invalid response
+        enhanced_post['hashtags'] = service._validate_hashtags(hashtags if isinstance(hashtags, list) else [])
+        if enhanced_post['insurance_focus'] not in INSURANCE_TYPES:
+            enhanced_post['insurance_focus'] = random.choice(INSURANCE_TYPES)
+        enhanced_posts.append(enhanced_post)
+
+    saved = []
+    for post_data in enhanced_posts:
+        post_date = datetime.strptime(post_data['post_date'], '%Y-%m-%d').date()
+        insurance_focus = None
+        if post_data.get('insurance_focus'):
+            try:
+                insurance_focus = InsuranceType(post_data['insurance_focus'])
+            except ValueError:
+                pass
+        saved.append((post_date, post_data.get('post_text', ''), insurance_focus, post_data['hashtags']))
+    return saved
+
+def schema_path(service, content_text):
+    posts, errors = service._parse_ai_response(content_text)
+    enhanced_posts = service._enhance_posts(posts, WEEK_START, INSURANCE_TYPES, errors)
+    return [(post.post_date, post.post_text, post.insurance_focus, post.hashtags) for post in enhanced_posts]
+
+def compliance_path(service, posts):
+    """The scan _enhance_posts runs on each post, on posts validated outside the timing"""
+    for post, insurance_type in posts:
+        compliance_scanner.scan({'post_text': post.post_text, 'image_description': post.image_description},
+                                insurance_type)
+
+def scanned_posts(service, content_text):
+    posts, _ = service._parse_ai_response(content_text)
+    return [(post, INSURANCE_TYPES[i % len(INSURANCE_TYPES)]) for i, post in enumerate(posts[:7])]
+
+def measure(fn, service, content_text, iterations):
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn(service, content_text)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return statistics.median(timings) * 1e6, timings[int(len(timings) * 0.99) - 1] * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+
+    # The schema path reads compliance phrases from the app config
+    app = Flask(__name__)
+    app.config.from_object(config['testing'])
+    app.app_context().push()
+
+    service = AIContentService()
+    for label, invalid in (('clean', False), ('invalid fields', True)):
+        content_text = build_response(invalid)
+        print(f"{label}:")
+        for name, fn, data in (('dict.get', dict_path, content_text), ('schemas', schema_path, content_text),
+                               ('compliance', compliance_path, scanned_posts(service, content_text))):
+            # The schemas row times validation only; compliance is its own row
+            scan_off = mock.patch.object(compliance_scanner, 'scan', return_value=[]) \
+                if fn is schema_path else contextlib.nullcontext()
+            with scan_off:
+                fn(service, data)  # warm up
+                p50, p99 = measure(fn, service, data, args.iterations)
+            print(f"  {name:>10}: p50 {p50:.1f} us, p99 {p99:.1f} us per response")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""Schedule listing latency in main_local as the total number of users grows.
+
+Each user gets the same number of schedules; we time GET /api/content/schedules
+for one user. With the per-user index the latency should stay flat.
+
+Usage (from insurance_content_api/):
+    python benchmarks/bench_schedule_listing.py --users 100 1000 10000 --per-user 5
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+import main_local
+
+def populate(first_user, last_user, per_user):
+    base = datetime(2025, 1, 1)
+    for u in range(first_user, last_user):
+        for n in range(per_user):
+            main_local.add_schedule({
+                'id': f'sched-{u}-{n}',
+                'user_id': f'user-{u}',
+                'week_start': '2025-01-06',
+                'insurance_types': ['annuities'],
+                'tone': 'professional',
+                'custom_instructions': '',
+                'posts': [{}] * 7,
+                'created_at': (base + timedelta(minutes=n)).isoformat()
+            })
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--per-user', type=int, default=5)
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    client = main_local.app.test_client()
+    response = client.post('/api/auth/register',
+                           json={'email': 'bench@example.com', 'password': 'benchmark', 'name': 'Bench'})
+    # Act as user-0: the cookie and its session-store entry must name the same user
+    token = response.get_json()['session_token']
+    main_local.sessions[token] = dict(main_local.sessions[token], user_id='user-0')
+    with client.session_transaction() as sess:
+        sess['user_id'] = 'user-0'
+
+    populated = 0
+    for total in sorted(args.users):
+        # Only add the users missing since the previous step
+        populate(populated, total, args.per_user)
+        populated = total
+
+        timings = []
+        for _ in range(args.requests):
+            start = time.perf_counter()
+            response = client.get('/api/content/schedules')
+            timings.append(time.perf_counter() - start)
+        assert len(response.get_json()['schedules']) == args.per_user
+
+        print(f"{total:>8} users / {total * args.per_user:>8} schedules: "
+              f"median {statistics.median(timings) * 1e6:8.1f} us")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""Stripe webhook ack latency and subscription state convergence, against the local fake Stripe.
+
+Creates agents with fake Stripe subscriptions, replays realistic signed event
+sequences (renewals, failed payments, cancellations, plus redeliveries) at a
+target rate from several concurrent senders, then waits until every agent's
+subscription_status matches the end state of its sequence.
+
+Usage (from insurance_content_api/):
+    python benchmarks/bench_webhooks.py --agents 200 --rate 500 --senders 4 --duplicates 0.2
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from src.config import config
+from src.models.insurance_models import db, Agent, StripeEvent, SubscriptionStatus
+from src.routes.subscription import subscription_bp
+from src.services.fake_stripe import fake_stripe, WebhookEventGenerator
+from src.services.webhook_processor import webhook_processor
+
+SECRET = 'whsec_benchmark'
+
+def build_app(workers):
+    app = Flask(__name__)
+    app.config.from_object(config['testing'])
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{tempfile.mktemp(suffix='.db')}",
+        STRIPE_BACKEND='fake',
+        STRIPE_WEBHOOK_SECRET=SECRET,
+        STRIPE_WEBHOOK_WORKERS=workers,
+        STRIPE_WEBHOOK_RETRY_BACKOFF=0.05
+    )
+    db.init_app(app)
+    app.register_blueprint(subscription_bp, url_prefix='/api/subscription')
+    with app.app_context():
+        db.create_all()
+    webhook_processor.init_app(app)
+    webhook_processor.start()
+    return app
+
+def build_sequences(app, agents):
+    generator = WebhookEventGenerator(SECRET, fake_stripe)
+    sequences, expected = [], {}
+
+    with app.app_context():
+        for n in range(agents):
+            agent = Agent(email=f'agent{n}@example.com', password_hash='x', first_name='Bench', last_name=str(n))
+            db.session.add(agent)
+            db.session.flush()
+
+            customer = fake_stripe.Customer.create(email=agent.email, metadata={'agent_id': agent.id})
+            subscription = fake_stripe.create_subscription(customer.id, metadata={'agent_id': str(agent.id)})
+            agent.stripe_customer_id = customer.id
+            agent.stripe_subscription_id = subscription.id
+
+            outcome = random.choice(['active', 'active', 'past_due', 'canceled'])
+            sequences.append(generator.subscription_lifecycle(
+                dict(subscription),
+                renewals=random.randint(0, 3),
+                fail_payment=outcome == 'past_due',
+                cancel=outcome == 'canceled'
+            ))
+            expected[agent.id] = {
+                'active': SubscriptionStatus.ACTIVE,
+                'past_due': SubscriptionStatus.EXPIRED,
+                'canceled': SubscriptionStatus.CANCELLED
+            }[outcome]
+        db.session.commit()
+
+    return generator, sequences, expected
+
+def interleave(sequences):
+    """Merge per-agent sequences round-robin, keeping each agent's order"""
+    merged, iterators = [], [iter(s) for s in sequences]
+    while iterators:
+        for it in list(iterators):
+            event = next(it, None)
+            if event is None:
+                iterators.remove(it)
+            else:
+                merged.append(event)
+    return merged
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--agents', type=int, default=200)
+    parser.add_argument('--rate', type=float, default=500, help='total events/second across senders')
+    parser.add_argument('--senders', type=int, default=4)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--duplicates', type=float, default=0.2, help='share of events redelivered')
+    parser.add_argument('--timeout', type=float, default=120)
+    args = parser.parse_args()
+
+    app = build_app(args.workers)
+    generator, sequences, expected = build_sequences(app, args.agents)
+
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+
+    def sender(sender_sequences):
+        client = app.test_client()
+
+        def send(payload, headers):
+            start = time.perf_counter()
+            response = client.post('/api/subscription/webhook', data=payload, headers=headers)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                key = response.get_json().get('status', response.status_code)
+                statuses[key] = statuses.get(key, 0) + 1
+
+        generator.replay(interleave(sender_sequences), send,
+                         rate=args.rate / args.senders, duplicate_rate=args.duplicates)
+
+    # Each agent's events go through one sender, so delivery order per customer is preserved
+    threads = [threading.Thread(target=sender, args=(sequences[i::args.senders],)) for i in range(args.senders)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    acked = time.perf_counter()
+
+    converged = None
+    with app.app_context():
+        while time.perf_counter() - acked < args.timeout:
+            db.session.remove()
+            pending = StripeEvent.query.filter(StripeEvent.status.in_(('pending', 'processing'))).count()
+            actual = dict(db.session.query(Agent.id, Agent.subscription_status).all())
+            if not pending and all(actual[agent_id] == status for agent_id, status in expected.items()):
+                converged = time.perf_counter()
+                break
+            time.sleep(0.05)
+        failed = StripeEvent.query.filter_by(status='failed').count()
+
+    latencies.sort()
+    print(f"deliveries: {len(latencies)} in {acked - start:.2f}s ({statuses})")
+    print(f"ack latency: p50 {statistics.median(latencies) * 1000:.2f} ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:.2f} ms, max {latencies[-1] * 1000:.2f} ms")
+    if converged:
+        print(f"converged {converged - acked:.2f}s after the last ack ({failed} events failed)")
+    else:
+        print(f"did not converge within {args.timeout}s ({failed} events failed)")
+
+if __name__ == '__main__':
+    main()
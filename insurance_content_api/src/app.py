@@ -0,0 +1,110 @@
+"""Application factory for the blueprint-based API.
+
+Blueprints and services are imported inside create_app() rather than at
+module level, and the OpenAI, Stripe and requests SDKs are imported on first
+use by the code that needs them, so a worker can boot without paying for
+them.
+
+create_app() starts no threads, so scripts, tests and a gunicorn master
+that preloads the app stay single-threaded. Server entrypoints call
+start_background_services(app) in each serving process: src/worker.py,
+src/asgi.py on lifespan startup, and the post_worker_init hook in
+src/gunicorn_conf.py:
+
+    gunicorn -c src/gunicorn_conf.py 'src.app:create_app("production")'
+"""
+import os
+
+from flask import Flask, jsonify
+from flask_cors import CORS
+
+from src.config import config
+
+def create_app(config_name=None):
+    """Create the Flask app for a key of config.config (default: FLASK_CONFIG or 'default')"""
+    config_name = config_name or os.environ.get('FLASK_CONFIG', 'default')
+
+    app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
+    app.config.from_object(config[config_name])
+
+    CORS(app, supports_credentials=True, origins=app.config.get('CORS_ORIGINS', ['*']))
+
+    from src.models.insurance_models import db
+    db.init_app(app)
+
+    # First, so request timings cover every other hook
+    from src.services.metrics import registry as metrics
+    metrics.init_app(app)
+
+    from src.services.query_stats import query_stats
+    query_stats.init_app(app)
+
+    from src.services.tracing import tracer
+    tracer.init_app(app)
+
+    register_blueprints(app)
+
+    with app.app_context():
+        db.create_all()
+        # Columns and indexes added to models since the database was created
+        from src.models.schema_upgrade import upgrade_schema
+        upgrade_schema(db)
+
+    init_services(app)
+
+    from src.services.static_assets import static_assets
+    static_assets.init_app(app)
+
+    from src.services.profiler import request_profiler
+    request_profiler.init_app(app)
+
+    @app.route('/api/health')
+    def health_check():
+        return jsonify({'status': 'healthy', 'message': 'InsureContent Pro API is running'})
+
+    return app
+
+def register_blueprints(app):
+    """Register the API blueprints under /api"""
+    from src.routes.auth import auth_bp
+    from src.routes.content import content_bp
+    from src.routes.images import images_bp
+    from src.routes.subscription import subscription_bp
+    from src.routes.jobs import jobs_bp
+
+    app.register_blueprint(auth_bp, url_prefix='/api/auth')
+    app.register_blueprint(content_bp, url_prefix='/api/content')
+    app.register_blueprint(images_bp, url_prefix='/api/images')
+    app.register_blueprint(subscription_bp, url_prefix='/api/subscription')
+    app.register_blueprint(jobs_bp, url_prefix='/api/jobs')
+
+def init_services(app):
+    """Attach the background services to the app without starting their threads"""
+    from src.services.usage_recorder import usage_recorder
+    from src.services.webhook_processor import webhook_processor
+    from src.services.subscription_sync import subscription_reconciler
+    from src.services.entitlement_sweeper import entitlement_sweeper
+    from src.services.job_queue import job_queue
+
+    usage_recorder.init_app(app)
+    webhook_processor.init_app(app)
+    subscription_reconciler.init_app(app)
+    entitlement_sweeper.init_app(app)
+    job_queue.init_app(app)
+
+def start_background_services(app):
+    """Start the background threads of the services (each decides from config whether to run)"""
+    from src.services.usage_recorder import usage_recorder
+    from src.services.webhook_processor import webhook_processor
+    from src.services.subscription_sync import subscription_reconciler
+    from src.services.entitlement_sweeper import entitlement_sweeper
+    from src.services.job_queue import job_queue
+    from src.services.tracing import tracer
+
+    tracer.start()
+    usage_recorder.start()
+    webhook_processor.start()
+    subscription_reconciler.start()
+    entitlement_sweeper.start()
+    if app.config.get('JOB_QUEUE_MODE', 'thread') == 'thread':
+        job_queue.start(app.config.get('JOB_WORKER_THREADS', 2))
@@ -0,0 +1,151 @@
+"""ASGI serving mode for the API.
+
+Wraps the Flask app from create_app() so it can run under an ASGI server:
+
+    uvicorn --factory 'src.asgi:create_asgi_app' --host 0.0.0.0 --port 5000
+
+Views marked @awaits_upstream (image generation, and schedule generation
+when JOB_QUEUE_MODE = 'inline' runs the job inside the request) run in a
+greenlet on the event loop and await the OpenAI client, so a process can
+hold hundreds of generations in flight (see services/async_bridge.py). All
+other requests run on a thread pool of ASGI_THREADS, exactly as under a
+threaded WSGI server, so dashboard reads are not queued behind generations.
+The HTTP API is unchanged.
+"""
+import asyncio
+import importlib
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import has_app_context
+from werkzeug.exceptions import HTTPException
+
+from src.app import create_app, start_background_services
+from src.models.insurance_models import db
+from src.services.async_bridge import on_suspend, run_blocking, run_bridged, set_executor
+
+@on_suspend
+def release_db_connection():
+    """End the request's transaction and return its DB connection to the pool while waiting upstream"""
+    if not has_app_context():
+        return
+    session = db.session
+    # Either way loaded objects stay attached, expired, and reload on next access
+    if session.new or session.dirty or session.deleted:
+        run_blocking(session.commit)
+    else:
+        run_blocking(session.rollback)
+
+class AsgiAdapter:
+    """Minimal ASGI -> WSGI adapter with an event-loop path for upstream-bound views"""
+
+    def __init__(self, app, threads=32):
+        self.app = app
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='asgi-wsgi')
+        # Bridged views run their queries here too (async_bridge.run_blocking)
+        set_executor(self.executor)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            raise ValueError(f"Unsupported ASGI scope type: {scope['type']}")
+
+        body = await self._read_body(receive)
+        environ = self._build_environ(scope, body)
+
+        if self._awaits_upstream(environ):
+            status, headers, chunks = await run_bridged(self._run_wsgi, environ)
+        else:
+            loop = asyncio.get_running_loop()
+            status, headers, chunks = await loop.run_in_executor(self.executor, self._run_wsgi, environ)
+
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+        })
+        await send({'type': 'http.response.body', 'body': b''.join(chunks)})
+
+    def _awaits_upstream(self, environ):
+        try:
+            endpoint, _ = self.app.url_map.bind_to_environ(environ).match()
+        except HTTPException:
+            return False
+        view = self.app.view_functions.get(endpoint)
+        return getattr(view, 'awaits_upstream', False)
+
+    def _run_wsgi(self, environ):
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = headers
+
+        result = self.app(environ, start_response)
+        try:
+            chunks = list(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return response['status'], response['headers'], chunks
+
+    async def _read_body(self, receive):
+        body = b''
+        while True:
+            message = await receive()
+            body += message.get('body', b'')
+            if not message.get('more_body', False):
+                return body
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                start_background_services(self.app)
+                # Import the OpenAI SDK off the loop now rather than inside the first generation
+                await asyncio.get_running_loop().run_in_executor(self.executor, importlib.import_module, 'openai')
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def _build_environ(self, scope, body):
+        """PEP 3333 environ for an ASGI HTTP scope"""
+        server = scope.get('server') or ('localhost', 80)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope['query_string'].decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1] or 80),
+            'SERVER_PROTOCOL': f"HTTP/{scope['http_version']}",
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False
+        }
+        if scope.get('client'):
+            environ['REMOTE_ADDR'], environ['REMOTE_PORT'] = scope['client'][0], str(scope['client'][1])
+
+        for raw_name, raw_value in scope['headers']:
+            name = raw_name.decode('latin-1').upper().replace('-', '_')
+            value = raw_value.decode('latin-1')
+            if name == 'CONTENT_TYPE' or name == 'CONTENT_LENGTH':
+                environ[name] = value
+                continue
+            key = f'HTTP_{name}'
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+        return environ
+
+def create_asgi_app(config_name=None):
+    """Create the Flask app and wrap it for an ASGI server"""
+    app = create_app(config_name)
+    return AsgiAdapter(app, threads=app.config.get('ASGI_THREADS', 32))
@@ -10,18 +10,189 @@ class Config:
     OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
     
     # Stripe Configuration
+    STRIPE_BACKEND = os.environ.get('STRIPE_BACKEND', 'stripe')  # 'fake' = local stand-in (services/fake_stripe.py)
     STRIPE_SECRET_KEY = os.environ.get('STRIPE_SECRET_KEY')
     STRIPE_WEBHOOK_SECRET = os.environ.get('STRIPE_WEBHOOK_SECRET')
+    STRIPE_WEBHOOK_WORKERS = int(os.environ.get('STRIPE_WEBHOOK_WORKERS', 4))  # 0 = apply inline
+    STRIPE_WEBHOOK_MAX_ATTEMPTS = 5
+    STRIPE_WEBHOOK_RETRY_BACKOFF = 1.0  # seconds, doubled per attempt
+    STRIPE_WEBHOOK_POLL_INTERVAL = 1.0  # seconds between scans for due retries
+    STRIPE_WEBHOOK_CLAIM_TIMEOUT = 60  # seconds before an event claimed by a dead process is reclaimed
+    
+    # Local subscription mirror reconciliation
+    SUBSCRIPTION_RECONCILE_INTERVAL = 3600  # seconds, 0 disables the background reconciler
+    SUBSCRIPTION_MIRROR_MAX_AGE = 6 * 3600  # seconds before a mirror is re-synced
+    SUBSCRIPTION_RECONCILE_BATCH_SIZE = 100
+    SUBSCRIPTION_RECONCILE_RETRY_BACKOFF = 300  # seconds after a failed sync, doubled per failure
+    
+    # Trial/subscription expiry sweeper
+    ENTITLEMENT_SWEEP_INTERVAL = 300  # seconds, 0 disables the background sweeper
+    ENTITLEMENT_GRACE_PERIOD = 3 * 24 * 3600  # seconds past subscription_end_date before expiring
     
     # Session Configuration
     PERMANENT_SESSION_LIFETIME = timedelta(days=7)
     
+    # Password hashing (offloaded to a process pool, 0 workers = inline)
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', os.cpu_count() or 1))
+    PASSWORD_HASH_MAX_QUEUE = int(os.environ.get('PASSWORD_HASH_MAX_QUEUE', 32))
+    PASSWORD_HASH_TIMEOUT = 10  # seconds
+    
+    # Authenticated agent snapshot cache (per process)
+    AGENT_CACHE_TTL = 30  # seconds, 0 disables caching
+    AGENT_CACHE_MAX_SIZE = 10000
+    
+    # Background jobs (services/job_queue.py): 'thread' = JOB_WORKER_THREADS threads in each web
+    # process, 'worker' = only in python -m src.worker processes, 'inline' = run during the request
+    JOB_QUEUE_MODE = os.environ.get('JOB_QUEUE_MODE', 'thread')
+    JOB_WORKER_THREADS = int(os.environ.get('JOB_WORKER_THREADS', 2))
+    JOB_POLL_INTERVAL = 1.0  # seconds between polls when the queue is empty
+    JOB_VISIBILITY_TIMEOUT = 300  # seconds a claimed job stays hidden without progress
+    JOB_MAX_ATTEMPTS = 3
+    JOB_RETRY_BACKOFF = 5  # seconds, doubled per attempt
+    
+    # Metrics (/metrics); with several worker processes set METRICS_DIR to a shared directory
+    METRICS_ENABLED = True
+    METRICS_DIR = os.environ.get('METRICS_DIR')
+    METRICS_FLUSH_INTERVAL = 5  # seconds between per-process snapshots
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # require "Authorization: Bearer <token>" if set
+    
+    # Per-request profiling (services/profiler.py); off unless a token or sample rate is set
+    PROFILER_TOKEN = os.environ.get('PROFILER_TOKEN')  # send as the X-Profile header
+    PROFILER_SAMPLE_RATE = float(os.environ.get('PROFILER_SAMPLE_RATE', 0.0))
+    PROFILER_MODE = os.environ.get('PROFILER_MODE', 'sampling')  # or 'cprofile'
+    PROFILER_INTERVAL = 0.005  # seconds between stack samples
+    PROFILER_DIR = os.environ.get('PROFILER_DIR')  # default: src/database/profiles
+    PROFILER_MAX_FILES = 200
+    
+    # Tracing (services/tracing.py); without an exporter trace ids only appear in logs and headers
+    TRACING_EXPORTER = os.environ.get('TRACING_EXPORTER')  # 'jsonl' or 'otlp'
+    TRACING_SAMPLE_RATE = float(os.environ.get('TRACING_SAMPLE_RATE', 0.1))  # traces started here
+    TRACING_FILE = os.environ.get('TRACING_FILE')  # default: src/database/traces.jsonl
+    TRACING_OTLP_ENDPOINT = os.environ.get('TRACING_OTLP_ENDPOINT', 'http://localhost:4318/v1/traces')
+    TRACING_SERVICE_NAME = os.environ.get('TRACING_SERVICE_NAME', 'insurecontent-api')
+    TRACING_FLUSH_INTERVAL = 2.0  # seconds
+    TRACING_DB_SPANS = True  # a span per SQL statement in sampled traces
+    
+    # Per-request SQL stats (services/query_stats.py)
+    QUERY_STATS_ENABLED = True
+    QUERY_STATS_HEADERS = True  # X-DB-Query-Count / X-DB-Time-Ms on every response
+    QUERY_COUNT_WARN_THRESHOLD = 30  # log a warning above this many queries per request
+    SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', 100))
+    
+    # ASGI serving mode (src/asgi.py): threads for requests that don't await upstream calls
+    ASGI_THREADS = int(os.environ.get('ASGI_THREADS', 32))
+    
+    # Bundled frontend (services/static_assets.py); hashed assets/ files are always immutable
+    STATIC_MAX_AGE = 3600  # seconds, for other static files such as favicon.ico
+    
     # CORS Configuration
     CORS_ORIGINS = ['*']  # In production, specify exact origins
     
     # Database Configuration
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
         f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+    
+    # API usage recording (write-behind batches into api_usage + api_usage_daily)
+    USAGE_WRITE_BEHIND = True
+    USAGE_FLUSH_INTERVAL = float(os.environ.get('USAGE_FLUSH_INTERVAL', 5.0))  # seconds
+    USAGE_FLUSH_BATCH_SIZE = int(os.environ.get('USAGE_FLUSH_BATCH_SIZE', 100))
+    
+    # Per-plan generation quotas, keyed by subscription status (None = unlimited)
+    PLAN_QUOTAS = {
+        'trial': {
+            'tokens': {'day': 25000, 'month': 100000},
+            'images': {'day': 10, 'month': 40},
+            'regenerations': {'day': 5, 'month': 20}
+        },
+        'active': {
+            'tokens': {'day': 100000, 'month': 1500000},
+            'images': {'day': 50, 'month': 600},
+            'regenerations': {'day': 25, 'month': 300}
+        }
+    }
+    QUOTA_RESEED_INTERVAL = 60  # seconds between re-reading counters from api_usage_daily
+    
+    # Model routing (services/model_router.py): tiers per task, most preferred first
+    MODEL_TIERS = {
+        'premium': os.environ.get('MODEL_TIER_PREMIUM', 'gpt-4'),
+        'standard': os.environ.get('MODEL_TIER_STANDARD', 'gpt-4o'),
+        'fast': os.environ.get('MODEL_TIER_FAST', 'gpt-4o-mini')
+    }
+    MODEL_ROUTES = {
+        'weekly_content': ['premium', 'standard', 'fast'],
+        'default': ['standard', 'fast']
+    }
+    MODEL_ROUTER_LATENCY_BUDGET = {'weekly_content': 60.0, 'default': 20.0}  # p95 seconds
+    MODEL_ROUTER_MAX_ERROR_RATE = 0.25
+    MODEL_ROUTER_MIN_SAMPLES = 10  # recent calls needed before a model is judged
+    MODEL_ROUTER_WINDOW = 300  # seconds of calls considered
+    
+    # Models held to the post JSON schema with structured output (models/post_schemas.py)
+    STRUCTURED_OUTPUT_MODELS = ['gpt-4o', 'gpt-4o-mini', 'gpt-4.1', 'gpt-4.1-mini', 'gpt-4.1-nano']
+    
+    # Compliance phrases checked in every generated post (services/compliance.py).
+    # Scopes: 'all', an insurance type, or a two-letter license state.
+    COMPLIANCE_PHRASES = {
+        'all': {
+            'prohibited': ['risk-free', 'risk free', 'no risk', "can't lose", 'cannot lose', 'free insurance',
+                           'government program', 'government-sponsored', 'act now', 'limited time offer',
+                           'double your money', 'get rich'],
+            'warning': ['guarantee', 'guaranteed', 'free', 'best rates', 'cheapest', 'lowest price',
+                        'no medical exam', 'no exam', 'instant approval', 'everyone qualifies', 'tax-free',
+                        "don't wait", 'before it\'s too late']
+        },
+        'mortgage_protection': {
+            'prohibited': ['required by your lender', 'from your lender', 'your lender requires'],
+            'warning': ['pays off your mortgage', 'pmi']
+        },
+        'index_universal_life': {
+            'prohibited': ['guaranteed returns', 'invest in the stock market', 'stock market returns',
+                           'retirement plan', 'savings account'],
+            'warning': ['investment', 'returns', 'tax-free retirement', 'market gains']
+        },
+        'term_life_living_benefits': {
+            'prohibited': ['cash value'],
+            'warning': ['living benefits pay', 'any illness']
+        },
+        'final_expense': {
+            'prohibited': ['pays all funeral costs', 'covers all funeral costs'],
+            'warning': ['guaranteed acceptance', 'no health questions', 'burial policy']
+        },
+        'annuities': {
+            'prohibited': ['guaranteed returns', 'guaranteed growth', 'no fees', 'cd alternative', 'stock market returns'],
+            'warning': ['safe investment', 'bonus', 'returns', 'high yield']
+        },
+        'health_insurance': {
+            'prohibited': ['free health insurance', 'medicare approved', 'endorsed by medicare'],
+            'warning': ['$0 premium', 'zero premium', 'medicare', 'obamacare']
+        },
+        'NY': {
+            'prohibited': ['vanishing premium'],
+            'warning': ['best interest', 'financial planner']
+        },
+        'CA': {
+            'prohibited': ['senior specialist', 'senior advisor'],
+            'warning': ['certified senior']
+        },
+        'FL': {
+            'prohibited': ['free gift'],
+            'warning': ['gift card']
+        }
+    }
+    
+    # Completion budgets (services/token_budget.py): percentile of recent usage per request shape plus a margin
+    TOKEN_BUDGET_DEFAULT = 3500  # max_tokens until a shape has enough history
+    TOKEN_BUDGET_MIN_SAMPLES = 20
+    TOKEN_BUDGET_HISTORY = 200  # responses kept per shape
+    TOKEN_BUDGET_PERCENTILE = 0.99
+    TOKEN_BUDGET_MARGIN = 0.15
+    TOKEN_BUDGET_FLOOR = 1000
+    TOKEN_BUDGET_CEILING = 4096  # also the retry limit after a truncated response
+    PROMPT_TOKEN_WARN_LIMIT = 2500  # estimated prompt tokens
+    
+    # OpenAI price table used to cost usage (services/pricing.py PRICE_TABLES)
+    PRICE_VERSION = os.environ.get('PRICE_VERSION', '2025-06')
 
 class DevelopmentConfig(Config):
     """Development configuration"""
@@ -37,6 +208,7 @@ class ProductionConfig(Config):
     SESSION_COOKIE_SECURE = True
     SESSION_COOKIE_HTTPONLY = True
     SESSION_COOKIE_SAMESITE = 'Lax'
+    QUERY_STATS_HEADERS = False  # still logged, just not exposed to clients
     
     # Stripe webhook endpoint for production
     STRIPE_WEBHOOK_ENDPOINT = '/api/subscription/webhook'
@@ -45,6 +217,12 @@ class TestingConfig(Config):
     """Testing configuration"""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    USAGE_WRITE_BEHIND = False
+    PASSWORD_HASH_WORKERS = 0
+    STRIPE_WEBHOOK_WORKERS = 0
+    SUBSCRIPTION_RECONCILE_INTERVAL = 0
+    ENTITLEMENT_SWEEP_INTERVAL = 0
+    JOB_QUEUE_MODE = 'inline'
 
 # Configuration mapping
 config = {
@@ -0,0 +1,16 @@
+"""gunicorn settings for the API.
+
+    gunicorn -c src/gunicorn_conf.py 'src.app:create_app("production")'
+
+Background threads do not survive a fork, so they are started in each
+worker once it has loaded the app, whether or not the master preloads it.
+"""
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', 2))
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+def post_worker_init(worker):
+    from src.app import start_background_services
+    start_background_services(worker.wsgi)
@@ -7,8 +7,10 @@ import secrets
 # Add the src directory to the Python path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from flask import Flask, send_from_directory, jsonify, request, session
+from flask import Flask, jsonify, request, session
 from flask_cors import CORS
+from services.session_store import create_store
+from services.static_assets import static_assets
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 app.config['SECRET_KEY'] = 'insurance_content_platform_secret_key_2024'
@@ -16,9 +18,13 @@ app.config['SECRET_KEY'] = 'insurance_content_platform_secret_key_2024'
 # Enable CORS for all routes
 CORS(app, supports_credentials=True)
 
-# Simple in-memory storage for demo (in production, use a real database)
-users = {}
-sessions = {}
+# Demo storage: in-memory by default, SQLite-backed with SESSION_STORE_BACKEND=sqlite
+# so data survives restarts and is shared between workers
+SESSION_TTL = int(os.environ.get('SESSION_TTL', 7 * 24 * 3600))  # seconds
+SESSION_MAX_COUNT = int(os.environ.get('SESSION_MAX_COUNT', 100000))
+
+users = create_store('users')
+sessions = create_store('sessions', ttl=SESSION_TTL, max_size=SESSION_MAX_COUNT)
 
 def hash_password(password):
     """Hash a password for storing."""
@@ -28,20 +34,27 @@ def verify_password(stored_password, provided_password):
     """Verify a stored password against provided password."""
     return stored_password == hashlib.sha256(provided_password.encode()).hexdigest()
 
-# Serve React frontend
-@app.route('/')
-def index():
-    return send_from_directory(app.static_folder, 'index.html')
+def authenticated_user():
+    """(user_id, email) for a live session, else None.
+    
+    The cookie alone is not enough: its session_token must still be in the
+    session store, so logout, expiry and eviction end the session. A cookie
+    whose session is gone is cleared.
+    """
+    user_id = session.get('user_id')
+    email = session.get('email')
+    token = session.get('session_token')
+    if not user_id or not email or not token:
+        return None
+    
+    stored = sessions.get(token)
+    if stored is None or stored.get('user_id') != user_id or email not in users:
+        session.clear()
+        return None
+    return user_id, email
 
-@app.route('/<path:path>')
-def serve_static(path):
-    """Serve static files or fallback to index.html for React routing"""
-    file_path = os.path.join(app.static_folder, path)
-    if os.path.exists(file_path):
-        return send_from_directory(app.static_folder, path)
-    else:
-        # Fallback to index.html for React Router
-        return send_from_directory(app.static_folder, 'index.html')
+# Serve React frontend from memory (precompressed, cache headers, index.html fallback)
+static_assets.init_app(app)
 
 # API endpoints
 @app.route('/api/health')
@@ -121,6 +134,7 @@ def register():
         # Set session cookie
         session['user_id'] = user_id
         session['email'] = email
+        session['session_token'] = session_token
         
         return jsonify({
             'message': 'Registration successful',
@@ -170,6 +184,7 @@ def login():
         # Set session cookie
         session['user_id'] = user['id']
         session['email'] = email
+        session['session_token'] = session_token
         
         return jsonify({
             'message': 'Login successful',
@@ -190,11 +205,10 @@ def login():
 @app.route('/api/auth/me', methods=['GET'])
 def get_current_user():
     try:
-        user_id = session.get('user_id')
-        email = session.get('email')
-        
-        if not user_id or not email or email not in users:
+        auth = authenticated_user()
+        if auth is None:
             return jsonify({'error': 'Not authenticated'}), 401
+        user_id, email = auth
         
         user = users[email]
         return jsonify({
@@ -214,6 +228,7 @@ def get_current_user():
 @app.route('/api/auth/logout', methods=['POST'])
 def logout():
     try:
+        sessions.delete(session.get('session_token'))
         session.clear()
         return jsonify({'message': 'Logout successful'}), 200
     except Exception as e:
@@ -8,8 +8,10 @@ import json
 # Add the src directory to the Python path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from flask import Flask, send_from_directory, jsonify, request, session
+from flask import Flask, jsonify, request, session
 from flask_cors import CORS
+from services.session_store import create_store
+from services.static_assets import static_assets
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 app.config['SECRET_KEY'] = 'insurance_content_platform_secret_key_2024'
@@ -17,10 +19,20 @@ app.config['SECRET_KEY'] = 'insurance_content_platform_secret_key_2024'
 # Enable CORS for all routes
 CORS(app, supports_credentials=True)
 
-# Simple in-memory storage for demo (in production, use a real database)
-users = {}
-sessions = {}
-content_schedules = {}
+# Demo storage: in-memory by default, SQLite-backed with SESSION_STORE_BACKEND=sqlite
+# so data survives restarts and is shared between workers
+SESSION_TTL = int(os.environ.get('SESSION_TTL', 7 * 24 * 3600))  # seconds
+SESSION_MAX_COUNT = int(os.environ.get('SESSION_MAX_COUNT', 100000))
+
+users = create_store('users')
+sessions = create_store('sessions', ttl=SESSION_TTL, max_size=SESSION_MAX_COUNT)
+content_schedules = create_store('content_schedules')
+
+# Per-user index of schedule summaries, newest first, so listing one user's
+# schedules never scans everyone else's. Bounded to the most recent
+# MAX_SCHEDULES_PER_USER; older schedules are dropped from both stores.
+MAX_SCHEDULES_PER_USER = int(os.environ.get('MAX_SCHEDULES_PER_USER', 52))
+schedule_index = create_store('schedule_index')
 
 def hash_password(password):
     """Hash a password for storing."""
@@ -30,6 +42,25 @@ def verify_password(stored_password, provided_password):
     """Verify a stored password against provided password."""
     return stored_password == hashlib.sha256(provided_password.encode()).hexdigest()
 
+def authenticated_user():
+    """(user_id, email) for a live session, else None.
+    
+    The cookie alone is not enough: its session_token must still be in the
+    session store, so logout, expiry and eviction end the session. A cookie
+    whose session is gone is cleared.
+    """
+    user_id = session.get('user_id')
+    email = session.get('email')
+    token = session.get('session_token')
+    if not user_id or not email or not token:
+        return None
+    
+    stored = sessions.get(token)
+    if stored is None or stored.get('user_id') != user_id or email not in users:
+        session.clear()
+        return None
+    return user_id, email
+
 def generate_demo_content(insurance_types, tone, custom_instructions=""):
     """Generate demo content based on user preferences."""
     
@@ -157,20 +188,48 @@ def generate_demo_content(insurance_types, tone, custom_instructions=""):
     
     return posts
 
-# Serve React frontend
-@app.route('/')
-def index():
-    return send_from_directory(app.static_folder, 'index.html')
+def schedule_summary(schedule):
+    """Compact listing entry for a stored schedule."""
+    return {
+        'id': schedule['id'],
+        'week_start': schedule['week_start'],
+        'created_at': schedule['created_at'],
+        'post_count': len(schedule['posts']),
+        'insurance_types': schedule['insurance_types'],
+        'tone': schedule['tone']
+    }
+
+def add_schedule(schedule):
+    """Store a schedule and add it to its owner's index, enforcing retention."""
+    content_schedules[schedule['id']] = schedule
+    summary = schedule_summary(schedule)
+    
+    # One transaction, so concurrent requests (threads or worker processes) cannot lose index entries
+    with schedule_index.transaction():
+        summaries = schedule_index.get(schedule['user_id'], [])
+        
+        # Keep newest first; new schedules almost always land at position 0
+        position = 0
+        while position < len(summaries) and summaries[position]['created_at'] > summary['created_at']:
+            position += 1
+        summaries.insert(position, summary)
+        
+        evicted = summaries[MAX_SCHEDULES_PER_USER:]
+        schedule_index[schedule['user_id']] = summaries[:MAX_SCHEDULES_PER_USER]
+    
+    for old_summary in evicted:
+        content_schedules.delete(old_summary['id'])
+
+def remove_schedule(schedule):
+    """Delete a schedule and drop it from its owner's index."""
+    content_schedules.delete(schedule['id'])
+    
+    with schedule_index.transaction():
+        summaries = schedule_index.get(schedule['user_id'], [])
+        schedule_index[schedule['user_id']] = [s for s in summaries if s['id'] != schedule['id']]
 
-@app.route('/<path:path>')
-def serve_static(path):
-    """Serve static files or fallback to index.html for React routing"""
-    file_path = os.path.join(app.static_folder, path)
-    if os.path.exists(file_path):
-        return send_from_directory(app.static_folder, path)
-    else:
-        # Fallback to index.html for React Router
-        return send_from_directory(app.static_folder, 'index.html')
+# Serve React frontend from memory (precompressed, cache headers, index.html fallback)
+static_assets.init_app(app)
 
 # API endpoints
 @app.route('/api/health')
@@ -250,6 +309,7 @@ def register():
         # Set session cookie
         session['user_id'] = user_id
         session['email'] = email
+        session['session_token'] = session_token
         
         return jsonify({
             'message': 'Registration successful',
@@ -299,6 +359,7 @@ def login():
         # Set session cookie
         session['user_id'] = user['id']
         session['email'] = email
+        session['session_token'] = session_token
         
         return jsonify({
             'message': 'Login successful',
@@ -319,11 +380,10 @@ def login():
 @app.route('/api/auth/me', methods=['GET'])
 def get_current_user():
     try:
-        user_id = session.get('user_id')
-        email = session.get('email')
-        
-        if not user_id or not email or email not in users:
+        auth = authenticated_user()
+        if auth is None:
             return jsonify({'error': 'Not authenticated'}), 401
+        user_id, email = auth
         
         user = users[email]
         return jsonify({
@@ -343,6 +403,7 @@ def get_current_user():
 @app.route('/api/auth/logout', methods=['POST'])
 def logout():
     try:
+        sessions.delete(session.get('session_token'))
         session.clear()
         return jsonify({'message': 'Logout successful'}), 200
     except Exception as e:
@@ -353,11 +414,10 @@ def logout():
 @app.route('/api/content/generate', methods=['POST'])
 def generate_content():
     try:
-        user_id = session.get('user_id')
-        email = session.get('email')
-        
-        if not user_id or not email or email not in users:
+        auth = authenticated_user()
+        if auth is None:
             return jsonify({'error': 'Not authenticated'}), 401
+        user_id, email = auth
         
         data = request.get_json()
         insurance_types = data.get('insurance_types', [])
@@ -370,7 +430,7 @@ def generate_content():
         
         # Store the schedule
         schedule_id = secrets.token_urlsafe(16)
-        content_schedules[schedule_id] = {
+        add_schedule({
             'id': schedule_id,
             'user_id': user_id,
             'week_start': week_start,
@@ -379,7 +439,7 @@ def generate_content():
             'custom_instructions': custom_instructions,
             'posts': posts,
             'created_at': datetime.utcnow().isoformat()
-        }
+        })
         
         return jsonify({
             'schedule_id': schedule_id,
@@ -396,30 +456,14 @@ def generate_content():
 @app.route('/api/content/schedules', methods=['GET'])
 def get_schedules():
     try:
-        user_id = session.get('user_id')
-        email = session.get('email')
-        
-        if not user_id or not email or email not in users:
+        auth = authenticated_user()
+        if auth is None:
             return jsonify({'error': 'Not authenticated'}), 401
+        user_id, email = auth
         
-        # Get user's schedules
-        user_schedules = []
-        for schedule_id, schedule in content_schedules.items():
-            if schedule['user_id'] == user_id:
-                user_schedules.append({
-                    'id': schedule['id'],
-                    'week_start': schedule['week_start'],
-                    'created_at': schedule['created_at'],
-                    'post_count': len(schedule['posts']),
-                    'insurance_types': schedule['insurance_types'],
-                    'tone': schedule['tone']
-                })
-        
-        # Sort by creation date (newest first)
-        user_schedules.sort(key=lambda x: x['created_at'], reverse=True)
-        
+        # User's schedules from the per-user index (already newest first)
         return jsonify({
-            'schedules': user_schedules
+            'schedules': schedule_index.get(user_id, [])
         }), 200
         
     except Exception as e:
@@ -430,11 +474,10 @@ def get_schedules():
 @app.route('/api/content/schedules/<schedule_id>', methods=['GET'])
 def get_schedule(schedule_id):
     try:
-        user_id = session.get('user_id')
-        email = session.get('email')
-        
-        if not user_id or not email or email not in users:
+        auth = authenticated_user()
+        if auth is None:
             return jsonify({'error': 'Not authenticated'}), 401
+        user_id, email = auth
         
         if schedule_id not in content_schedules:
             return jsonify({'error': 'Schedule not found'}), 404
@@ -451,6 +494,31 @@ def get_schedule(schedule_id):
         print(f"Get schedule error: {str(e)}")
         return jsonify({'error': 'Failed to get schedule'}), 500
 
+# Delete a schedule
+@app.route('/api/content/schedules/<schedule_id>', methods=['DELETE'])
+def delete_schedule(schedule_id):
+    try:
+        auth = authenticated_user()
+        if auth is None:
+            return jsonify({'error': 'Not authenticated'}), 401
+        user_id, email = auth
+        
+        schedule = content_schedules.get(schedule_id)
+        if not schedule:
+            return jsonify({'error': 'Schedule not found'}), 404
+        
+        # Check if user owns this schedule
+        if schedule['user_id'] != user_id:
+            return jsonify({'error': 'Access denied'}), 403
+        
+        remove_schedule(schedule)
+        
+        return jsonify({'message': 'Schedule deleted successfully'}), 200
+        
+    except Exception as e:
+        print(f"Delete schedule error: {str(e)}")
+        return jsonify({'error': 'Failed to delete schedule'}), 500
+
 # Subscription endpoints (demo)
 @app.route('/api/subscription/pricing', methods=['GET'])
 def get_pricing():
@@ -490,11 +558,10 @@ def get_pricing():
 @app.route('/api/subscription/status', methods=['GET'])
 def get_subscription_status():
     try:
-        user_id = session.get('user_id')
-        email = session.get('email')
-        
-        if not user_id or not email or email not in users:
+        auth = authenticated_user()
+        if auth is None:
             return jsonify({'error': 'Not authenticated'}), 401
+        user_id, email = auth
         
         user = users[email]
         
@@ -4,8 +4,9 @@ import sys
 # Add the src directory to the Python path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from flask import Flask, send_from_directory, jsonify
+from flask import Flask, jsonify
 from flask_cors import CORS
+from services.static_assets import static_assets
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 app.config['SECRET_KEY'] = 'insurance_content_platform_secret_key_2024'
@@ -13,20 +14,8 @@ app.config['SECRET_KEY'] = 'insurance_content_platform_secret_key_2024'
 # Enable CORS for all routes
 CORS(app, supports_credentials=True)
 
-# Serve React frontend
-@app.route('/')
-def index():
-    return send_from_directory(app.static_folder, 'index.html')
-
-@app.route('/<path:path>')
-def serve_static(path):
-    """Serve static files or fallback to index.html for React routing"""
-    file_path = os.path.join(app.static_folder, path)
-    if os.path.exists(file_path):
-        return send_from_directory(app.static_folder, path)
-    else:
-        # Fallback to index.html for React Router
-        return send_from_directory(app.static_folder, 'index.html')
+# Serve React frontend from memory (precompressed, cache headers, index.html fallback)
+static_assets.init_app(app)
 
 # Basic API endpoints for demo
 @app.route('/api/health')
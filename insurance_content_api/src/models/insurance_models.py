@@ -30,6 +30,11 @@ class ToneType(Enum):
 
 class Agent(db.Model):
     __tablename__ = 'agents'
+    __table_args__ = (
+        # The entitlement sweep filters on these
+        db.Index('ix_agents_status_trial_end', 'subscription_status', 'trial_end_date'),
+        db.Index('ix_agents_status_subscription_end', 'subscription_status', 'subscription_end_date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(120), unique=True, nullable=False)
@@ -49,6 +54,7 @@ class Agent(db.Model):
     # Agent preferences
     insurance_types = db.Column(db.Text)  # JSON string of selected insurance types
     default_tone = db.Column(db.Enum(ToneType), default=ToneType.PROFESSIONAL)
+    license_state = db.Column(db.String(2))  # two-letter state code, selects state compliance phrases
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -93,6 +99,7 @@ class Agent(db.Model):
             'trial_end_date': self.trial_end_date.isoformat() if self.trial_end_date else None,
             'insurance_types': self.get_insurance_types(),
             'default_tone': self.default_tone.value,
+            'license_state': self.license_state,
             'created_at': self.created_at.isoformat()
         }
 
@@ -108,6 +115,7 @@ class ContentSchedule(db.Model):
     generation_prompt = db.Column(db.Text)  # Additional prompting from user
     tone = db.Column(db.Enum(ToneType), nullable=False)
     insurance_types = db.Column(db.Text)  # JSON string of insurance types for this schedule
+    generation_model = db.Column(db.String(50))  # model that wrote the posts (see services/model_router.py)
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
@@ -136,6 +144,7 @@ class ContentSchedule(db.Model):
             'generation_prompt': self.generation_prompt,
             'tone': self.tone.value,
             'insurance_types': self.get_insurance_types(),
+            'generation_model': self.generation_model,
             'created_at': self.created_at.isoformat(),
             'posts': [post.to_dict() for post in self.posts]
         }
@@ -156,6 +165,7 @@ class SocialMediaPost(db.Model):
     # Metadata
     insurance_type_focus = db.Column(db.Enum(InsuranceType))  # Primary insurance type for this post
     content_theme = db.Column(db.String(100))  # e.g., "holiday", "current_event", "educational"
+    compliance_findings = db.Column(db.Text)  # JSON list of phrase findings (see services/compliance.py)
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
@@ -172,6 +182,16 @@ class SocialMediaPost(db.Model):
         """Set hashtags from a list"""
         self.hashtags = json.dumps(hashtags_list)
     
+    def get_compliance_findings(self):
+        """Get compliance findings as a list"""
+        if self.compliance_findings:
+            return json.loads(self.compliance_findings)
+        return []
+    
+    def set_compliance_findings(self, findings_list):
+        """Set compliance findings from a list"""
+        self.compliance_findings = json.dumps(findings_list)
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -183,11 +203,16 @@ class SocialMediaPost(db.Model):
             'hashtags': self.get_hashtags(),
             'insurance_type_focus': self.insurance_type_focus.value if self.insurance_type_focus else None,
             'content_theme': self.content_theme,
+            'compliance_findings': self.get_compliance_findings(),
             'created_at': self.created_at.isoformat()
         }
 
 class APIUsage(db.Model):
     __tablename__ = 'api_usage'
+    __table_args__ = (
+        # Per-agent cost reports scan an agent's recent rows
+        db.Index('ix_api_usage_agent_created', 'agent_id', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     agent_id = db.Column(db.Integer, db.ForeignKey('agents.id'), nullable=False)
@@ -197,6 +222,16 @@ class APIUsage(db.Model):
     tokens_used = db.Column(db.Integer, default=0)
     cost = db.Column(db.Float, default=0.0)
     
+    # What the upstream call consumed, priced with services/pricing.py
+    model = db.Column(db.String(50))
+    prompt_tokens = db.Column(db.Integer, default=0)
+    completion_tokens = db.Column(db.Integer, default=0)
+    cached_tokens = db.Column(db.Integer, default=0)  # subset of prompt_tokens
+    image_size = db.Column(db.String(20))
+    image_quality = db.Column(db.String(20))
+    price_version = db.Column(db.String(20))
+    prompt_version = db.Column(db.String(20))  # prompt layout, to compare cache hit rates across versions
+    
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     def __repr__(self):
@@ -207,7 +242,198 @@ class APIUsage(db.Model):
             'id': self.id,
             'agent_id': self.agent_id,
             'endpoint': self.endpoint,
+            'model': self.model,
             'tokens_used': self.tokens_used,
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
+            'cached_tokens': self.cached_tokens,
+            'image_size': self.image_size,
+            'image_quality': self.image_quality,
             'cost': self.cost,
+            'price_version': self.price_version,
+            'prompt_version': self.prompt_version,
             'created_at': self.created_at.isoformat()
         }
+
+class APIUsageDaily(db.Model):
+    """Per (agent, endpoint, day) rollup of APIUsage, maintained by the usage recorder"""
+    __tablename__ = 'api_usage_daily'
+    __table_args__ = (
+        db.UniqueConstraint('agent_id', 'endpoint', 'day', name='uq_api_usage_daily_agent_endpoint_day'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    agent_id = db.Column(db.Integer, db.ForeignKey('agents.id'), nullable=False)
+    endpoint = db.Column(db.String(100), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    
+    # Aggregates
+    request_count = db.Column(db.Integer, nullable=False, default=0)
+    tokens_used = db.Column(db.Integer, nullable=False, default=0)
+    prompt_tokens = db.Column(db.Integer, nullable=False, default=0)
+    completion_tokens = db.Column(db.Integer, nullable=False, default=0)
+    cached_tokens = db.Column(db.Integer, nullable=False, default=0)
+    cost = db.Column(db.Float, nullable=False, default=0.0)
+    
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<APIUsageDaily {self.agent_id} {self.endpoint} {self.day}>'
+    
+    def to_dict(self):
+        return {
+            'agent_id': self.agent_id,
+            'endpoint': self.endpoint,
+            'day': self.day.isoformat(),
+            'request_count': self.request_count,
+            'tokens_used': self.tokens_used,
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
+            'cached_tokens': self.cached_tokens,
+            'cost': self.cost
+        }
+
+class StripeEvent(db.Model):
+    """Received Stripe webhook events, keyed by event id for deduplication"""
+    __tablename__ = 'stripe_events'
+    
+    id = db.Column(db.String(255), primary_key=True)  # Stripe event id (evt_...)
+    type = db.Column(db.String(100), nullable=False)
+    customer_id = db.Column(db.String(100), index=True)  # Ordering key for processing
+    payload = db.Column(db.Text, nullable=False)
+    
+    # Processing state: pending -> processing -> processed | pending (retry) | failed
+    status = db.Column(db.String(20), nullable=False, default='pending', index=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text)
+    # Pending: earliest retry (None = now). Processing: claim deadline, after which it is reclaimed
+    next_attempt_at = db.Column(db.DateTime)
+    
+    received_at = db.Column(db.DateTime, default=datetime.utcnow)
+    processed_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<StripeEvent {self.id} {self.type} {self.status}>'
+    
+    def get_payload(self):
+        """Get the event payload as a dict"""
+        return json.loads(self.payload)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'type': self.type,
+            'customer_id': self.customer_id,
+            'status': self.status,
+            'attempts': self.attempts,
+            'last_error': self.last_error,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'received_at': self.received_at.isoformat() if self.received_at else None,
+            'processed_at': self.processed_at.isoformat() if self.processed_at else None
+        }
+
+class SubscriptionMirror(db.Model):
+    """Local copy of an agent's Stripe subscription, kept current by webhooks and the reconciler"""
+    __tablename__ = 'subscription_mirrors'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    agent_id = db.Column(db.Integer, db.ForeignKey('agents.id'), nullable=False, unique=True)
+    stripe_subscription_id = db.Column(db.String(100), index=True)
+    
+    # Mirrored Stripe fields
+    status = db.Column(db.String(30))  # Stripe status, e.g. "active", "past_due", "canceled"
+    current_period_end = db.Column(db.DateTime)
+    cancel_at_period_end = db.Column(db.Boolean, default=False)
+    amount = db.Column(db.Integer)  # Plan price in cents
+    interval = db.Column(db.String(20))  # "month" or "year"
+    
+    synced_at = db.Column(db.DateTime)  # set by each successful sync, None until the first
+    
+    # Reconciler retries: failed syncs back off until next_sync_attempt_at
+    sync_failures = db.Column(db.Integer, default=0)
+    next_sync_attempt_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<SubscriptionMirror {self.stripe_subscription_id} {self.status}>'
+    
+    def to_dict(self):
+        return {
+            'stripe_subscription_id': self.stripe_subscription_id,
+            'stripe_status': self.status,
+            'current_period_end': self.current_period_end.isoformat() if self.current_period_end else None,
+            'cancel_at_period_end': self.cancel_at_period_end,
+            'plan_amount': self.amount,
+            'plan_interval': self.interval,
+            'synced_at': self.synced_at.isoformat() if self.synced_at else None
+        }
+
+class Job(db.Model):
+    """Durable background job (schedule and image generation), claimed by workers"""
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        db.Index('ix_jobs_status_available', 'status', 'available_at'),
+        # At most one active job per dedupe key, so concurrent enqueues cannot both insert
+        db.Index('uq_jobs_active_dedupe', 'agent_id', 'type', 'dedupe_key', unique=True,
+                 sqlite_where=db.text("status IN ('queued', 'running')"),
+                 postgresql_where=db.text("status IN ('queued', 'running')")),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    type = db.Column(db.String(50), nullable=False)
+    agent_id = db.Column(db.Integer, db.ForeignKey('agents.id'), nullable=False)
+    dedupe_key = db.Column(db.String(100))  # Repeated requests for the same work share one job
+    payload = db.Column(db.Text, nullable=False, default='{}')
+    
+    # queued -> running -> succeeded | queued (retry) | dead (out of attempts)
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    # Queued: earliest start. Running: visibility deadline, after which the job is reclaimed
+    available_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_by = db.Column(db.String(100))
+    
+    progress = db.Column(db.Text)  # JSON
+    result = db.Column(db.Text)  # JSON
+    last_error = db.Column(db.Text)
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<Job {self.id} {self.type} {self.status}>'
+    
+    def get_payload(self):
+        return json.loads(self.payload) if self.payload else {}
+    
+    def get_progress(self):
+        return json.loads(self.progress) if self.progress else None
+    
+    def get_result(self):
+        return json.loads(self.result) if self.result else None
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'type': self.type,
+            'status': self.status,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'progress': self.get_progress(),
+            'result': self.get_result(),
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class Lease(db.Model):
+    """Named lease so that one process at a time runs a periodic task (see services/lease.py)"""
+    __tablename__ = 'leases'
+    
+    name = db.Column(db.String(100), primary_key=True)
+    holder = db.Column(db.String(100), nullable=False)  # host:pid
+    expires_at = db.Column(db.DateTime, nullable=False)
+    
+    def __repr__(self):
+        return f'<Lease {self.name} {self.holder}>'
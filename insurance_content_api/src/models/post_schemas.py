@@ -0,0 +1,121 @@
+"""Schemas for AI-generated posts.
+
+AIPost is one post as the content model returns it; EnhancedPost is a post
+ready to save (dated, with a requested insurance type and cleaned hashtags).
+Pydantic compiles each model's validator once, when the class is created,
+and RAW_POSTS validates a whole response straight from its JSON text.
+
+CONTENT_RESPONSE_FORMAT is the JSON schema for OpenAI structured output,
+derived from AIPost. It lists every insurance type rather than the ones a
+request selected, so the schema stays identical across requests and the
+prompt prefix cache still applies; the selection is checked afterwards.
+"""
+from datetime import date
+from typing import List, NamedTuple, Optional, Tuple, Union
+
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter, ValidationError, field_validator
+
+from src.models.insurance_models import InsuranceType
+
+class AIPost(BaseModel):
+    """One post as returned by the content model"""
+    model_config = ConfigDict(extra='ignore', str_strip_whitespace=True)
+
+    day: int = 0
+    post_text: str = Field(min_length=1)
+    image_description: str = 'Professional insurance-related image'
+    hashtags: List[str] = Field(default_factory=lambda: ['#Insurance', '#FinancialPlanning'])
+    insurance_focus: Optional[InsuranceType] = None
+    content_theme: str = 'general'
+    engagement_hook: str = 'What are your thoughts?'
+
+    @field_validator('hashtags', mode='before')
+    @classmethod
+    def _split_hashtags(cls, value):
+        # Models sometimes return "#a #b" instead of a list
+        if isinstance(value, str):
+            return value.replace(',', ' ').split()
+        return value
+
+class AIPostList(BaseModel):
+    """Structured output shape; strict schemas need an object at the root"""
+    posts: List[AIPost]
+
+class EnhancedPost(BaseModel):
+    """A generated post ready to be saved as a SocialMediaPost"""
+    day: int = Field(ge=1, le=7)
+    post_date: date
+    post_text: str
+    image_description: str
+    hashtags: List[str]
+    insurance_focus: InsuranceType
+    content_theme: str
+    engagement_hook: str
+    compliance_findings: List[dict] = Field(default_factory=list)  # services/compliance.py Finding dicts
+
+RAW_POSTS = TypeAdapter(Union[AIPostList, List[AIPost]])
+
+class PostError(NamedTuple):
+    """One invalid field of one generated post"""
+    post: int
+    field: str
+    message: str
+
+    def __str__(self):
+        if not self.post:
+            return f"{self.field}: {self.message}"
+        return f"post {self.post} {self.field}: {self.message}"
+
+def validate_post(data, number: int) -> Tuple[Optional[AIPost], List[PostError]]:
+    """Validate one raw post, dropping invalid fields so their defaults apply.
+
+    Returns no post when it cannot be saved at all (not an object, or no
+    usable post_text).
+    """
+    try:
+        return AIPost.model_validate(data), []
+    except ValidationError as e:
+        details = e.errors()
+    errors = [PostError(number, '.'.join(str(part) for part in error['loc']) or 'post', error['msg'])
+              for error in details]
+    if not isinstance(data, dict):
+        return None, errors
+
+    invalid = {error['loc'][0] for error in details if error['loc']}
+    try:
+        return AIPost.model_validate({key: value for key, value in data.items() if key not in invalid}), errors
+    except ValidationError:
+        return None, errors
+
+def _strict(schema):
+    """OpenAI strict mode: every property required, no extras, no defaults or titles"""
+    if isinstance(schema, list):
+        return [_strict(item) for item in schema]
+    if not isinstance(schema, dict):
+        return schema
+    strict = {key: _strict(value) for key, value in schema.items()
+              if key not in ('title', 'default', 'minLength')}
+    if strict.get('type') == 'object' and 'properties' in strict:
+        strict['required'] = list(strict['properties'])
+        strict['additionalProperties'] = False
+    return strict
+
+def _response_format() -> dict:
+    post = _strict(AIPost.model_json_schema())
+    post.pop('$defs', None)
+    post['properties']['insurance_focus'] = {'type': 'string', 'enum': [t.value for t in InsuranceType]}
+    return {
+        'type': 'json_schema',
+        'json_schema': {
+            'name': 'weekly_posts',
+            'strict': True,
+            'schema': {
+                'type': 'object',
+                'properties': {'posts': {'type': 'array', 'items': post}},
+                'required': ['posts'],
+                'additionalProperties': False
+            }
+        }
+    }
+
+CONTENT_RESPONSE_FORMAT = _response_format()
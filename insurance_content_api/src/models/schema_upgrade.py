@@ -0,0 +1,76 @@
+"""Bring an existing database up to the current models.
+
+db.create_all() creates missing tables but never alters existing ones, so
+a database created before a column or index was added to a model would
+fail on the first query that uses it. upgrade_schema() adds the missing
+columns (ALTER TABLE ... ADD COLUMN) and indexes of every existing table.
+
+It only ever adds, so it is safe to run on every start and from several
+processes at once: a column or index another process added first is
+skipped. Columns are added as nullable, with their scalar default (if any)
+filling existing rows; renames, type changes and drops still need a
+hand-written migration.
+"""
+import logging
+
+from sqlalchemy import inspect
+from sqlalchemy.exc import IntegrityError, OperationalError, ProgrammingError
+
+def upgrade_schema(db):
+    """Add missing columns and indexes to existing tables; returns what was added"""
+    engine = db.engine
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    added = []
+
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+
+        existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns:
+                continue
+            statement = _add_column_sql(engine, table, column)
+            if _execute(engine, statement):
+                added.append(f'{table.name}.{column.name}')
+
+        existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing_indexes:
+                continue
+            try:
+                index.create(engine, checkfirst=True)
+                added.append(index.name)
+            except (OperationalError, ProgrammingError) as e:
+                # Created by another process since the inspection
+                logging.info(f"Skipping index {index.name}: {str(e)}")
+            except IntegrityError as e:
+                # A new unique index that existing rows violate; the app runs without it
+                logging.warning(f"Could not create unique index {index.name}: {str(e)}")
+
+    if added:
+        logging.info(f"Schema upgraded: added {', '.join(added)}")
+    return added
+
+def _add_column_sql(engine, table, column):
+    preparer = engine.dialect.identifier_preparer
+    column_type = column.type.compile(dialect=engine.dialect)
+    statement = (f'ALTER TABLE {preparer.format_table(table)} '
+                 f'ADD COLUMN {preparer.format_column(column)} {column_type}')
+    default = column.default.arg if column.default is not None and column.default.is_scalar else None
+    if default is not None:
+        literal = column.type.literal_processor(engine.dialect)
+        statement += f' DEFAULT {literal(default) if literal else default}'
+    return statement
+
+def _execute(engine, statement) -> bool:
+    try:
+        with engine.begin() as conn:
+            conn.exec_driver_sql(statement)
+        return True
+    except (OperationalError, ProgrammingError) as e:
+        # Added by another process since the inspection
+        if 'duplicate' in str(e).lower() or 'already exists' in str(e).lower():
+            return False
+        raise
@@ -1,6 +1,8 @@
-from flask import Blueprint, request, jsonify, session
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import Blueprint, request, jsonify, session, make_response
 from src.models.insurance_models import db, Agent, SubscriptionStatus
+from src.services.quota import quota_tracker, seconds_until_reset
+from src.services.agent_cache import agent_cache
+from src.services.password_hasher import password_hasher, HasherBusy
 from datetime import datetime, timedelta
 import re
 
@@ -21,6 +23,13 @@ def validate_password(password):
         return False, "Password must contain at least one number"
     return True, "Password is valid"
 
+def _server_busy():
+    """503 response for requests shed because password hashing is saturated"""
+    response = jsonify({'error': 'Server is busy, please try again shortly'})
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
 @auth_bp.route('/register', methods=['POST'])
 def register():
     """Register a new agent"""
@@ -53,7 +62,7 @@ def register():
             return jsonify({'error': 'Agent with this email already exists'}), 409
         
         # Create new agent
-        password_hash = generate_password_hash(password)
+        password_hash = password_hasher.hash(password)
         trial_end = datetime.utcnow() + timedelta(days=7)
         
         new_agent = Agent(
@@ -79,6 +88,9 @@ def register():
             'trial_days_remaining': 7
         }), 201
         
+    except HasherBusy:
+        db.session.rollback()
+        return _server_busy()
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': 'Registration failed', 'details': str(e)}), 500
@@ -97,9 +109,17 @@ def login():
         
         # Find agent
         agent = Agent.query.filter_by(email=email).first()
-        if not agent or not check_password_hash(agent.password_hash, password):
+        if not agent or not password_hasher.verify(agent.password_hash, password):
             return jsonify({'error': 'Invalid email or password'}), 401
         
+        # Transparently upgrade hashes made with old parameters
+        if password_hasher.needs_rehash(agent.password_hash):
+            try:
+                agent.password_hash = password_hasher.hash(password)
+                db.session.commit()
+            except HasherBusy:
+                db.session.rollback()
+        
         # Set session
         session['agent_id'] = agent.id
         session['agent_email'] = agent.email
@@ -117,12 +137,15 @@ def login():
             'subscription_active': agent.is_subscription_active()
         }), 200
         
+    except HasherBusy:
+        return _server_busy()
     except Exception as e:
         return jsonify({'error': 'Login failed', 'details': str(e)}), 500
 
 @auth_bp.route('/logout', methods=['POST'])
 def logout():
     """Logout the current agent"""
+    agent_cache.invalidate(session.get('agent_id'))
     session.clear()
     return jsonify({'message': 'Logout successful'}), 200
 
@@ -134,7 +157,7 @@ def get_current_agent():
         if not agent_id:
             return jsonify({'error': 'Not authenticated'}), 401
         
-        agent = Agent.query.get(agent_id)
+        agent = agent_cache.get(agent_id)
         if not agent:
             session.clear()
             return jsonify({'error': 'Agent not found'}), 404
@@ -181,9 +204,15 @@ def update_profile():
                 agent.default_tone = ToneType(data['default_tone'])
             except ValueError:
                 return jsonify({'error': 'Invalid tone type'}), 400
+        if 'license_state' in data:
+            license_state = (data['license_state'] or '').strip().upper()
+            if license_state and not (len(license_state) == 2 and license_state.isalpha()):
+                return jsonify({'error': 'License state must be a two-letter state code'}), 400
+            agent.license_state = license_state or None
         
         agent.updated_at = datetime.utcnow()
         db.session.commit()
+        agent_cache.invalidate(agent.id)
         
         return jsonify({
             'message': 'Profile updated successfully',
@@ -195,13 +224,13 @@ def update_profile():
         return jsonify({'error': 'Failed to update profile', 'details': str(e)}), 500
 
 def require_auth(f):
-    """Decorator to require authentication"""
+    """Decorator to require authentication, passing a cached AgentSnapshot to the route"""
     def decorated_function(*args, **kwargs):
         agent_id = session.get('agent_id')
         if not agent_id:
             return jsonify({'error': 'Authentication required'}), 401
         
-        agent = Agent.query.get(agent_id)
+        agent = agent_cache.get(agent_id)
         if not agent:
             session.clear()
             return jsonify({'error': 'Agent not found'}), 404
@@ -225,3 +254,40 @@ def require_active_subscription(f):
     
     decorated_function.__name__ = f.__name__
     return decorated_function
+
+
+def enforce_quota(metric, amount=1):
+    """Decorator to enforce the agent's plan quota for a metric before the upstream call.
+    
+    amount is what the request is expected to consume, or a callable taking
+    the agent and returning it for the current request.
+    """
+    def decorator(f):
+        def decorated_function(agent, *args, **kwargs):
+            expected = amount(agent) if callable(amount) else amount
+            exceeded = quota_tracker.check(agent, metric, expected)
+            if exceeded:
+                period, limit = exceeded
+                retry_after = seconds_until_reset(period)
+                response = jsonify({
+                    'error': 'Quota exceeded',
+                    'metric': metric,
+                    'period': period,
+                    'limit': limit,
+                    'retry_after': retry_after
+                })
+                response.status_code = 429
+                response.headers['Retry-After'] = str(retry_after)
+            else:
+                response = make_response(f(agent, *args, **kwargs))
+            
+            # Report what is left after this request
+            response.headers['X-Quota-Metric'] = metric
+            for period, remaining in quota_tracker.remaining(agent, metric).items():
+                if remaining is not None:
+                    response.headers[f'X-Quota-Remaining-{period.title()}'] = str(remaining)
+            return response
+        
+        decorated_function.__name__ = f.__name__
+        return decorated_function
+    return decorator
@@ -1,7 +1,12 @@
 from flask import Blueprint, request, jsonify
-from src.models.insurance_models import db, ContentSchedule, SocialMediaPost, InsuranceType, ToneType, APIUsage
-from src.routes.auth import require_auth, require_active_subscription
+from src.models.insurance_models import db, ContentSchedule, SocialMediaPost, InsuranceType, ToneType
+from src.routes.auth import require_auth, require_active_subscription, enforce_quota
 from src.services.ai_service import AIContentService
+from src.services.usage_recorder import usage_recorder, get_daily_usage, get_usage_by_model
+from src.services.async_bridge import awaits_upstream, run_blocking
+from src.services.job_queue import job_queue
+from src.services.tracing import traced
+from sqlalchemy.orm import selectinload
 from datetime import datetime, timedelta
 import os
 import json
@@ -22,9 +27,25 @@ def get_week_dates(date_str=None):
     
     return week_start, week_end
 
+def expected_schedule_tokens(agent):
+    """Token quota a generate-schedule request needs: estimated prompt plus completion budget"""
+    data = request.get_json(silent=True) or {}
+    insurance_types = data.get('insurance_types')
+    if not insurance_types or not isinstance(insurance_types, list):
+        return 1
+    try:
+        week_start, _ = get_week_dates(data.get('week_start_date'))
+        return AIContentService().expected_content_tokens(
+            insurance_types, data.get('tone') or '', data.get('additional_prompt', ''), week_start)
+    except Exception:
+        # Invalid input; the view rejects it
+        return 1
+
 @content_bp.route('/generate-schedule', methods=['POST'])
+@awaits_upstream
 @require_auth
 @require_active_subscription
+@enforce_quota('tokens', amount=expected_schedule_tokens)
 def generate_schedule(agent):
     """Generate a weekly content schedule"""
     try:
@@ -59,10 +80,10 @@ def generate_schedule(agent):
         week_start, week_end = get_week_dates(week_date)
         
         # Check if schedule already exists for this week
-        existing_schedule = ContentSchedule.query.filter_by(
+        existing_schedule = run_blocking(ContentSchedule.query.filter_by(
             agent_id=agent.id,
             week_start_date=week_start
-        ).first()
+        ).first)
         
         if existing_schedule:
             return jsonify({
@@ -70,90 +91,122 @@ def generate_schedule(agent):
                 'schedule': existing_schedule.to_dict()
             }), 200
         
-        # Generate content using enhanced AI service
-        ai_service = AIContentService()
-        
-        try:
-            posts_data, tokens_used = ai_service.generate_weekly_content(
-                insurance_types=insurance_types,
-                tone=tone_str,
-                additional_prompt=additional_prompt,
-                week_start=week_start
-            )
-            
-            # Track API usage
-            api_usage = APIUsage(
-                agent_id=agent.id,
-                endpoint='generate_content',
-                tokens_used=tokens_used,
-                cost=tokens_used * 0.00003  # Approximate cost
-            )
-            db.session.add(api_usage)
-            
-        except Exception as e:
-            return jsonify({'error': 'Failed to generate content', 'details': str(e)}), 500
-        
-        # Create content schedule
-        schedule = ContentSchedule(
-            agent_id=agent.id,
-            week_start_date=week_start,
-            week_end_date=week_end,
-            generation_prompt=additional_prompt,
-            tone=tone
+        # Generation runs as a background job; clients poll /api/jobs/<id>
+        job, created = job_queue.enqueue(
+            'generate_schedule',
+            agent.id,
+            payload={
+                'insurance_types': insurance_types,
+                'tone': tone_str,
+                'additional_prompt': additional_prompt,
+                'week_start': week_start.isoformat(),
+                'license_state': agent.license_state
+            },
+            dedupe_key=week_start.isoformat()
         )
-        schedule.set_insurance_types(insurance_types)
-        
-        db.session.add(schedule)
-        db.session.flush()  # Get the schedule ID
-        
-        # Create individual posts
-        for post_data in posts_data:
-            # Parse post date from the enhanced data
-            if 'post_date' in post_data:
-                post_date = datetime.strptime(post_data['post_date'], '%Y-%m-%d').date()
-            else:
-                post_date = week_start + timedelta(days=post_data.get('day', 1) - 1)
-            
-            # Map insurance focus to enum
-            insurance_focus = None
-            if post_data.get('insurance_focus'):
-                try:
-                    insurance_focus = InsuranceType(post_data['insurance_focus'])
-                except ValueError:
-                    pass
-            
-            post = SocialMediaPost(
-                schedule_id=schedule.id,
-                post_date=post_date,
-                post_text=post_data.get('post_text', ''),
-                image_description=post_data.get('image_description', ''),
-                insurance_type_focus=insurance_focus,
-                content_theme=post_data.get('content_theme', 'general')
-            )
-            
-            # Set hashtags
-            if post_data.get('hashtags'):
-                post.set_hashtags(post_data['hashtags'])
-            
-            db.session.add(post)
-        
-        db.session.commit()
         
         return jsonify({
-            'message': 'Content schedule generated successfully',
-            'schedule': schedule.to_dict()
-        }), 201
+            'message': 'Schedule generation started' if created else 'Schedule generation already in progress',
+            'job': job.to_dict(),
+            'status_url': f'/api/jobs/{job.id}'
+        }), 202
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': 'Failed to generate schedule', 'details': str(e)}), 500
 
+def run_schedule_job(job):
+    """Job handler: generate a weekly schedule with the AI service and save it"""
+    payload = job.get_payload()
+    insurance_types = payload['insurance_types']
+    tone_str = payload['tone']
+    tone = ToneType(tone_str)
+    additional_prompt = payload.get('additional_prompt', '')
+    week_start = datetime.strptime(payload['week_start'], '%Y-%m-%d').date()
+    week_end = week_start + timedelta(days=6)
+    agent_id = job.agent_id
+    
+    # A previous attempt may have saved the schedule before failing
+    existing_schedule = ContentSchedule.query.filter_by(
+        agent_id=agent_id,
+        week_start_date=week_start
+    ).first()
+    if existing_schedule:
+        return {'schedule_id': existing_schedule.id}
+    
+    job_queue.set_progress(job, {'stage': 'generating_content'})
+    
+    # Generate content using enhanced AI service
+    ai_service = AIContentService()
+    posts_data, usage = ai_service.generate_weekly_content(
+        insurance_types=insurance_types,
+        tone=tone_str,
+        additional_prompt=additional_prompt,
+        week_start=week_start,
+        license_state=payload.get('license_state')
+    )
+    
+    # Track API usage
+    usage_recorder.record(
+        agent_id=agent_id,
+        endpoint='generate_content',
+        usage=usage
+    )
+    
+    job_queue.set_progress(job, {'stage': 'saving_posts', 'total_posts': len(posts_data)})
+    
+    schedule = _save_schedule(agent_id, week_start, week_end, additional_prompt, tone, insurance_types, posts_data,
+                              usage.model)
+    
+    return {'schedule_id': schedule.id}
+
+@traced('db.save_schedule')
+def _save_schedule(agent_id, week_start, week_end, additional_prompt, tone, insurance_types, posts_data, model):
+    """Save a generated schedule and its posts"""
+    # Create content schedule
+    schedule = ContentSchedule(
+        agent_id=agent_id,
+        week_start_date=week_start,
+        week_end_date=week_end,
+        generation_prompt=additional_prompt,
+        tone=tone,
+        generation_model=model
+    )
+    schedule.set_insurance_types(insurance_types)
+    
+    db.session.add(schedule)
+    db.session.flush()  # Get the schedule ID
+    
+    # Create individual posts; they were validated when generated (models/post_schemas.py)
+    for post_data in posts_data:
+        post = SocialMediaPost(
+            schedule_id=schedule.id,
+            post_date=post_data.post_date,
+            post_text=post_data.post_text,
+            image_description=post_data.image_description,
+            insurance_type_focus=post_data.insurance_focus,
+            content_theme=post_data.content_theme
+        )
+        post.set_hashtags(post_data.hashtags)
+        post.set_compliance_findings(post_data.compliance_findings)
+        
+        db.session.add(post)
+    
+    db.session.commit()
+    
+    return schedule
+
+job_queue.register('generate_schedule', run_schedule_job)
+
 @content_bp.route('/schedules', methods=['GET'])
 @require_auth
 def get_schedules(agent):
     """Get all content schedules for the agent"""
     try:
-        schedules = ContentSchedule.query.filter_by(agent_id=agent.id).order_by(ContentSchedule.week_start_date.desc()).all()
+        # Load every schedule's posts in one extra query instead of one per schedule
+        schedules = ContentSchedule.query.options(
+            selectinload(ContentSchedule.posts)
+        ).filter_by(agent_id=agent.id).order_by(ContentSchedule.week_start_date.desc()).all()
         
         return jsonify({
             'schedules': [schedule.to_dict() for schedule in schedules]
@@ -224,6 +277,36 @@ def get_current_week_schedule(agent):
     except Exception as e:
         return jsonify({'error': 'Failed to get current week schedule', 'details': str(e)}), 500
 
+@content_bp.route('/usage', methods=['GET'])
+@require_auth
+def get_usage(agent):
+    """Get the agent's daily API usage and cost rollup"""
+    try:
+        days = min(max(request.args.get('days', 30, type=int), 1), 366)
+        rows = get_daily_usage(agent.id, days=days)
+        
+        by_endpoint = {}
+        for row in rows:
+            totals = by_endpoint.setdefault(row.endpoint, dict.fromkeys(
+                ('request_count', 'tokens_used', 'prompt_tokens', 'completion_tokens', 'cached_tokens', 'cost'), 0))
+            for field in totals:
+                totals[field] += getattr(row, field) or 0
+        
+        return jsonify({
+            'days': days,
+            'usage': [row.to_dict() for row in rows],
+            'by_endpoint': by_endpoint,
+            'by_model': get_usage_by_model(agent.id, days=days),
+            'total_tokens': sum(row.tokens_used for row in rows),
+            'total_prompt_tokens': sum(row.prompt_tokens or 0 for row in rows),
+            'total_completion_tokens': sum(row.completion_tokens or 0 for row in rows),
+            'total_cached_tokens': sum(row.cached_tokens or 0 for row in rows),
+            'total_cost': round(sum(row.cost for row in rows), 4)
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': 'Failed to get usage', 'details': str(e)}), 500
+
 @content_bp.route('/insurance-types', methods=['GET'])
 def get_insurance_types():
     """Get available insurance types"""
@@ -1,26 +1,37 @@
 from flask import Blueprint, request, jsonify
-from src.models.insurance_models import db, SocialMediaPost, APIUsage
-from src.routes.auth import require_auth, require_active_subscription
+from src.models.insurance_models import db, ContentSchedule, SocialMediaPost
+from src.routes.auth import require_auth, require_active_subscription, enforce_quota
 from src.services.ai_service import AIContentService
-import requests
+from src.services.usage_recorder import usage_recorder
+from src.services.pricing import cost_of
+from src.services.quota import quota_tracker
+from src.services.async_bridge import awaits_upstream, run_blocking
+from src.services.agent_cache import agent_cache
+from src.services.job_queue import job_queue, PermanentJobError
 import os
 from urllib.parse import urlparse
 
 images_bp = Blueprint('images', __name__)
 
+def _find_post(agent_id, post_id):
+    """The agent's post with this id, if any"""
+    return SocialMediaPost.query.join(
+        SocialMediaPost.schedule
+    ).filter(
+        SocialMediaPost.id == post_id,
+        ContentSchedule.agent_id == agent_id
+    ).first()
+
 @images_bp.route('/generate-image/<int:post_id>', methods=['POST'])
+@awaits_upstream
 @require_auth
 @require_active_subscription
+@enforce_quota('images')
 def generate_image_for_post(agent, post_id):
     """Generate an image for a specific social media post"""
     try:
         # Get the post
-        post = SocialMediaPost.query.join(
-            SocialMediaPost.schedule
-        ).filter(
-            SocialMediaPost.id == post_id,
-            SocialMediaPost.schedule.has(agent_id=agent.id)
-        ).first()
+        post = run_blocking(_find_post, agent.id, post_id)
         
         if not post:
             return jsonify({'error': 'Post not found'}), 404
@@ -36,7 +47,7 @@ def generate_image_for_post(agent, post_id):
         ai_service = AIContentService()
         
         try:
-            image_url = ai_service.generate_image_for_post(
+            image_url, usage = ai_service.generate_image_for_post(
                 post_text=post.post_text,
                 image_description=post.image_description,
                 insurance_type=post.insurance_type_focus.value if post.insurance_type_focus else None
@@ -46,15 +57,13 @@ def generate_image_for_post(agent, post_id):
             post.image_url = image_url
             
             # Track API usage
-            api_usage = APIUsage(
+            usage_recorder.record(
                 agent_id=agent.id,
                 endpoint='generate_image',
-                tokens_used=0,  # DALL-E doesn't use tokens
-                cost=0.04  # Approximate cost for DALL-E 3 standard quality
+                usage=usage
             )
-            db.session.add(api_usage)
             
-            db.session.commit()
+            run_blocking(db.session.commit)
             
             return jsonify({
                 'message': 'Image generated successfully',
@@ -70,69 +79,128 @@ def generate_image_for_post(agent, post_id):
         return jsonify({'error': 'Failed to process request', 'details': str(e)}), 500
 
 @images_bp.route('/generate-all-images/<int:schedule_id>', methods=['POST'])
+@awaits_upstream
 @require_auth
 @require_active_subscription
+@enforce_quota('images')
 def generate_all_images_for_schedule(agent, schedule_id):
     """Generate images for all posts in a schedule"""
     try:
-        # Get all posts in the schedule
-        posts = SocialMediaPost.query.join(
+        # Only start a job if some post still needs an image
+        pending_posts = run_blocking(SocialMediaPost.query.join(
             SocialMediaPost.schedule
         ).filter(
             SocialMediaPost.schedule_id == schedule_id,
-            SocialMediaPost.schedule.has(agent_id=agent.id),
-            SocialMediaPost.image_url.is_(None)  # Only posts without images
-        ).all()
+            ContentSchedule.agent_id == agent.id,
+            SocialMediaPost.image_url.is_(None)
+        ).count)
         
-        if not posts:
+        if not pending_posts:
             return jsonify({'message': 'No posts found or all posts already have images'}), 200
         
-        ai_service = AIContentService()
-        generated_images = []
-        failed_generations = []
-        
-        for post in posts:
-            try:
-                image_url = ai_service.generate_image_for_post(
-                    post_text=post.post_text,
-                    image_description=post.image_description,
-                    insurance_type=post.insurance_type_focus.value if post.insurance_type_focus else None
-                )
-                
-                post.image_url = image_url
-                generated_images.append({
-                    'post_id': post.id,
-                    'image_url': image_url
-                })
-                
-                # Track API usage
-                api_usage = APIUsage(
-                    agent_id=agent.id,
-                    endpoint='generate_image',
-                    tokens_used=0,
-                    cost=0.04
-                )
-                db.session.add(api_usage)
-                
-            except Exception as e:
-                failed_generations.append({
-                    'post_id': post.id,
-                    'error': str(e)
-                })
-        
-        db.session.commit()
+        # Generation runs as a background job; clients poll /api/jobs/<id>
+        job, created = job_queue.enqueue(
+            'generate_all_images',
+            agent.id,
+            payload={'schedule_id': schedule_id},
+            dedupe_key=str(schedule_id)
+        )
         
         return jsonify({
-            'message': f'Generated {len(generated_images)} images successfully',
-            'generated_images': generated_images,
-            'failed_generations': failed_generations,
-            'total_cost': len(generated_images) * 0.04
-        }), 200
+            'message': 'Image generation started' if created else 'Image generation already in progress',
+            'job': job.to_dict(),
+            'status_url': f'/api/jobs/{job.id}'
+        }), 202
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': 'Failed to generate images', 'details': str(e)}), 500
 
+def _image_progress(entries):
+    return {
+        'total': len(entries),
+        'completed': sum(1 for e in entries.values() if e['status'] == 'completed'),
+        'failed': sum(1 for e in entries.values() if e['status'] == 'failed'),
+        'posts': list(entries.values())
+    }
+
+def run_images_job(job):
+    """Job handler: generate images for the posts of a schedule that have none yet.
+    
+    Each image is committed as soon as it exists, so a retried job only
+    generates the posts that are still missing one.
+    """
+    schedule_id = job.get_payload()['schedule_id']
+    agent = agent_cache.get(job.agent_id)
+    if agent is None:
+        raise PermanentJobError(f"Agent {job.agent_id} not found")
+    
+    posts = SocialMediaPost.query.join(
+        SocialMediaPost.schedule
+    ).filter(
+        SocialMediaPost.schedule_id == schedule_id,
+        ContentSchedule.agent_id == job.agent_id,
+        SocialMediaPost.image_url.is_(None)  # Only posts without images
+    ).order_by(SocialMediaPost.post_date).all()
+    
+    # Keep per-post progress from earlier attempts, reset whatever is still missing
+    previous = job.get_progress() or {}
+    entries = {entry['post_id']: entry for entry in previous.get('posts', [])}
+    for post in posts:
+        entries[post.id] = {'post_id': post.id, 'status': 'pending'}
+    job_queue.set_progress(job, _image_progress(entries))
+    
+    ai_service = AIContentService()
+    errors = 0
+    
+    for post in posts:
+        entry = entries[post.id]
+        
+        # Stop spending once the agent's image quota runs out mid-schedule
+        if quota_tracker.check(agent, 'images'):
+            entry.update(status='failed', error='Image quota exceeded')
+            job_queue.set_progress(job, _image_progress(entries))
+            continue
+        
+        try:
+            image_url, usage = ai_service.generate_image_for_post(
+                post_text=post.post_text,
+                image_description=post.image_description,
+                insurance_type=post.insurance_type_focus.value if post.insurance_type_focus else None
+            )
+            
+            post.image_url = image_url
+            db.session.commit()
+            entry.update(status='completed', image_url=image_url, cost=cost_of(usage))
+            
+            # Track API usage
+            usage_recorder.record(
+                agent_id=job.agent_id,
+                endpoint='generate_image',
+                usage=usage
+            )
+            
+        except Exception as e:
+            db.session.rollback()
+            entry.update(status='failed', error=str(e))
+            errors += 1
+        
+        job_queue.set_progress(job, _image_progress(entries))
+    
+    if errors:
+        # Retry the job; images generated so far are kept
+        raise Exception(f"{errors} of {len(posts)} images failed")
+    
+    generated = [e for e in entries.values() if e['status'] == 'completed']
+    return {
+        'generated_images': [{'post_id': e['post_id'], 'image_url': e['image_url']} for e in generated],
+        'failed_generations': [{'post_id': e['post_id'], 'error': e['error']}
+                               for e in entries.values() if e['status'] == 'failed'],
+        'total_cost': round(sum(e.get('cost', 0.0) for e in generated), 6)
+    }
+
+job_queue.register('generate_all_images', run_images_job)
+
 @images_bp.route('/download-image/<int:post_id>', methods=['GET'])
 @require_auth
 def download_image(agent, post_id):
@@ -143,7 +211,7 @@ def download_image(agent, post_id):
             SocialMediaPost.schedule
         ).filter(
             SocialMediaPost.id == post_id,
-            SocialMediaPost.schedule.has(agent_id=agent.id)
+            ContentSchedule.agent_id == agent.id
         ).first()
         
         if not post:
@@ -153,6 +221,7 @@ def download_image(agent, post_id):
             return jsonify({'error': 'No image URL found for this post'}), 404
         
         # Download the image
+        import requests
         try:
             response = requests.get(post.image_url, timeout=30)
             response.raise_for_status()
@@ -179,8 +248,10 @@ def download_image(agent, post_id):
         return jsonify({'error': 'Failed to process request', 'details': str(e)}), 500
 
 @images_bp.route('/regenerate-image/<int:post_id>', methods=['POST'])
+@awaits_upstream
 @require_auth
 @require_active_subscription
+@enforce_quota('regenerations')
 def regenerate_image(agent, post_id):
     """Regenerate an image for a post with optional new description"""
     try:
@@ -188,43 +259,34 @@ def regenerate_image(agent, post_id):
         new_description = data.get('image_description')
         
         # Get the post
-        post = SocialMediaPost.query.join(
-            SocialMediaPost.schedule
-        ).filter(
-            SocialMediaPost.id == post_id,
-            SocialMediaPost.schedule.has(agent_id=agent.id)
-        ).first()
+        post = run_blocking(_find_post, agent.id, post_id)
         
         if not post:
             return jsonify({'error': 'Post not found'}), 404
         
-        # Update description if provided
-        if new_description:
-            post.image_description = new_description
-        
-        # Generate new image
+        # Generate new image, with the new description if provided
+        image_description = new_description or post.image_description
         ai_service = AIContentService()
         
         try:
-            image_url = ai_service.generate_image_for_post(
+            image_url, usage = ai_service.generate_image_for_post(
                 post_text=post.post_text,
-                image_description=post.image_description,
+                image_description=image_description,
                 insurance_type=post.insurance_type_focus.value if post.insurance_type_focus else None
             )
             
-            # Update post with new image URL
+            # Update post with new description and image URL
+            post.image_description = image_description
             post.image_url = image_url
             
             # Track API usage
-            api_usage = APIUsage(
+            usage_recorder.record(
                 agent_id=agent.id,
                 endpoint='regenerate_image',
-                tokens_used=0,
-                cost=0.04
+                usage=usage
             )
-            db.session.add(api_usage)
             
-            db.session.commit()
+            run_blocking(db.session.commit)
             
             return jsonify({
                 'message': 'Image regenerated successfully',
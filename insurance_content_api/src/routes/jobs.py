@@ -0,0 +1,69 @@
+from flask import Blueprint, request, jsonify
+from src.models.insurance_models import db, Job
+from src.routes.auth import require_auth
+from src.services.job_queue import job_queue
+
+jobs_bp = Blueprint('jobs', __name__)
+
+@jobs_bp.route('', methods=['GET'])
+@require_auth
+def get_jobs(agent):
+    """List the agent's recent jobs"""
+    try:
+        limit = min(request.args.get('limit', 20, type=int), 100)
+        query = Job.query.filter_by(agent_id=agent.id)
+
+        status = request.args.get('status')
+        if status:
+            query = query.filter_by(status=status)
+
+        jobs = query.order_by(Job.created_at.desc()).limit(limit).all()
+
+        return jsonify({
+            'jobs': [job.to_dict() for job in jobs]
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': 'Failed to get jobs', 'details': str(e)}), 500
+
+@jobs_bp.route('/<int:job_id>', methods=['GET'])
+@require_auth
+def get_job(agent, job_id):
+    """Get a job's status, per-post progress and result"""
+    try:
+        job = Job.query.filter_by(id=job_id, agent_id=agent.id).first()
+
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+
+        response = jsonify({'job': job.to_dict()})
+        if job.status in ('queued', 'running'):
+            response.headers['Retry-After'] = '2'
+        return response, 200
+
+    except Exception as e:
+        return jsonify({'error': 'Failed to get job', 'details': str(e)}), 500
+
+@jobs_bp.route('/<int:job_id>/retry', methods=['POST'])
+@require_auth
+def retry_job(agent, job_id):
+    """Re-queue a dead-lettered job"""
+    try:
+        job = Job.query.filter_by(id=job_id, agent_id=agent.id).first()
+
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+
+        if job.status != 'dead':
+            return jsonify({'error': 'Only failed jobs can be retried'}), 409
+
+        job = job_queue.retry(job)
+
+        return jsonify({
+            'message': 'Job queued for retry',
+            'job': job.to_dict()
+        }), 202
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Failed to retry job', 'details': str(e)}), 500
@@ -1,16 +1,16 @@
-from flask import Blueprint, request, jsonify
-from src.models.insurance_models import db, Agent, SubscriptionStatus
+from flask import Blueprint, request, jsonify, current_app
+from src.models.insurance_models import db, Agent, SubscriptionStatus, SubscriptionMirror
 from src.routes.auth import require_auth
-import stripe
+from src.services.agent_cache import agent_cache
+from src.services.webhook_processor import webhook_processor
+from src.services.subscription_sync import upsert_mirror, refresh_mirror
+from src.services.stripe_client import stripe
 import os
 from datetime import datetime, timedelta
 import logging
 
 subscription_bp = Blueprint('subscription', __name__)
 
-# Initialize Stripe
-stripe.api_key = os.getenv('STRIPE_SECRET_KEY', 'sk_test_placeholder')
-
 # Subscription pricing (in cents)
 MONTHLY_PRICE = 2997  # $29.97/month
 ANNUAL_PRICE = 29997  # $299.97/year (save $60)
@@ -43,6 +43,7 @@ def create_checkout_session(agent):
                 stripe_customer = None
         
         if not stripe_customer:
+            db_agent = Agent.query.get(agent.id)
             stripe_customer = stripe.Customer.create(
                 email=agent.email,
                 name=f"{agent.first_name} {agent.last_name}",
@@ -51,8 +52,9 @@ def create_checkout_session(agent):
                     'trial_end_date': agent.trial_end_date.isoformat() if agent.trial_end_date else None
                 }
             )
-            agent.stripe_customer_id = stripe_customer.id
+            db_agent.stripe_customer_id = stripe_customer.id
             db.session.commit()
+            agent_cache.invalidate(agent.id)
         
         # Create checkout session
         checkout_session = stripe.checkout.Session.create(
@@ -128,6 +130,7 @@ def subscription_success():
                     agent.subscription_end_date = datetime.utcnow() + timedelta(days=30)
                 
                 db.session.commit()
+                agent_cache.invalidate(agent.id)
                 
                 return jsonify({
                     'message': 'Subscription activated successfully',
@@ -184,20 +187,20 @@ def get_subscription_status(agent):
             'can_generate_content': agent.can_generate_content()
         }
         
-        # If there's an active Stripe subscription, get additional details
+        # Stripe details come from the local mirror; ?refresh=true re-syncs it first
         if agent.stripe_subscription_id:
-            try:
-                stripe_subscription = stripe.Subscription.retrieve(agent.stripe_subscription_id)
-                subscription_info.update({
-                    'stripe_status': stripe_subscription.status,
-                    'current_period_end': datetime.fromtimestamp(stripe_subscription.current_period_end).isoformat(),
-                    'cancel_at_period_end': stripe_subscription.cancel_at_period_end,
-                    'plan_amount': stripe_subscription.items.data[0].price.unit_amount,
-                    'plan_interval': stripe_subscription.items.data[0].price.recurring.interval
-                })
-            except stripe.error.InvalidRequestError:
-                # Subscription doesn't exist in Stripe
-                pass
+            mirror = None
+            if request.args.get('refresh') == 'true':
+                try:
+                    mirror = refresh_mirror(agent.id, agent.stripe_subscription_id)
+                except stripe.error.InvalidRequestError:
+                    # Subscription doesn't exist in Stripe
+                    db.session.rollback()
+            else:
+                mirror = SubscriptionMirror.query.filter_by(agent_id=agent.id).first()
+            
+            if mirror:
+                subscription_info.update(mirror.to_dict())
         
         return jsonify(subscription_info), 200
         
@@ -214,10 +217,12 @@ def cancel_subscription(agent):
             return jsonify({'error': 'No active subscription found'}), 404
         
         # Cancel the subscription at period end
-        stripe.Subscription.modify(
+        subscription = stripe.Subscription.modify(
             agent.stripe_subscription_id,
             cancel_at_period_end=True
         )
+        upsert_mirror(agent.id, subscription)
+        db.session.commit()
         
         return jsonify({
             'message': 'Subscription will be cancelled at the end of the current period',
@@ -237,10 +242,12 @@ def reactivate_subscription(agent):
             return jsonify({'error': 'No subscription found'}), 404
         
         # Reactivate the subscription
-        stripe.Subscription.modify(
+        subscription = stripe.Subscription.modify(
             agent.stripe_subscription_id,
             cancel_at_period_end=False
         )
+        upsert_mirror(agent.id, subscription)
+        db.session.commit()
         
         return jsonify({
             'message': 'Subscription reactivated successfully',
@@ -256,7 +263,7 @@ def stripe_webhook():
     """Handle Stripe webhooks"""
     payload = request.get_data()
     sig_header = request.headers.get('Stripe-Signature')
-    endpoint_secret = os.getenv('STRIPE_WEBHOOK_SECRET')
+    endpoint_secret = current_app.config.get('STRIPE_WEBHOOK_SECRET') or os.getenv('STRIPE_WEBHOOK_SECRET')
     
     try:
         event = stripe.Webhook.construct_event(
@@ -269,7 +276,18 @@ def stripe_webhook():
         # Invalid signature
         return jsonify({'error': 'Invalid signature'}), 400
     
-    # Handle the event
+    # Record the event (deduplicated by event id) and ack; workers apply it
+    data_object = event['data']['object']
+    customer_id = data_object['customer'] if 'customer' in data_object else None
+    if not webhook_processor.record(event['id'], event['type'], customer_id, payload.decode('utf-8')):
+        return jsonify({'status': 'duplicate'}), 200
+    
+    webhook_processor.submit(event['id'], customer_id)
+    
+    return jsonify({'status': 'success'}), 200
+
+def process_stripe_event(event):
+    """Apply a recorded webhook event; raises so the processor can retry"""
     if event['type'] == 'customer.subscription.updated':
         subscription = event['data']['object']
         handle_subscription_updated(subscription)
@@ -282,8 +300,8 @@ def stripe_webhook():
     elif event['type'] == 'invoice.payment_failed':
         invoice = event['data']['object']
         handle_payment_failed(invoice)
-    
-    return jsonify({'status': 'success'}), 200
+
+webhook_processor.set_handler(process_stripe_event)
 
 def handle_subscription_updated(subscription):
     """Handle subscription update webhook"""
@@ -303,10 +321,14 @@ def handle_subscription_updated(subscription):
                 # Update subscription end date
                 agent.subscription_end_date = datetime.fromtimestamp(subscription['current_period_end'])
                 
+                upsert_mirror(agent.id, subscription)
                 db.session.commit()
+                agent_cache.invalidate(agent.id)
                 
     except Exception as e:
+        db.session.rollback()
         logging.error(f"Error handling subscription update: {str(e)}")
+        raise
 
 def handle_subscription_deleted(subscription):
     """Handle subscription deletion webhook"""
@@ -317,10 +339,14 @@ def handle_subscription_deleted(subscription):
             if agent:
                 agent.subscription_status = SubscriptionStatus.CANCELLED
                 agent.subscription_end_date = datetime.utcnow()
+                upsert_mirror(agent.id, subscription)
                 db.session.commit()
+                agent_cache.invalidate(agent.id)
                 
     except Exception as e:
+        db.session.rollback()
         logging.error(f"Error handling subscription deletion: {str(e)}")
+        raise
 
 def handle_payment_succeeded(invoice):
     """Handle successful payment webhook"""
@@ -328,17 +354,22 @@ def handle_payment_succeeded(invoice):
         subscription_id = invoice['subscription']
         if subscription_id:
             subscription = stripe.Subscription.retrieve(subscription_id)
-            agent_id = subscription['metadata'].get('agent_id')
+            metadata = subscription['metadata']
+            agent_id = metadata['agent_id'] if 'agent_id' in metadata else None
             
             if agent_id:
                 agent = Agent.query.get(agent_id)
                 if agent:
                     agent.subscription_status = SubscriptionStatus.ACTIVE
                     agent.subscription_end_date = datetime.fromtimestamp(subscription['current_period_end'])
+                    upsert_mirror(agent.id, subscription)
                     db.session.commit()
+                    agent_cache.invalidate(agent.id)
                     
     except Exception as e:
+        db.session.rollback()
         logging.error(f"Error handling payment success: {str(e)}")
+        raise
 
 def handle_payment_failed(invoice):
     """Handle failed payment webhook"""
@@ -346,17 +377,22 @@ def handle_payment_failed(invoice):
         subscription_id = invoice['subscription']
         if subscription_id:
             subscription = stripe.Subscription.retrieve(subscription_id)
-            agent_id = subscription['metadata'].get('agent_id')
+            metadata = subscription['metadata']
+            agent_id = metadata['agent_id'] if 'agent_id' in metadata else None
             
             if agent_id:
                 agent = Agent.query.get(agent_id)
                 if agent:
                     # Mark as expired if payment fails
                     agent.subscription_status = SubscriptionStatus.EXPIRED
+                    upsert_mirror(agent.id, subscription)
                     db.session.commit()
+                    agent_cache.invalidate(agent.id)
                     
     except Exception as e:
+        db.session.rollback()
         logging.error(f"Error handling payment failure: {str(e)}")
+        raise
 
 @subscription_bp.route('/pricing', methods=['GET'])
 def get_pricing():
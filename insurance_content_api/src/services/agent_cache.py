@@ -0,0 +1,147 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import NamedTuple, Optional, Tuple
+
+from flask import current_app
+from src.models.insurance_models import Agent, SubscriptionStatus, ToneType
+from src.services.async_bridge import run_blocking
+
+class AgentSnapshot(NamedTuple):
+    """Immutable copy of the Agent fields authenticated routes read"""
+    id: int
+    email: str
+    first_name: str
+    last_name: str
+    subscription_status: SubscriptionStatus
+    trial_end_date: Optional[datetime]
+    subscription_start_date: Optional[datetime]
+    subscription_end_date: Optional[datetime]
+    stripe_customer_id: Optional[str]
+    stripe_subscription_id: Optional[str]
+    insurance_types: Tuple[str, ...]
+    default_tone: ToneType
+    license_state: Optional[str]
+    created_at: datetime
+
+    @classmethod
+    def from_agent(cls, agent: Agent) -> 'AgentSnapshot':
+        return cls(
+            id=agent.id,
+            email=agent.email,
+            first_name=agent.first_name,
+            last_name=agent.last_name,
+            subscription_status=agent.subscription_status,
+            trial_end_date=agent.trial_end_date,
+            subscription_start_date=agent.subscription_start_date,
+            subscription_end_date=agent.subscription_end_date,
+            stripe_customer_id=agent.stripe_customer_id,
+            stripe_subscription_id=agent.stripe_subscription_id,
+            insurance_types=tuple(json.loads(agent.insurance_types)) if agent.insurance_types else (),
+            default_tone=agent.default_tone,
+            license_state=agent.license_state,
+            created_at=agent.created_at
+        )
+
+    def get_insurance_types(self):
+        """Get insurance types as a list"""
+        return list(self.insurance_types)
+
+    def is_trial_active(self):
+        """Check if trial period is still active"""
+        return (self.subscription_status == SubscriptionStatus.TRIAL and
+                datetime.utcnow() <= self.trial_end_date)
+
+    def is_subscription_active(self):
+        """Check if subscription is active (including trial)"""
+        return self.subscription_status == SubscriptionStatus.ACTIVE or self.is_trial_active()
+
+    def can_generate_content(self):
+        """Check if agent can generate content (active subscription or trial)"""
+        return self.is_subscription_active()
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'email': self.email,
+            'first_name': self.first_name,
+            'last_name': self.last_name,
+            'subscription_status': self.subscription_status.value,
+            'trial_end_date': self.trial_end_date.isoformat() if self.trial_end_date else None,
+            'insurance_types': self.get_insurance_types(),
+            'default_tone': self.default_tone.value,
+            'license_state': self.license_state,
+            'created_at': self.created_at.isoformat()
+        }
+
+class AgentCache:
+    """Short-TTL, size-bounded, per-process cache of AgentSnapshots.
+
+    Writes that change an agent (profile updates, subscription changes,
+    logout) must call invalidate(); the TTL bounds staleness for changes
+    made by other worker processes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[int, Tuple[float, AgentSnapshot]]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, agent_id: int) -> Optional[AgentSnapshot]:
+        """Return a snapshot for the agent, loading it from the database on a miss"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(agent_id)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(agent_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        agent = run_blocking(Agent.query.get, agent_id)
+        if not agent:
+            return None
+        snapshot = AgentSnapshot.from_agent(agent)
+        self.put(snapshot)
+        return snapshot
+
+    def put(self, snapshot: AgentSnapshot):
+        ttl = current_app.config.get('AGENT_CACHE_TTL', 30)
+        max_size = current_app.config.get('AGENT_CACHE_MAX_SIZE', 10000)
+        if ttl <= 0:
+            return
+
+        with self._lock:
+            self._entries[snapshot.id] = (time.monotonic() + ttl, snapshot)
+            self._entries.move_to_end(snapshot.id)
+            while len(self._entries) > max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, agent_id):
+        """Drop one agent's snapshot after a write"""
+        if agent_id is None:
+            return
+        with self._lock:
+            self._entries.pop(int(agent_id), None)
+            self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'hit_ratio': self.hits / lookups if lookups else 0.0
+            }
+
+agent_cache = AgentCache()
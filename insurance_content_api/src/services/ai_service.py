@@ -1,148 +1,228 @@
-import openai
+import asyncio
+import logging
 import os
 import json
-import requests
+import time
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
-import random
+from functools import lru_cache
+from typing import List, Any, Optional, Tuple
+from flask import current_app
+from pydantic import ValidationError
+from src.models.insurance_models import InsuranceType
+from src.models.post_schemas import (AIPost, AIPostList, EnhancedPost, PostError, RAW_POSTS,
+                                     CONTENT_RESPONSE_FORMAT, validate_post)
+from src.services.metrics import (openai_latency, openai_errors, openai_tokens, openai_truncations, image_latency,
+                                  ai_post_validation_errors, compliance_findings)
+from src.services.async_bridge import is_bridged, await_
+from src.services.tracing import tracer, traced, outbound_headers, current_span
+from src.services.pricing import ModelUsage
+from src.services.model_router import model_router
+from src.services.compliance import compliance_scanner
+from src.services.seasonal_calendar import events_for_week
+from src.services.token_budget import token_budget, check_prompt, estimate_tokens
+from src.services.prompts import CONTENT_SYSTEM_PROMPT, CONTENT_PROMPT_VERSION, CONTENT_PROMPT_CACHE_KEY, content_request
+
+@lru_cache(maxsize=8)
+def get_openai_client(api_key: str):
+    """Shared OpenAI client per API key; the SDK is imported on first use"""
+    import openai
+    return openai.OpenAI(api_key=api_key)
+
+@lru_cache(maxsize=8)
+def get_async_openai_client(api_key: str, loop: asyncio.AbstractEventLoop):
+    """Shared AsyncOpenAI client per API key and event loop"""
+    import openai
+    return openai.AsyncOpenAI(api_key=api_key)
 
 class AIContentService:
     """Service for AI-powered content generation"""
     
+    IMAGE_MODEL = 'dall-e-3'
+    IMAGE_SIZE = '1024x1024'
+    IMAGE_QUALITY = 'standard'
+    
     def __init__(self):
-        self.openai_client = openai.OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        self._openai_client = None
+    
+    @property
+    def openai_client(self):
+        if self._openai_client is None:
+            self._openai_client = get_openai_client(os.getenv('OPENAI_API_KEY'))
+        return self._openai_client
+    
+    def _call_openai(self, operation: str, model: str, call):
+        """Run call(client, headers); under the ASGI server the async client is used and awaited"""
+        with tracer.span(f"openai {operation}", {'openai.model': model}, kind='client') as span:
+            start = time.perf_counter()
+            try:
+                if is_bridged():
+                    client = get_async_openai_client(os.getenv('OPENAI_API_KEY'), asyncio.get_running_loop())
+                    response = await_(call(client, outbound_headers()))
+                else:
+                    response = call(self.openai_client, outbound_headers())
+            except Exception:
+                openai_errors.inc(operation)
+                model_router.observe(model, time.perf_counter() - start, ok=False)
+                raise
+            
+            elapsed = time.perf_counter() - start
+            openai_latency.observe(operation, model, value=elapsed)
+            model_router.observe(model, elapsed, ok=True)
+            usage = getattr(response, 'usage', None)
+            if usage is not None and getattr(usage, 'prompt_tokens', None) is not None:
+                openai_tokens.inc(model, 'prompt', amount=usage.prompt_tokens)
+                openai_tokens.inc(model, 'completion', amount=usage.completion_tokens)
+                cached = ModelUsage.from_completion(model, usage).cached_tokens
+                if cached:
+                    openai_tokens.inc(model, 'cached', amount=cached)
+                span.set_attribute('openai.cached_tokens', cached)
+                span.set_attribute('openai.prompt_tokens', usage.prompt_tokens)
+                span.set_attribute('openai.completion_tokens', usage.completion_tokens)
+            return response
     
+    @traced('ai.generate_weekly_content')
     def generate_weekly_content(self, insurance_types: List[str], tone: str, 
-                              additional_prompt: str, week_start: datetime.date) -> List[Dict[str, Any]]:
-        """Generate a week's worth of social media content"""
+                              additional_prompt: str, week_start: datetime.date,
+                              license_state: str = None) -> Tuple[List[EnhancedPost], ModelUsage]:
+        """Generate a week's worth of social media content, with the call's usage"""
         
         # Generate the content prompt
         prompt = self._create_content_prompt(insurance_types, tone, additional_prompt, week_start)
+        route = model_router.route('weekly_content')
+        system_prompt = self._get_system_prompt()
+        
+        # Completion budget learned from responses of the same shape (services/token_budget.py)
+        shape = ('weekly_content', route.model, len(insurance_types), bool(additional_prompt))
+        prompt_estimate = check_prompt(shape, system_prompt, prompt)
+        max_tokens = token_budget.budget(shape)
+        
+        # Models that support it are held to the post schema (models/post_schemas.py)
+        structured = self._supports_structured_output(route.model)
+        response_options = {'response_format': CONTENT_RESPONSE_FORMAT} if structured else {}
         
         try:
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": self._get_system_prompt()},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=3500,
-                temperature=0.7
-            )
+            usage = None
+            retried = False
+            while True:
+                response = self._call_openai('chat.completions', route.model, lambda client, headers: client.chat.completions.create(
+                    model=route.model,
+                    # Static system prompt first, so its prefix is served from the upstream cache
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": prompt}
+                    ],
+                    max_tokens=max_tokens,
+                    temperature=0.7,
+                    prompt_cache_key=CONTENT_PROMPT_CACHE_KEY,
+                    extra_headers=headers,
+                    **response_options
+                ))
+                
+                # The response names the exact snapshot that served the call (e.g. gpt-4-0613)
+                model = getattr(response, 'model', None) or route.model
+                call_usage = ModelUsage.from_completion(model, response.usage, CONTENT_PROMPT_VERSION)
+                usage = call_usage if usage is None else usage.combined(call_usage)
+                token_budget.record(shape, call_usage.completion_tokens)
+                
+                # A truncated response is cut mid-JSON; retry once with room to finish
+                if response.choices[0].finish_reason != 'length':
+                    break
+                openai_truncations.inc(route.model)
+                retry_tokens = token_budget.retry_budget(max_tokens)
+                if retry_tokens is None or retried:
+                    logging.warning(f"Content response truncated at {max_tokens} tokens, not retrying")
+                    break
+                logging.warning(f"Content response truncated at {max_tokens} tokens, retrying with {retry_tokens}")
+                max_tokens = retry_tokens
+                retried = True
+            
+            span = current_span()
+            if span is not None:
+                span.set_attribute('openai.max_tokens', max_tokens)
+                span.set_attribute('openai.prompt_tokens_estimate', prompt_estimate)
+                span.set_attribute('openai.structured_output', structured)
             
             content_text = response.choices[0].message.content
             
-            # Parse the JSON response
-            posts_data = self._parse_ai_response(content_text)
+            # Parse and validate the JSON response
+            posts, errors = self._parse_ai_response(content_text)
             
             # Enhance posts with additional metadata
-            enhanced_posts = self._enhance_posts(posts_data, week_start, insurance_types)
+            enhanced_posts = self._enhance_posts(posts, week_start, insurance_types, errors, license_state)
+            if errors:
+                self._report_validation_errors(errors)
             
-            return enhanced_posts, response.usage.total_tokens
+            return enhanced_posts, usage
             
         except Exception as e:
             raise Exception(f"Failed to generate content: {str(e)}")
     
+    @traced('ai.generate_image')
     def generate_image_for_post(self, post_text: str, image_description: str, 
-                               insurance_type: str = None) -> str:
-        """Generate an image for a social media post using DALL-E"""
+                               insurance_type: str = None) -> Tuple[str, ModelUsage]:
+        """Generate an image for a social media post using DALL-E, with the call's usage"""
         
         # Create enhanced image prompt
         enhanced_prompt = self._create_image_prompt(post_text, image_description, insurance_type)
+        start = time.perf_counter()
         
         try:
-            response = self.openai_client.images.generate(
-                model="dall-e-3",
+            response = self._call_openai('images.generate', self.IMAGE_MODEL, lambda client, headers: client.images.generate(
+                model=self.IMAGE_MODEL,
                 prompt=enhanced_prompt,
-                size="1024x1024",
-                quality="standard",
-                n=1
-            )
+                size=self.IMAGE_SIZE,
+                quality=self.IMAGE_QUALITY,
+                n=1,
+                extra_headers=headers
+            ))
             
             image_url = response.data[0].url
-            return image_url
+            image_latency.observe('success', value=time.perf_counter() - start)
+            return image_url, ModelUsage.for_images(self.IMAGE_MODEL, self.IMAGE_SIZE, self.IMAGE_QUALITY)
             
         except Exception as e:
+            image_latency.observe('error', value=time.perf_counter() - start)
             raise Exception(f"Failed to generate image: {str(e)}")
     
+    def _supports_structured_output(self, model: str) -> bool:
+        """Whether the model accepts a json_schema response_format (dated snapshots match by prefix)"""
+        return any(model == name or model.startswith(name + '-')
+                   for name in current_app.config.get('STRUCTURED_OUTPUT_MODELS', ()))
+    
+    def expected_content_tokens(self, insurance_types: List[str], tone: str, additional_prompt: str,
+                                week_start: datetime.date) -> int:
+        """Tokens a weekly content request is expected to use: its prompt plus the largest completion budget"""
+        prompt = self._create_content_prompt(insurance_types, tone, additional_prompt, week_start)
+        prompt_tokens = estimate_tokens(self._get_system_prompt()) + estimate_tokens(prompt)
+        completion_tokens = max(
+            token_budget.budget(('weekly_content', model, len(insurance_types), bool(additional_prompt)))
+            for model in model_router.models('weekly_content')
+        )
+        return prompt_tokens + completion_tokens
+    
     def _get_system_prompt(self) -> str:
-        """Get the system prompt for content generation"""
-        return """You are an expert social media content creator specializing in insurance marketing for licensed insurance agents. 
-
-Your expertise includes:
-- Creating compliant, engaging content that builds trust and relationships
-- Understanding insurance regulations and avoiding misleading claims
-- Crafting content that resonates with warm market audiences (friends, family, existing contacts)
-- Incorporating current events, seasonal themes, and life events naturally
-- Balancing educational value with personal connection
-
-Always respond with valid JSON in the exact format requested. Focus on relationship-building rather than direct sales."""
+        """Get the system prompt for content generation (the static, cacheable prefix)"""
+        return CONTENT_SYSTEM_PROMPT
     
+    @traced('ai.build_prompt')
     def _create_content_prompt(self, insurance_types: List[str], tone: str, 
                               additional_prompt: str, week_start: datetime.date) -> str:
-        """Create the detailed prompt for content generation"""
-        
-        # Map insurance types to descriptions
-        insurance_descriptions = {
-            'mortgage_protection': 'Mortgage Protection Insurance - helps pay off mortgage if policyholder dies',
-            'index_universal_life': 'Index Universal Life Insurance - permanent life insurance with investment component',
-            'term_life_living_benefits': 'Term Life Insurance with Living Benefits - temporary coverage with accelerated death benefits',
-            'final_expense': 'Final Expense Insurance - covers funeral and burial costs',
-            'annuities': 'Annuities - retirement income products for secure retirement',
-            'health_insurance': 'Health Insurance - medical coverage and benefits'
-        }
-        
-        selected_types = [insurance_descriptions.get(t, t) for t in insurance_types]
-        types_text = ', '.join(selected_types)
+        """Create the per-request part of the content prompt"""
         
         # Get contextual information
+        week_end = week_start + timedelta(days=6)
         current_month = week_start.strftime('%B')
+        if week_end.month != week_start.month:
+            current_month += f"/{week_end.strftime('%B')}"
         current_season = self._get_season(week_start)
-        week_end = week_start + timedelta(days=6)
         
         # Get relevant events/themes for the time period
         themes = self._get_seasonal_themes(week_start)
         
-        prompt = f"""
-Create 7 social media posts (one for each day from {week_start.strftime('%B %d')} to {week_end.strftime('%B %d, %Y')}) for an insurance agent who specializes in: {types_text}
-
-REQUIREMENTS:
-- Tone: {tone.replace('_', ' ').title()}
-- Target: Warm market (people who already know and trust the agent)
-- Focus: Education, relationship building, trust development
-- Compliance: No misleading claims, avoid pressure tactics
-- Variety: Mix educational, personal, seasonal, and industry insights
-- Current context: {current_month}, {current_season}, {', '.join(themes)}
-
-CONTENT GUIDELINES:
-1. Educational posts: Explain insurance concepts simply
-2. Personal posts: Share relatable stories or experiences
-3. Seasonal posts: Connect insurance to current events/seasons
-4. Industry insights: Share relevant news or trends
-5. Community posts: Highlight local events or causes
-6. Testimonial-style: Share success stories (anonymized)
-7. Question posts: Engage audience with thoughtful questions
-
-Additional requirements: {additional_prompt if additional_prompt else 'None specified'}
-
-RESPONSE FORMAT (JSON array with exactly 7 objects):
-[
-  {{
-    "day": 1,
-    "post_text": "Engaging post text with natural hashtags integrated",
-    "image_description": "Detailed description for AI image generation",
-    "hashtags": ["#InsuranceEducation", "#LifeInsurance", "#FinancialPlanning"],
-    "insurance_focus": "mortgage_protection",
-    "content_theme": "educational",
-    "engagement_hook": "Question or call-to-action to encourage interaction"
-  }}
-]
-
-Ensure each post is unique, valuable, and builds trust without being salesy.
-"""
-        
-        return prompt
+        return content_request(week_start, week_end, insurance_types, tone, current_month, current_season,
+                               themes, additional_prompt)
     
+    @traced('ai.build_image_prompt')
     def _create_image_prompt(self, post_text: str, image_description: str, 
                             insurance_type: str = None) -> str:
         """Create an enhanced prompt for image generation"""
@@ -190,57 +270,97 @@ Avoid: Generic stock photos, overly salesy imagery, complex charts, small text
         
         return enhanced_prompt
     
-    def _parse_ai_response(self, content_text: str) -> List[Dict[str, Any]]:
-        """Parse the AI response and extract JSON"""
+    @traced('ai.parse_response')
+    def _parse_ai_response(self, content_text: str) -> Tuple[List[AIPost], List[PostError]]:
+        """Parse and validate the AI response, with any invalid fields per post"""
         try:
-            # Try direct JSON parsing first
-            posts_data = json.loads(content_text)
-            return posts_data
+            # Well-formed responses (always, with structured output) validate straight from the JSON text
+            parsed = RAW_POSTS.validate_json(content_text)
+            return (parsed.posts if isinstance(parsed, AIPostList) else parsed), []
+        except ValidationError:
+            pass
+        
+        # Otherwise find the posts and validate them one by one, so one bad field doesn't lose the week
+        raw_posts = self._extract_posts(content_text)
+        if raw_posts is None:
+            # If all else fails, create fallback content
+            return self._create_fallback_content(), [PostError(0, 'response', 'no JSON array of posts found')]
+        
+        fallback = self._create_fallback_content()
+        posts, errors = [], []
+        for i, raw_post in enumerate(raw_posts[:7]):
+            post, post_errors = validate_post(raw_post, i + 1)
+            errors.extend(post_errors)
+            posts.append(post if post is not None else fallback[i])
+        return posts, errors
+    
+    def _extract_posts(self, content_text: str) -> Optional[List[Any]]:
+        """The list of raw posts in a response, or None"""
+        try:
+            data = json.loads(content_text)
         except json.JSONDecodeError:
             # Try to extract JSON from the response
             import re
             json_match = re.search(r'\[.*\]', content_text, re.DOTALL)
-            if json_match:
-                try:
-                    posts_data = json.loads(json_match.group())
-                    return posts_data
-                except:
-                    pass
-            
-            # If all else fails, create fallback content
-            return self._create_fallback_content()
+            if not json_match:
+                return None
+            try:
+                data = json.loads(json_match.group())
+            except json.JSONDecodeError:
+                return None
+        
+        if isinstance(data, dict):
+            data = data.get('posts')
+        return data if isinstance(data, list) else None
     
-    def _enhance_posts(self, posts_data: List[Dict[str, Any]], week_start: datetime.date, 
-                      insurance_types: List[str]) -> List[Dict[str, Any]]:
-        """Enhance posts with additional metadata and validation"""
+    @traced('ai.enhance_posts')
+    def _enhance_posts(self, posts: List[AIPost], week_start: datetime.date, 
+                      insurance_types: List[str], errors: List[PostError] = None,
+                      license_state: str = None) -> List[EnhancedPost]:
+        """Date the posts, keep them to the requested insurance types, clean their hashtags and check compliance"""
         enhanced_posts = []
         
-        for i, post_data in enumerate(posts_data[:7]):  # Ensure max 7 posts
-            post_date = week_start + timedelta(days=i)
-            
-            # Ensure required fields exist
-            enhanced_post = {
-                'day': i + 1,
-                'post_date': post_date.isoformat(),
-                'post_text': post_data.get('post_text', ''),
-                'image_description': post_data.get('image_description', 'Professional insurance-related image'),
-                'hashtags': post_data.get('hashtags', ['#Insurance', '#FinancialPlanning']),
-                'insurance_focus': post_data.get('insurance_focus', random.choice(insurance_types)),
-                'content_theme': post_data.get('content_theme', 'general'),
-                'engagement_hook': post_data.get('engagement_hook', 'What are your thoughts?')
-            }
-            
-            # Validate and clean hashtags
-            enhanced_post['hashtags'] = self._validate_hashtags(enhanced_post['hashtags'])
+        for i, post in enumerate(posts[:7]):  # Ensure max 7 posts
+            insurance_focus = post.insurance_focus
+            if insurance_focus is None or insurance_focus.value not in insurance_types:
+                if insurance_focus is not None and errors is not None:
+                    errors.append(PostError(i + 1, 'insurance_focus', f"{insurance_focus.value} was not requested"))
+                # Spread posts without a usable focus over the requested types
+                insurance_focus = InsuranceType(insurance_types[i % len(insurance_types)])
             
-            # Ensure insurance focus is valid
-            if enhanced_post['insurance_focus'] not in insurance_types:
-                enhanced_post['insurance_focus'] = random.choice(insurance_types)
+            findings = compliance_scanner.scan(
+                {'post_text': post.post_text, 'image_description': post.image_description},
+                insurance_focus.value, license_state
+            )
+            for finding in findings:
+                compliance_findings.inc(finding.severity)
+            if any(finding.severity == 'prohibited' for finding in findings):
+                logging.warning(f"Post {i + 1} has prohibited phrases: "
+                                f"{', '.join(f.phrase for f in findings if f.severity == 'prohibited')}")
             
-            enhanced_posts.append(enhanced_post)
+            enhanced_posts.append(EnhancedPost(
+                day=i + 1,
+                post_date=week_start + timedelta(days=i),
+                post_text=post.post_text,
+                image_description=post.image_description,
+                hashtags=self._validate_hashtags(post.hashtags),
+                insurance_focus=insurance_focus,
+                content_theme=post.content_theme,
+                engagement_hook=post.engagement_hook,
+                compliance_findings=[finding._asdict() for finding in findings]
+            ))
         
         return enhanced_posts
     
+    def _report_validation_errors(self, errors: List[PostError]):
+        """Log and count invalid fields in a generated week"""
+        for error in errors:
+            ai_post_validation_errors.inc(error.field.split('.')[0])
+        span = current_span()
+        if span is not None:
+            span.set_attribute('ai.validation_errors', len(errors))
+        logging.warning(f"AI response had {len(errors)} invalid fields: {'; '.join(str(e) for e in errors)}")
+    
     def _validate_hashtags(self, hashtags: List[str]) -> List[str]:
         """Validate and clean hashtags"""
         cleaned_hashtags = []
@@ -271,35 +391,16 @@ Avoid: Generic stock photos, overly salesy imagery, complex charts, small text
         else:
             return "Fall"
     
-    def _get_seasonal_themes(self, date: datetime.date) -> List[str]:
-        """Get relevant themes for the time period"""
-        month = date.month
-        themes = []
-        
-        # Monthly themes
-        monthly_themes = {
-            1: ["New Year resolutions", "fresh starts", "financial planning"],
-            2: ["Heart health", "Valentine's Day", "love and protection"],
-            3: ["Spring cleaning", "renewal", "Women's History Month"],
-            4: ["Easter", "spring renewal", "tax season"],
-            5: ["Mother's Day", "graduation season", "spring activities"],
-            6: ["Father's Day", "graduation", "summer planning"],
-            7: ["summer vacation", "family time", "Independence Day"],
-            8: ["back to school", "summer activities", "family preparation"],
-            9: ["Life Insurance Awareness Month", "back to school", "fall preparation"],
-            10: ["Halloween", "autumn", "Breast Cancer Awareness"],
-            11: ["Thanksgiving", "gratitude", "family gatherings"],
-            12: ["holidays", "year-end planning", "family traditions"]
-        }
-        
-        themes.extend(monthly_themes.get(month, ["general financial wellness"]))
+    def _get_seasonal_themes(self, week_start: datetime.date) -> List[str]:
+        """Holidays, observances and seasons overlapping the week (services/seasonal_calendar.py)"""
+        themes = [event.describe() for event in events_for_week(week_start)]
         
         # Add general themes
         themes.extend(["financial literacy", "family protection", "peace of mind"])
         
         return themes
     
-    def _create_fallback_content(self) -> List[Dict[str, Any]]:
+    def _create_fallback_content(self) -> List[AIPost]:
         """Create fallback content if AI generation fails"""
         fallback_posts = [
             {
@@ -307,7 +408,6 @@ Avoid: Generic stock photos, overly salesy imagery, complex charts, small text
                 "post_text": "Starting the week thinking about the importance of protecting what matters most. Your family, your home, your future - they all deserve the security that comes with proper planning. What's your biggest financial priority right now? #FinancialPlanning #FamilyFirst",
                 "image_description": "Warm family scene with protection theme",
                 "hashtags": ["#FinancialPlanning", "#FamilyFirst", "#Insurance"],
-                "insurance_focus": "term_life_living_benefits",
                 "content_theme": "educational",
                 "engagement_hook": "What's your biggest financial priority right now?"
             },
@@ -316,23 +416,21 @@ Avoid: Generic stock photos, overly salesy imagery, complex charts, small text
                 "post_text": "Did you know that many people are just one unexpected event away from financial hardship? It's not about being pessimistic - it's about being prepared. Small steps today can make a huge difference tomorrow. #FinancialWisdom #BePrepared",
                 "image_description": "Umbrella protecting from storm, financial security concept",
                 "hashtags": ["#FinancialWisdom", "#BePrepared", "#Insurance"],
-                "insurance_focus": "mortgage_protection",
                 "content_theme": "educational",
                 "engagement_hook": "What small step will you take today?"
             }
             # Add more fallback posts as needed...
         ]
         
-        # Generate 7 days of content
+        # Generate 7 days of content (no insurance focus, so posts are spread over the requested types)
         while len(fallback_posts) < 7:
             fallback_posts.append({
                 "day": len(fallback_posts) + 1,
                 "post_text": f"Day {len(fallback_posts) + 1}: Remember, financial planning isn't just about money - it's about peace of mind and protecting the people you love. #FinancialPlanning #PeaceOfMind",
                 "image_description": "Professional financial planning concept",
                 "hashtags": ["#FinancialPlanning", "#PeaceOfMind", "#Insurance"],
-                "insurance_focus": "final_expense",
                 "content_theme": "general",
                 "engagement_hook": "How do you find peace of mind in your financial planning?"
             })
         
-        return fallback_posts[:7]
+        return [AIPost.model_validate(post) for post in fallback_posts[:7]]
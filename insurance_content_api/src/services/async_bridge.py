@@ -0,0 +1,82 @@
+"""Let synchronous Flask views wait on coroutines without holding a thread.
+
+Under the ASGI server (src/asgi.py) views marked with @awaits_upstream are
+run by run_bridged() in a greenlet on the event loop thread. When such a
+view reaches a slow upstream call, await_() suspends the greenlet and hands
+the coroutine to the event loop; the view resumes with its result. In the
+meantime the loop keeps serving other requests, so hundreds of pending
+OpenAI calls cost a greenlet each rather than a worker or thread each.
+
+Outside the ASGI server is_bridged() is False and code takes its normal
+synchronous path, so the same views work under any WSGI server.
+
+Everything else a bridged view does runs on the event loop thread, so
+blocking work (database queries and commits) goes through run_blocking(),
+which runs it on the server's thread pool while the greenlet waits. Suspend
+hooks registered with on_suspend() run before each upstream wait, e.g. to
+commit or roll back the request's session and give its DB connection back.
+"""
+import asyncio
+import contextvars
+import functools
+import sys
+
+import greenlet
+
+_suspend_hooks = []
+_executor = None  # None = the event loop's default executor
+
+class _BridgedGreenlet(greenlet.greenlet):
+    pass
+
+def awaits_upstream(f):
+    """Mark a view that spends most of its time waiting on an upstream API"""
+    f.awaits_upstream = True
+    return f
+
+def on_suspend(hook):
+    """Register a callable run before a bridged view suspends"""
+    _suspend_hooks.append(hook)
+    return hook
+
+def set_executor(executor):
+    """Thread pool used by run_blocking()"""
+    global _executor
+    _executor = executor
+
+def is_bridged() -> bool:
+    return isinstance(greenlet.getcurrent(), _BridgedGreenlet)
+
+def await_(awaitable):
+    """Wait for an awaitable from sync code running under run_bridged()"""
+    current = greenlet.getcurrent()
+    if not isinstance(current, _BridgedGreenlet):
+        raise RuntimeError('await_() called outside of run_bridged()')
+
+    for hook in _suspend_hooks:
+        hook()
+    return current.parent.switch(awaitable)
+
+def run_blocking(fn, *args, **kwargs):
+    """Call fn off the event loop when bridged (in the caller's context), directly otherwise"""
+    current = greenlet.getcurrent()
+    if not isinstance(current, _BridgedGreenlet):
+        return fn(*args, **kwargs)
+
+    # The copied context carries the Flask app context, so fn sees the same DB session.
+    # Suspend hooks are skipped: fn uses the session rather than waiting on an upstream.
+    call = functools.partial(contextvars.copy_context().run, fn, *args, **kwargs)
+    return current.parent.switch(asyncio.get_running_loop().run_in_executor(_executor, call))
+
+async def run_bridged(fn, *args, **kwargs):
+    """Run fn(*args, **kwargs) on the event loop, awaiting whatever it passes to await_()"""
+    bridged = _BridgedGreenlet(fn, greenlet.getcurrent())
+    result = bridged.switch(*args, **kwargs)
+    while not bridged.dead:
+        try:
+            value = await result
+        except BaseException:
+            result = bridged.throw(*sys.exc_info())
+        else:
+            result = bridged.switch(value)
+    return result
@@ -0,0 +1,166 @@
+"""Compliance phrase scanning for generated posts.
+
+COMPLIANCE_PHRASES (config) maps a scope to prohibited and warning
+phrases. A scope is 'all', an insurance type, or a two-letter state code;
+a post is checked against 'all', its insurance type and the agent's
+license state. The default lists are a starting point for the agency's
+compliance review, not legal advice.
+
+Each (insurance type, state) combination compiles its phrases once into an
+Aho-Corasick automaton, flattened into a DFA (one dict lookup per
+character, no failure-link walks), so a post is scanned in a single pass
+whatever the number of phrases. Matching is case-insensitive, treats curly
+quotes and dashes like their ASCII forms and any run of whitespace like a
+single space ('risk  free' and 'risk\nfree' match 'risk free'), and only
+counts whole words: 'guarantee' does not match inside 'guaranteed'.
+
+Findings are stored on the post (social_media_posts.compliance_findings);
+posts are saved either way, so agents can review flagged ones.
+"""
+import re
+import threading
+from collections import deque
+from typing import Dict, List, NamedTuple, Optional
+
+from flask import current_app
+
+SEVERITIES = ('prohibited', 'warning')
+
+# Same length as the original characters, so match offsets stay valid
+_NORMALIZE = str.maketrans({'\u2018': "'", '\u2019': "'", '\u201c': '"', '\u201d': '"',
+                            '\u2013': '-', '\u2014': '-', '\u00a0': ' '})
+
+_WHITESPACE = re.compile(r'\s+')
+_IRREGULAR_WHITESPACE = re.compile(r'\s\s|[^\S ]')
+
+def _collapse_whitespace(text: str):
+    """text with each whitespace run as one space, and the index in text of each of its characters"""
+    parts, index = [], []
+    position = 0
+    for match in _WHITESPACE.finditer(text):
+        start, end = match.span()
+        parts.append(text[position:start])
+        index.extend(range(position, start))
+        parts.append(' ')
+        index.append(start)
+        position = end
+    parts.append(text[position:])
+    index.extend(range(position, len(text)))
+    return ''.join(parts), index
+
+class Finding(NamedTuple):
+    field: str
+    phrase: str
+    severity: str
+    start: int
+
+class PhraseAutomaton:
+    """Aho-Corasick automaton over lowercase phrases, each with a severity"""
+
+    def __init__(self, phrases: Dict[str, str]):
+        goto = [{}]
+        outputs = [[]]
+        for phrase, severity in phrases.items():
+            state = 0
+            for char in phrase:
+                if char not in goto[state]:
+                    goto.append({})
+                    outputs.append([])
+                    goto[state][char] = len(goto) - 1
+                state = goto[state][char]
+            outputs[state].append((phrase, severity))
+
+        # Breadth-first: each state's transitions are its failure state's, overridden by its own
+        self.delta = [dict(goto[0])]
+        self.delta.extend({} for _ in range(len(goto) - 1))
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in goto[state].items():
+                if state:
+                    fail[child] = self.delta[fail[state]].get(char, 0)
+                queue.append(child)
+            if state:
+                outputs[state] = outputs[state] + outputs[fail[state]]
+                self.delta[state] = {**self.delta[fail[state]], **goto[state]}
+        self.outputs = [tuple(out) for out in outputs]
+
+    def scan(self, text: str):
+        """Yield (start, end, phrase, severity) for whole-word matches, as offsets into text"""
+        lowered = text.lower().translate(_NORMALIZE)
+        if len(lowered) != len(text):
+            # A few characters change length when lowercased; match on a same-length copy
+            lowered = ''.join(c.lower() if len(c.lower()) == 1 else c for c in text).translate(_NORMALIZE)
+        index = None
+        if _IRREGULAR_WHITESPACE.search(lowered):
+            # Phrases are stored with single spaces; offsets are mapped back through index
+            lowered, index = _collapse_whitespace(lowered)
+        delta, outputs = self.delta, self.outputs
+        state = 0
+        for end, char in enumerate(lowered):
+            state = delta[state].get(char, 0)
+            if outputs[state]:
+                for phrase, severity in outputs[state]:
+                    start = end - len(phrase) + 1
+                    if (start == 0 or not lowered[start - 1].isalnum()) and \
+                            (end + 1 == len(lowered) or not lowered[end + 1].isalnum()):
+                        if index is None:
+                            yield start, end + 1, phrase, severity
+                        else:
+                            yield index[start], index[end] + 1, phrase, severity
+
+class ComplianceScanner:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._automata = {}  # (insurance type, state) -> PhraseAutomaton
+
+    def automaton(self, insurance_type: Optional[str], state: Optional[str]) -> PhraseAutomaton:
+        key = (insurance_type, state.upper() if state else None)
+        automaton = self._automata.get(key)
+        if automaton is None:
+            automaton = PhraseAutomaton(self._phrases(*key))
+            with self._lock:
+                self._automata[key] = automaton
+        return automaton
+
+    def _phrases(self, insurance_type, state) -> Dict[str, str]:
+        """phrase -> severity across the applicable scopes; prohibited wins over warning"""
+        config = current_app.config.get('COMPLIANCE_PHRASES', {})
+        phrases = {}
+        for scope in ('all', insurance_type, state):
+            for severity in SEVERITIES:
+                for phrase in config.get(scope, {}).get(severity, ()):
+                    phrase = ' '.join(phrase.lower().translate(_NORMALIZE).split())
+                    if phrase and phrases.get(phrase) != 'prohibited':
+                        phrases[phrase] = severity
+        return phrases
+
+    def scan(self, fields: Dict[str, str], insurance_type: str = None, state: str = None) -> List[Finding]:
+        """Findings in each named text field, one per phrase and field.
+
+        A phrase inside a longer match of the same or a stricter severity
+        ('free' in 'risk-free') is not reported separately; a prohibited
+        phrase inside a warning one still is.
+        """
+        automaton = self.automaton(insurance_type, state)
+        findings = []
+        for field, text in fields.items():
+            matches = list(automaton.scan(text or ''))
+            seen = set()
+            for start, end, phrase, severity in matches:
+                rank = SEVERITIES.index(severity)
+                if phrase in seen or any(other_start <= start and end <= other_end and other != phrase
+                                         and SEVERITIES.index(other_severity) <= rank
+                                         for other_start, other_end, other, other_severity in matches):
+                    continue
+                seen.add(phrase)
+                findings.append(Finding(field, phrase, severity, start))
+        return findings
+
+    def reset(self):
+        """Drop compiled automata, e.g. after changing COMPLIANCE_PHRASES"""
+        with self._lock:
+            self._automata.clear()
+
+compliance_scanner = ComplianceScanner()
@@ -0,0 +1,75 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+from src.models.insurance_models import db, Agent, SubscriptionStatus
+from src.services.agent_cache import agent_cache
+
+def sweep_expired_entitlements(now=None, grace_period=timedelta(0)):
+    """Move expired trials and lapsed subscriptions to EXPIRED with set-based UPDATEs.
+
+    Returns a dict with the number of trials and subscriptions expired.
+    """
+    now = now or datetime.utcnow()
+    agents = Agent.__table__
+
+    expired_trials = db.session.execute(
+        agents.update().where(
+            agents.c.subscription_status == SubscriptionStatus.TRIAL,
+            agents.c.trial_end_date < now
+        ).values(subscription_status=SubscriptionStatus.EXPIRED, updated_at=now)
+    ).rowcount
+
+    # Renewals push subscription_end_date forward through the payment webhooks,
+    # so an end date past the grace period means the subscription lapsed
+    lapsed_subscriptions = db.session.execute(
+        agents.update().where(
+            agents.c.subscription_status == SubscriptionStatus.ACTIVE,
+            agents.c.subscription_end_date < now - grace_period
+        ).values(subscription_status=SubscriptionStatus.EXPIRED, updated_at=now)
+    ).rowcount
+
+    db.session.commit()
+
+    if expired_trials or lapsed_subscriptions:
+        agent_cache.clear()
+
+    return {'expired_trials': expired_trials, 'lapsed_subscriptions': lapsed_subscriptions}
+
+class EntitlementSweeper:
+    """Runs sweep_expired_entitlements every ENTITLEMENT_SWEEP_INTERVAL seconds"""
+
+    def __init__(self):
+        self.app = None
+        self._thread = None
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['entitlement_sweeper'] = self
+
+    def start(self):
+        """Start the sweep thread if ENTITLEMENT_SWEEP_INTERVAL is set"""
+        interval = self.app.config.get('ENTITLEMENT_SWEEP_INTERVAL', 300)
+        if interval and self._thread is None:
+            self._thread = threading.Thread(target=self._run, args=(interval,),
+                                            name='entitlement-sweeper', daemon=True)
+            self._thread.start()
+
+    def sweep(self):
+        grace_period = timedelta(seconds=self.app.config.get('ENTITLEMENT_GRACE_PERIOD', 3 * 24 * 3600))
+        with self.app.app_context():
+            result = sweep_expired_entitlements(grace_period=grace_period)
+        if result['expired_trials'] or result['lapsed_subscriptions']:
+            logging.info(f"Entitlement sweep: {result}")
+        return result
+
+    def _run(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                logging.error(f"Entitlement sweep error: {str(e)}")
+
+entitlement_sweeper = EntitlementSweeper()
@@ -0,0 +1,278 @@
+"""Local stand-in for the parts of the Stripe API this app uses.
+
+Enabled with STRIPE_BACKEND = 'fake'. Covers customers, checkout sessions,
+subscriptions, the billing portal and webhook signature verification, all
+held in process memory. WebhookEventGenerator builds and signs realistic
+event sequences (with the same ``t=...,v1=...`` scheme Stripe uses, so the
+real SDK verifies them too) and replays them at a configurable rate.
+"""
+import hashlib
+import hmac
+import itertools
+import json
+import random
+import secrets
+import threading
+import time
+
+class FakeStripeObject(dict):
+    """Dict with attribute access, like stripe.StripeObject"""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    @classmethod
+    def wrap(cls, value):
+        if isinstance(value, dict):
+            return cls({k: cls.wrap(v) for k, v in value.items()})
+        if isinstance(value, list):
+            return [cls.wrap(v) for v in value]
+        return value
+
+class _Errors:
+    class StripeError(Exception):
+        pass
+
+    class InvalidRequestError(StripeError):
+        pass
+
+    class SignatureVerificationError(StripeError):
+        pass
+
+def _new_id(prefix):
+    return f"{prefix}_{secrets.token_hex(12)}"
+
+def compute_signature(payload: str, secret: str, timestamp: int) -> str:
+    return hmac.new(secret.encode('utf-8'), f"{timestamp}.{payload}".encode('utf-8'), hashlib.sha256).hexdigest()
+
+def sign_payload(payload: str, secret: str, timestamp: int = None) -> str:
+    """Build a Stripe-Signature header for a payload"""
+    timestamp = timestamp or int(time.time())
+    return f"t={timestamp},v1={compute_signature(payload, secret, timestamp)}"
+
+class FakeStripe:
+    """In-memory Stripe API with the SDK's module layout"""
+
+    error = _Errors
+
+    def __init__(self, base_url='http://localhost:12111'):
+        self.base_url = base_url
+        self._lock = threading.Lock()
+        self.customers = {}
+        self.checkout_sessions = {}
+        self.subscriptions = {}
+
+        fake = self
+
+        class Customer:
+            @staticmethod
+            def create(email=None, name=None, metadata=None, **kwargs):
+                return fake._store(fake.customers, {
+                    'id': _new_id('cus'), 'object': 'customer',
+                    'email': email, 'name': name, 'metadata': metadata or {}
+                })
+
+            @staticmethod
+            def retrieve(customer_id, **kwargs):
+                return fake._get(fake.customers, customer_id, 'customer')
+
+        class CheckoutSession:
+            @staticmethod
+            def create(customer=None, line_items=None, mode='subscription', success_url='', cancel_url='',
+                       metadata=None, subscription_data=None, **kwargs):
+                session_id = _new_id('cs_test')
+                return fake._store(fake.checkout_sessions, {
+                    'id': session_id, 'object': 'checkout.session',
+                    'customer': customer, 'mode': mode,
+                    'url': f"{fake.base_url}/checkout/{session_id}",
+                    'success_url': success_url.replace('{CHECKOUT_SESSION_ID}', session_id),
+                    'cancel_url': cancel_url,
+                    'payment_status': 'unpaid', 'status': 'open',
+                    'subscription': None,
+                    'metadata': metadata or {},
+                    'line_items': line_items or [],
+                    'subscription_data': subscription_data or {}
+                })
+
+            @staticmethod
+            def retrieve(session_id, **kwargs):
+                return fake._get(fake.checkout_sessions, session_id, 'checkout session')
+
+        class PortalSession:
+            @staticmethod
+            def create(customer=None, return_url=None, **kwargs):
+                fake._get(fake.customers, customer, 'customer')
+                session_id = _new_id('bps')
+                return FakeStripeObject.wrap({
+                    'id': session_id, 'object': 'billing_portal.session',
+                    'customer': customer, 'return_url': return_url,
+                    'url': f"{fake.base_url}/portal/{session_id}"
+                })
+
+        class Subscription:
+            @staticmethod
+            def retrieve(subscription_id, **kwargs):
+                return fake._get(fake.subscriptions, subscription_id, 'subscription')
+
+            @staticmethod
+            def modify(subscription_id, **kwargs):
+                return fake.update_subscription(subscription_id, **kwargs)
+
+        class Webhook:
+            @staticmethod
+            def construct_event(payload, sig_header, secret, tolerance=300):
+                if isinstance(payload, bytes):
+                    payload = payload.decode('utf-8')
+                try:
+                    parts = dict(item.split('=', 1) for item in (sig_header or '').split(','))
+                    timestamp = int(parts['t'])
+                except (ValueError, KeyError):
+                    raise _Errors.SignatureVerificationError('Unable to extract timestamp and signatures')
+                if not hmac.compare_digest(parts.get('v1', ''), compute_signature(payload, secret or '', timestamp)):
+                    raise _Errors.SignatureVerificationError('No signatures found matching the expected signature')
+                if tolerance and timestamp < time.time() - tolerance:
+                    raise _Errors.SignatureVerificationError('Timestamp outside the tolerance zone')
+                return FakeStripeObject.wrap(json.loads(payload))
+
+        self.Customer = Customer
+        self.Subscription = Subscription
+        self.Webhook = Webhook
+        self.checkout = type('checkout', (), {'Session': CheckoutSession})
+        self.billing_portal = type('billing_portal', (), {'Session': PortalSession})
+
+    # Store helpers
+
+    def _store(self, table, data):
+        obj = FakeStripeObject.wrap(data)
+        with self._lock:
+            table[obj['id']] = obj
+        return obj
+
+    def _get(self, table, object_id, kind):
+        with self._lock:
+            obj = table.get(object_id)
+        if obj is None:
+            raise _Errors.InvalidRequestError(f"No such {kind}: '{object_id}'")
+        return obj
+
+    # Test-driver operations (what a customer or Stripe itself would do)
+
+    def create_subscription(self, customer_id, amount=2997, interval='month', metadata=None, status='active'):
+        now = int(time.time())
+        period = 365 * 86400 if interval == 'year' else 30 * 86400
+        return self._store(self.subscriptions, {
+            'id': _new_id('sub'), 'object': 'subscription',
+            'customer': customer_id, 'status': status,
+            'current_period_start': now, 'current_period_end': now + period,
+            'cancel_at_period_end': False,
+            'metadata': metadata or {},
+            'items': {'object': 'list', 'data': [{
+                'id': _new_id('si'),
+                'price': {'unit_amount': amount, 'currency': 'usd', 'recurring': {'interval': interval}}
+            }]}
+        })
+
+    def update_subscription(self, subscription_id, **fields):
+        subscription = self._get(self.subscriptions, subscription_id, 'subscription')
+        with self._lock:
+            subscription.update(FakeStripeObject.wrap(fields))
+        return subscription
+
+    def complete_checkout(self, session_id):
+        """Simulate the customer paying for a checkout session"""
+        session = self._get(self.checkout_sessions, session_id, 'checkout session')
+        price = session['line_items'][0]['price_data'] if session['line_items'] else {}
+        subscription = self.create_subscription(
+            session['customer'],
+            amount=price.get('unit_amount', 2997),
+            interval=price.get('recurring', {}).get('interval', 'month'),
+            metadata=dict(session['subscription_data'].get('metadata', {}))
+        )
+        with self._lock:
+            session.update({'payment_status': 'paid', 'status': 'complete', 'subscription': subscription['id']})
+        return session
+
+    def reset(self):
+        with self._lock:
+            self.customers.clear()
+            self.checkout_sessions.clear()
+            self.subscriptions.clear()
+
+class WebhookEventGenerator:
+    """Builds signed webhook events and replays them against an endpoint"""
+
+    def __init__(self, secret, stripe_api=None):
+        self.secret = secret
+        self.stripe = stripe_api
+        self._counter = itertools.count(1)
+
+    def event(self, event_type, data_object):
+        return {
+            'id': f"evt_{secrets.token_hex(8)}{next(self._counter)}",
+            'object': 'event',
+            'type': event_type,
+            'created': int(time.time()),
+            'data': {'object': json.loads(json.dumps(data_object))}
+        }
+
+    def sign(self, event):
+        """Serialize an event and return (payload, headers)"""
+        payload = json.dumps(event)
+        return payload, {'Stripe-Signature': sign_payload(payload, self.secret), 'Content-Type': 'application/json'}
+
+    def subscription_lifecycle(self, subscription, renewals=2, fail_payment=False, cancel=False):
+        """A realistic event sequence for one subscription, in delivery order"""
+        invoice = {'object': 'invoice', 'customer': subscription['customer'], 'subscription': subscription['id']}
+        events = [
+            self.event('customer.subscription.created', subscription),
+            self.event('invoice.payment_succeeded', dict(invoice, id=_new_id('in')))
+        ]
+
+        for _ in range(renewals):
+            period_end = subscription['current_period_end'] + 30 * 86400
+            subscription = self._update(subscription, current_period_end=period_end)
+            events.append(self.event('invoice.payment_succeeded', dict(invoice, id=_new_id('in'))))
+            events.append(self.event('customer.subscription.updated', subscription))
+
+        if fail_payment:
+            subscription = self._update(subscription, status='past_due')
+            events.append(self.event('invoice.payment_failed', dict(invoice, id=_new_id('in'))))
+            events.append(self.event('customer.subscription.updated', subscription))
+
+        if cancel:
+            subscription = self._update(subscription, status='canceled')
+            events.append(self.event('customer.subscription.deleted', subscription))
+
+        return events
+
+    def replay(self, events, send, rate=None, duplicate_rate=0.0):
+        """Deliver events through send(payload, headers) at `rate` events/second.
+
+        With duplicate_rate > 0 a share of events is delivered twice, like
+        Stripe redeliveries. Returns the list of send() results.
+        """
+        results = []
+        interval = 1.0 / rate if rate else 0
+        next_at = time.perf_counter()
+
+        for event in events:
+            deliveries = 2 if duplicate_rate and random.random() < duplicate_rate else 1
+            for _ in range(deliveries):
+                if interval:
+                    delay = next_at - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    next_at += interval
+                payload, headers = self.sign(event)
+                results.append(send(payload, headers))
+        return results
+
+    def _update(self, subscription, **fields):
+        if self.stripe is not None:
+            return dict(self.stripe.update_subscription(subscription['id'], **fields))
+        return dict(subscription, **fields)
+
+fake_stripe = FakeStripe()
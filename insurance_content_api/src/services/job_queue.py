@@ -0,0 +1,244 @@
+import json
+import logging
+import os
+import socket
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, update
+from sqlalchemy.exc import IntegrityError
+from src.models.insurance_models import db, Job
+from src.services.async_bridge import run_blocking
+from src.services.tracing import tracer, outbound_headers
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+class PermanentJobError(Exception):
+    """Raised by a job handler for failures that retrying cannot fix"""
+
+class JobQueue:
+    """Durable job queue stored in the jobs table (SQLite or Postgres).
+
+    Workers claim a job with a compare-and-swap UPDATE on (status,
+    available_at), so only one worker wins each job without row locks. A
+    claimed job is invisible to other workers until JOB_VISIBILITY_TIMEOUT
+    passes; handlers extend that deadline whenever they report progress. If
+    a worker dies the deadline lapses and the job is claimed again. Failed
+    jobs are retried with exponential backoff; after JOB_MAX_ATTEMPTS (or a
+    PermanentJobError) they are dead-lettered with status 'dead'.
+
+    JOB_QUEUE_MODE picks who runs jobs: 'thread' (the default,
+    JOB_WORKER_THREADS threads in each web process), 'worker' (only
+    separate ``python -m src.worker`` processes) or 'inline' (inside
+    enqueue(), for tests).
+    """
+
+    def __init__(self):
+        self.app = None
+        self.handlers = {}
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._threads = []
+        self._stop = threading.Event()
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['job_queue'] = self
+
+    def register(self, job_type: str, handler):
+        """Set the callable that runs jobs of a type; it gets the Job and returns a JSON-able result"""
+        self.handlers[job_type] = handler
+
+    def active_job(self, job_type: str, agent_id: int, dedupe_key: str):
+        """The queued or running job with this dedupe_key, if any"""
+        return Job.query.filter(
+            Job.agent_id == agent_id,
+            Job.type == job_type,
+            Job.dedupe_key == dedupe_key,
+            Job.status.in_(ACTIVE_STATUSES)
+        ).first()
+
+    def enqueue(self, job_type: str, agent_id: int, payload: dict = None, dedupe_key: str = None):
+        """Queue a job; returns (job, created). An active job with the same dedupe_key is reused"""
+        # The job continues the enqueuing request's trace
+        payload = dict(payload or {}, **outbound_headers())
+        job, created = run_blocking(self._insert, job_type, agent_id, payload, dedupe_key)
+        if not created:
+            return job, False
+
+        if self.app.config.get('JOB_QUEUE_MODE', 'thread') == 'inline':
+            claimed = self.claim(job.id)
+            if claimed is not None:
+                self.execute(claimed)
+            job = Job.query.get(job.id)
+        return job, True
+
+    def _insert(self, job_type, agent_id, payload, dedupe_key):
+        if dedupe_key:
+            existing = self.active_job(job_type, agent_id, dedupe_key)
+            if existing:
+                return existing, False
+
+        job = Job(
+            type=job_type,
+            agent_id=agent_id,
+            dedupe_key=dedupe_key,
+            payload=json.dumps(payload),
+            max_attempts=self.app.config.get('JOB_MAX_ATTEMPTS', 3)
+        )
+        db.session.add(job)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # A concurrent request enqueued the same work first (uq_jobs_active_dedupe)
+            db.session.rollback()
+            existing = self.active_job(job_type, agent_id, dedupe_key) if dedupe_key else None
+            if existing is None:
+                raise
+            return existing, False
+        return job, True
+
+    def retry(self, job: Job) -> Job:
+        """Re-queue a dead job with a fresh set of attempts; returns the job that will run.
+
+        If the same work was enqueued again since, that active job is returned instead.
+        """
+        if job.dedupe_key:
+            existing = self.active_job(job.type, job.agent_id, job.dedupe_key)
+            if existing:
+                return existing
+        job.status = 'queued'
+        job.attempts = 0
+        job.available_at = datetime.utcnow()
+        job.finished_at = None
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            existing = self.active_job(job.type, job.agent_id, job.dedupe_key)
+            if existing is None:
+                raise
+            return existing
+        return job
+
+    def set_progress(self, job: Job, progress: dict):
+        """Store a job's progress and extend its visibility deadline (commits the session)"""
+        db.session.execute(update(Job).where(
+            Job.id == job.id,
+            Job.attempts == job.attempts,
+            Job.locked_by == self.worker_id
+        ).values(
+            progress=json.dumps(progress),
+            available_at=datetime.utcnow() + self._visibility_timeout()
+        ))
+        db.session.commit()
+
+    def claim(self, job_id: int = None):
+        """Claim the next due job (or a specific one); returns it, or None"""
+        now = datetime.utcnow()
+        query = db.session.query(Job.id, Job.status, Job.available_at).filter(
+            Job.status.in_(ACTIVE_STATUSES),
+            Job.available_at <= now
+        )
+        if job_id is not None:
+            query = query.filter(Job.id == job_id)
+        candidates = query.order_by(Job.available_at).limit(10).all()
+
+        for candidate_id, status, available_at in candidates:
+            claimed = db.session.execute(update(Job).where(
+                Job.id == candidate_id,
+                Job.status == status,
+                Job.available_at == available_at
+            ).values(
+                status='running',
+                attempts=Job.attempts + 1,
+                available_at=now + self._visibility_timeout(),
+                locked_by=self.worker_id,
+                started_at=func.coalesce(Job.started_at, now)
+            )).rowcount
+            db.session.commit()
+            if claimed:
+                return Job.query.get(candidate_id)
+        return None
+
+    def execute(self, job: Job):
+        """Run a claimed job and record the outcome"""
+        with tracer.span(f"job {job.type}", {'job.id': job.id, 'job.attempt': job.attempts},
+                         traceparent=job.get_payload().get('traceparent')) as span:
+            self._execute(job, span)
+
+    def _execute(self, job: Job, span):
+        job_id, attempts = job.id, job.attempts
+        try:
+            if attempts > job.max_attempts:
+                raise PermanentJobError('Visibility timeout expired on the final attempt')
+            handler = self.handlers.get(job.type)
+            if handler is None:
+                raise PermanentJobError(f"No handler for job type {job.type}")
+
+            result = handler(job)
+            self._finish(job_id, attempts,
+                         status='succeeded',
+                         result=json.dumps(result) if result is not None else None,
+                         last_error=None,
+                         finished_at=datetime.utcnow())
+
+        except Exception as e:
+            db.session.rollback()
+            span.record_exception(e)
+            logging.error(f"Error running job {job_id}: {str(e)}")
+
+            job = Job.query.get(job_id)
+            if isinstance(e, PermanentJobError) or attempts >= job.max_attempts:
+                self._finish(job_id, attempts, status='dead', last_error=str(e), finished_at=datetime.utcnow())
+            else:
+                backoff = self.app.config.get('JOB_RETRY_BACKOFF', 5)
+                self._finish(job_id, attempts, status='queued', last_error=str(e),
+                             available_at=datetime.utcnow() + timedelta(seconds=backoff * 2 ** (attempts - 1)))
+
+    def _finish(self, job_id, attempts, **values):
+        # Only the worker holding the current attempt may record its outcome
+        updated = db.session.execute(update(Job).where(
+            Job.id == job_id,
+            Job.attempts == attempts,
+            Job.status == 'running'
+        ).values(locked_by=None, **values)).rowcount
+        db.session.commit()
+        if not updated:
+            logging.error(f"Job {job_id} attempt {attempts} finished after it was reclaimed")
+
+    def _visibility_timeout(self):
+        return timedelta(seconds=self.app.config.get('JOB_VISIBILITY_TIMEOUT', 300))
+
+    def work(self):
+        """Claim and run jobs until stop() is called"""
+        poll_interval = self.app.config.get('JOB_POLL_INTERVAL', 1.0)
+        while not self._stop.is_set():
+            job = None
+            try:
+                with self.app.app_context():
+                    job = self.claim()
+                    if job is not None:
+                        self.execute(job)
+            except Exception as e:
+                logging.error(f"Job worker error: {str(e)}")
+            if job is None:
+                self._stop.wait(poll_interval)
+
+    def start(self, threads: int):
+        """Start worker threads in this process"""
+        for index in range(threads - len(self._threads)):
+            thread = threading.Thread(target=self.work, name=f'job-worker-{index}', daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def stop(self, timeout: float = None):
+        """Stop claiming jobs and wait for running ones to finish"""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def queue_depth(self) -> int:
+        """Jobs waiting to be claimed"""
+        return Job.query.filter_by(status='queued').count()
+
+job_queue = JobQueue()
@@ -0,0 +1,33 @@
+import os
+import socket
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from src.models.insurance_models import db, Lease
+
+def acquire_lease(name: str, ttl: timedelta) -> bool:
+    """Take or renew the named lease for this process; False while another process holds it.
+
+    Like job claims, this is a compare-and-swap UPDATE: it only succeeds if
+    this process already holds the lease or the holder let it expire.
+    Holders renew by calling it again before ttl passes.
+    """
+    holder = f"{socket.gethostname()}:{os.getpid()}"  # after a fork, the child is a new holder
+    now = datetime.utcnow()
+    acquired = db.session.execute(update(Lease).where(
+        Lease.name == name,
+        db.or_(Lease.holder == holder, Lease.expires_at < now)
+    ).values(holder=holder, expires_at=now + ttl)).rowcount
+    db.session.commit()
+    if acquired:
+        return True
+
+    try:
+        db.session.add(Lease(name=name, holder=holder, expires_at=now + ttl))
+        db.session.commit()
+        return True
+    except IntegrityError:
+        # Held by another process
+        db.session.rollback()
+        return False
@@ -0,0 +1,371 @@
+"""Prometheus-style metrics, exposed as text at /metrics.
+
+Metrics are plain in-process objects: observe()/inc() is a dict lookup and
+a few additions under a lock, cheap enough for every request and query.
+
+With several worker processes (gunicorn, multiple uvicorn workers) each
+process writes a snapshot of its metrics to METRICS_DIR/<pid>-<start>.json
+every METRICS_FLUSH_INTERVAL seconds (the start time keeps a reused pid from
+overwriting an older process's file), and /metrics merges the snapshots of
+live processes: counters and histograms are summed, gauges are combined per
+metric ('sum' or 'max'). A process removes its file when it exits, and a
+snapshot older than a few flush intervals (a killed process) is skipped
+and removed, so like any restarted Prometheus target the totals may drop
+and rate() handles the reset. Without METRICS_DIR only the serving process
+is reported.
+
+Values that already live elsewhere (cache stats, queue depths) are read by
+collectors registered with registry.collector() at snapshot time.
+"""
+import atexit
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+
+from flask import Response, current_app, g, request
+
+from src.services.query_stats import current_counter, query_stats
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+UPSTREAM_BUCKETS = (0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 45.0, 60.0, 90.0, 120.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        return tuple(str(value) for value in labels)
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+class Counter(_Metric):
+    type = 'counter'
+
+    def inc(self, *labels, amount=1):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(_Metric):
+    type = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), aggregate='sum'):
+        super().__init__(name, documentation, labelnames)
+        self.aggregate = aggregate  # how values from several processes combine
+
+    def set(self, *labels, value):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+class Histogram(_Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, *labels, value):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket (non-cumulative) counts, +Inf last, then sum
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[index] += 1
+            state[-1] += value
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(key), list(state)] for key, state in self._values.items()]
+
+class Registry:
+    """Holds the metrics of this process and merges snapshots across processes"""
+
+    def __init__(self):
+        self.metrics = {}
+        self._collectors = []
+        self.app = None
+        self.directory = None
+        self._flusher_pid = None
+        self._process = None  # (pid, start time) naming this process's snapshot file
+        self._lock = threading.Lock()
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=(), aggregate='sum'):
+        return self._register(Gauge(name, documentation, labelnames, aggregate))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def collector(self, func):
+        """Register func(), called (in an app context) before each snapshot to refresh gauges"""
+        self._collectors.append(func)
+        return func
+
+    def _register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['metrics'] = self
+        if not app.config.get('METRICS_ENABLED', True):
+            return
+
+        self.directory = app.config.get('METRICS_DIR')
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            atexit.register(self.remove_snapshot)
+
+        app.before_request(_start_request)
+        app.after_request(_finish_request)
+        app.add_url_rule('/metrics', 'metrics', metrics_view)
+        query_stats.add_listener(_observe_query)
+
+    # Snapshots
+
+    def collect(self):
+        for func in self._collectors:
+            try:
+                func()
+            except Exception as e:
+                logging.error(f"Metrics collector error: {str(e)}")
+
+    def snapshot(self):
+        return {
+            'pid': os.getpid(),
+            'time': time.time(),
+            'metrics': {name: metric.snapshot() for name, metric in self.metrics.items()}
+        }
+
+    def _snapshot_path(self):
+        pid = os.getpid()
+        if self._process is None or self._process[0] != pid:
+            # First snapshot of this process (or of a forked child)
+            self._process = (pid, time.time())
+        return os.path.join(self.directory, f'{pid}-{int(self._process[1] * 1000)}.json')
+
+    def write_snapshot(self):
+        """Write this process's snapshot to METRICS_DIR (atomically)"""
+        if not self.directory:
+            return
+        path = self._snapshot_path()
+        temp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(temp_path, path)
+
+    def remove_snapshot(self):
+        """Delete this process's snapshot file (at exit)"""
+        if not self.directory or self._process is None or self._process[0] != os.getpid():
+            return  # nothing written by this process (a fork inherits the parent's _process)
+        try:
+            os.remove(self._snapshot_path())
+        except OSError:
+            pass
+
+    def ensure_flusher(self):
+        """Start the snapshot thread in this process (also after a fork)"""
+        if not self.directory or self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher_pid != os.getpid():
+                self._flusher_pid = os.getpid()
+                threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True).start()
+
+    def _flush_loop(self):
+        interval = self.app.config.get('METRICS_FLUSH_INTERVAL', 5)
+        while True:
+            time.sleep(interval)
+            try:
+                with self.app.app_context():
+                    self.collect()
+                self.write_snapshot()
+            except Exception as e:
+                logging.error(f"Error writing metrics snapshot: {str(e)}")
+
+    def _snapshots(self):
+        self.collect()
+        if not self.directory:
+            return [self.snapshot()]
+
+        self.write_snapshot()
+        stale_before = time.time() - 3 * self.app.config.get('METRICS_FLUSH_INTERVAL', 5)
+        snapshots = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                with open(path) as f:
+                    snap = json.load(f)
+            except (OSError, ValueError):
+                continue  # being replaced right now
+            if snap['time'] < stale_before:
+                # Its process stopped flushing (killed); a live one rewrites its file
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            snapshots.append(snap)
+        return snapshots
+
+    def render(self):
+        """Merged metrics of all processes in the Prometheus text format"""
+        snapshots = self._snapshots()
+        lines = []
+
+        for name, metric in self.metrics.items():
+            merged = {}
+            for snap in snapshots:
+                for labels, value in snap['metrics'].get(name, []):
+                    key = tuple(labels)
+                    if key not in merged:
+                        merged[key] = value
+                    elif metric.type == 'histogram':
+                        merged[key] = [a + b for a, b in zip(merged[key], value)]
+                    elif metric.type == 'gauge' and metric.aggregate == 'max':
+                        merged[key] = max(merged[key], value)
+                    else:
+                        merged[key] = merged[key] + value
+
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.type}')
+            for key, value in sorted(merged.items()):
+                labels = list(zip(metric.labelnames, key))
+                if metric.type == 'histogram':
+                    cumulative = 0
+                    for bound, count in zip(metric.buckets + (float('inf'),), value[:-1]):
+                        cumulative += count
+                        le = '+Inf' if bound == float('inf') else repr(float(bound))
+                        lines.append(f"{name}_bucket{_labels(labels + [('le', le)])} {cumulative}")
+                    lines.append(f"{name}_sum{_labels(labels)} {value[-1]}")
+                    lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+                else:
+                    lines.append(f"{name}{_labels(labels)} {value}")
+
+        return '\n'.join(lines) + '\n'
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+registry = Registry()
+
+# HTTP
+http_requests = registry.counter(
+    'http_requests_total', 'HTTP requests by route and status', ['method', 'route', 'status'])
+http_latency = registry.histogram(
+    'http_request_duration_seconds', 'HTTP request latency', ['method', 'route'])
+
+# Upstream AI calls
+openai_latency = registry.histogram(
+    'openai_request_duration_seconds', 'OpenAI API call latency', ['operation', 'model'], UPSTREAM_BUCKETS)
+openai_errors = registry.counter(
+    'openai_errors_total', 'Failed OpenAI API calls', ['operation'])
+openai_tokens = registry.counter(
+    'openai_tokens_total', 'OpenAI tokens used', ['model', 'kind'])
+image_latency = registry.histogram(
+    'image_generation_duration_seconds', 'Time to generate one post image', ['status'], UPSTREAM_BUCKETS)
+openai_truncations = registry.counter(
+    'openai_truncations_total', 'Completions cut off by max_tokens', ['model'])
+ai_post_validation_errors = registry.counter(
+    'ai_post_validation_errors_total', 'Invalid fields in generated posts', ['field'])
+compliance_findings = registry.counter(
+    'compliance_findings_total', 'Compliance phrases found in generated posts', ['severity'])
+model_route_decisions = registry.counter(
+    'model_route_decisions_total', 'Model routing decisions by task and tier', ['task', 'tier', 'model', 'degraded'])
+
+# Database
+db_query_latency = registry.histogram(
+    'db_query_duration_seconds', 'Database query latency', ['operation'], QUERY_BUCKETS)
+db_request_queries = registry.histogram(
+    'db_queries_per_request', 'Database queries per HTTP request', ['route'], COUNT_BUCKETS)
+db_request_time = registry.histogram(
+    'db_time_per_request_seconds', 'Database time per HTTP request', ['route'], QUERY_BUCKETS)
+
+# Caches and queues (refreshed by collectors)
+cache_lookups = registry.gauge(
+    'cache_lookups', 'Cache lookups in live processes by result', ['cache', 'result'])
+cache_hit_ratio = registry.gauge(
+    'cache_hit_ratio', 'Cache hit ratio per process (max over processes)', ['cache'], aggregate='max')
+queue_depth = registry.gauge(
+    'queue_depth', 'Items waiting in in-process queues', ['queue'])
+jobs_queued = registry.gauge(
+    'jobs_queued', 'Background jobs waiting to be claimed', aggregate='max')
+
+@registry.collector
+def _collect_caches():
+    from src.services.agent_cache import agent_cache
+    stats = agent_cache.stats()
+    cache_lookups.set('agent', 'hit', value=stats['hits'])
+    cache_lookups.set('agent', 'miss', value=stats['misses'])
+    cache_hit_ratio.set('agent', value=stats['hit_ratio'])
+
+@registry.collector
+def _collect_queues():
+    from src.services.usage_recorder import usage_recorder
+    from src.services.webhook_processor import webhook_processor
+    from src.services.password_hasher import password_hasher
+    from src.services.job_queue import job_queue
+    queue_depth.set('usage_events', value=usage_recorder.pending)
+    queue_depth.set('stripe_webhooks', value=webhook_processor.queue_depth)
+    queue_depth.set('password_hashes', value=password_hasher.in_flight)
+    jobs_queued.set(value=job_queue.queue_depth())
+
+# Request and query hooks
+
+def _start_request():
+    g.metrics_start = time.perf_counter()
+
+def _finish_request(response):
+    start = g.pop('metrics_start', None)
+    if start is None:
+        return response
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    if route == '/<path:path>':
+        route = 'static'
+
+    http_latency.observe(request.method, route, value=time.perf_counter() - start)
+    http_requests.inc(request.method, route, response.status_code)
+
+    counter = current_counter()
+    if counter is not None:
+        db_request_queries.observe(route, value=counter.count)
+        db_request_time.observe(route, value=counter.seconds)
+
+    registry.ensure_flusher()
+    return response
+
+def _observe_query(statement, elapsed):
+    db_query_latency.observe(statement.lstrip().split(' ', 1)[0].upper(), value=elapsed)
+
+def metrics_view():
+    token = current_app.config.get('METRICS_TOKEN')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return Response('Unauthorized\n', status=401, mimetype='text/plain')
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,128 @@
+"""Model selection per AI task, degrading to faster tiers when a model struggles.
+
+MODEL_TIERS names the models (premium, standard, fast, ...) and
+MODEL_ROUTES lists, per task, the tiers to use in order of preference.
+route(task) picks the first tier whose model is healthy over the last
+MODEL_ROUTER_WINDOW seconds of calls in this process:
+
+* p95 latency within MODEL_ROUTER_LATENCY_BUDGET[task] seconds, and
+* error rate within MODEL_ROUTER_MAX_ERROR_RATE,
+
+judged once a model has MODEL_ROUTER_MIN_SAMPLES recent calls. When every
+tier is unhealthy the one with the lowest p95 is used. Samples expire with
+the window, so a degraded model gets traffic again after a quiet period and
+is re-judged on fresh calls.
+
+Every decision is logged and counted (model_route_decisions_total); api_usage
+and content_schedules record the model that served each call, so cost and
+quality can be compared per model.
+"""
+import logging
+import math
+import threading
+import time
+from collections import deque
+from typing import List, NamedTuple, Optional
+
+from flask import current_app
+
+from src.services.metrics import model_route_decisions
+from src.services.tracing import current_span
+
+class Route(NamedTuple):
+    task: str
+    tier: str
+    model: str
+    degraded: bool
+    reason: str
+
+class ModelRouter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = {}  # model -> deque of (monotonic time, seconds, ok)
+
+    def observe(self, model: str, seconds: float, ok: bool):
+        """Record the outcome of one upstream call"""
+        with self._lock:
+            samples = self._samples.get(model)
+            if samples is None:
+                samples = self._samples[model] = deque(maxlen=1000)
+            samples.append((time.monotonic(), seconds, ok))
+
+    def health(self, model: str, window: float = None) -> dict:
+        """Recent call count, p95 latency and error rate for a model"""
+        if window is None:
+            window = current_app.config.get('MODEL_ROUTER_WINDOW', 300)
+        cutoff = time.monotonic() - window
+        with self._lock:
+            samples = self._samples.get(model, ())
+            while samples and samples[0][0] < cutoff:
+                samples.popleft()
+            recent = list(samples)
+
+        if not recent:
+            return {'samples': 0, 'p95': None, 'error_rate': None}
+        latencies = sorted(seconds for _, seconds, ok in recent if ok)
+        p95 = latencies[min(len(latencies) - 1, math.ceil(0.95 * len(latencies)) - 1)] if latencies else None
+        errors = sum(1 for _, _, ok in recent if not ok)
+        return {'samples': len(recent), 'p95': p95, 'error_rate': errors / len(recent)}
+
+    def models(self, task: str) -> List[str]:
+        """Models a task may be routed to, preferred first"""
+        config = current_app.config
+        route_tiers = config['MODEL_ROUTES'].get(task) or config['MODEL_ROUTES']['default']
+        return [config['MODEL_TIERS'][tier] for tier in route_tiers]
+
+    def route(self, task: str) -> Route:
+        """Pick the tier and model for a task"""
+        config = current_app.config
+        tiers = config['MODEL_TIERS']
+        route_tiers = config['MODEL_ROUTES'].get(task) or config['MODEL_ROUTES']['default']
+        budget = config.get('MODEL_ROUTER_LATENCY_BUDGET', {})
+        budget = budget.get(task, budget.get('default'))
+        max_error_rate = config.get('MODEL_ROUTER_MAX_ERROR_RATE', 0.25)
+        min_samples = config.get('MODEL_ROUTER_MIN_SAMPLES', 10)
+
+        route = None
+        problems = []
+        fallback = None
+        for tier in route_tiers:
+            model = tiers[tier]
+            health = self.health(model)
+            problem = None
+            if health['samples'] >= min_samples:
+                if health['error_rate'] > max_error_rate:
+                    problem = f"{model} error rate {health['error_rate']:.0%}"
+                elif budget is not None and health['p95'] is not None and health['p95'] > budget:
+                    problem = f"{model} p95 {health['p95']:.1f}s > {budget:.0f}s"
+            if problem is None:
+                route = Route(task, tier, model, bool(problems), '; '.join(problems) or 'preferred')
+                break
+            problems.append(problem)
+            p95 = health['p95'] if health['p95'] is not None else math.inf
+            if fallback is None or p95 < fallback[0]:
+                fallback = (p95, tier, model)
+
+        if route is None:
+            _, tier, model = fallback
+            route = Route(task, tier, model, True, 'all tiers degraded: ' + '; '.join(problems))
+
+        model_route_decisions.inc(task, route.tier, route.model, 'true' if route.degraded else 'false')
+        span = current_span()
+        if span is not None:
+            span.set_attribute('ai.route.tier', route.tier)
+            span.set_attribute('ai.route.model', route.model)
+            span.set_attribute('ai.route.degraded', route.degraded)
+        log = logging.warning if route.degraded else logging.info
+        log(f"Model route {task} -> {route.tier} ({route.model}): {route.reason}")
+        return route
+
+    def reset(self, model: Optional[str] = None):
+        """Forget recorded calls for one model, or for all"""
+        with self._lock:
+            if model is None:
+                self._samples.clear()
+            else:
+                self._samples.pop(model, None)
+
+model_router = ModelRouter()
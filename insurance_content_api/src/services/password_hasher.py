@@ -0,0 +1,105 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from functools import lru_cache
+
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+class HasherBusy(Exception):
+    """Raised when the hashing pool is saturated and the request should be shed"""
+
+def _hash(password: str, method: str) -> str:
+    return generate_password_hash(password, method=method)
+
+def _verify(password_hash: str, password: str) -> bool:
+    return check_password_hash(password_hash, password)
+
+@lru_cache(maxsize=8)
+def _canonical_method(method: str) -> str:
+    """Expand a configured method (e.g. 'pbkdf2:sha256') to the prefix werkzeug stores"""
+    return generate_password_hash('', method=method).split('$', 1)[0]
+
+class PasswordHasher:
+    """Runs password hashing and verification on a bounded process pool.
+
+    Hashing is CPU-bound by design, so doing it on request threads lets a
+    burst of logins starve every worker. Jobs go to a process pool instead;
+    once PASSWORD_HASH_WORKERS + PASSWORD_HASH_MAX_QUEUE jobs are in flight
+    new ones are rejected immediately with HasherBusy. With
+    PASSWORD_HASH_WORKERS = 0 hashing runs inline.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._capacity = 0
+        self._in_flight = 0
+
+    @property
+    def method(self) -> str:
+        return current_app.config.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+
+    def hash(self, password: str) -> str:
+        """Hash a password with the configured method"""
+        return self._run(_hash, password, self.method)
+
+    def verify(self, password_hash: str, password: str) -> bool:
+        """Check a password against a stored hash"""
+        return self._run(_verify, password_hash, password)
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        """Whether a stored hash was made with different parameters than configured"""
+        return password_hash.split('$', 1)[0] != _canonical_method(self.method)
+
+    @property
+    def in_flight(self) -> int:
+        """Jobs currently queued or running on the pool"""
+        return self._in_flight
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _run(self, fn, *args):
+        workers = current_app.config.get('PASSWORD_HASH_WORKERS', 0)
+        if not workers:
+            return fn(*args)
+
+        executor = self._get_executor(workers)
+        with self._lock:
+            if self._in_flight >= self._capacity:
+                raise HasherBusy('Password hashing queue is full')
+            self._in_flight += 1
+
+        try:
+            future = executor.submit(fn, *args)
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+
+        try:
+            return future.result(timeout=current_app.config.get('PASSWORD_HASH_TIMEOUT', 10))
+        except TimeoutError:
+            future.cancel()
+            raise HasherBusy('Password hashing timed out')
+
+    def _release(self, _future=None):
+        with self._lock:
+            self._in_flight -= 1
+
+    def _get_executor(self, workers: int):
+        with self._lock:
+            if self._executor is None:
+                self._capacity = workers + current_app.config.get('PASSWORD_HASH_MAX_QUEUE', 32)
+                # spawn, not fork: the parent is a multi-threaded web server
+                self._executor = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._executor
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,145 @@
+"""OpenAI price tables and per-call cost calculation.
+
+Prices are kept per version so that stored costs can be explained and
+recomputed later: every api_usage row records the PRICE_VERSION its cost
+was computed with. When OpenAI changes prices, add a new version to
+PRICE_TABLES and point PRICE_VERSION (config) at it; older rows keep the
+version they were billed under.
+
+Token prices are USD per 1M tokens. Cached prompt tokens (prompt-prefix
+cache hits, reported in usage.prompt_tokens_details.cached_tokens) are a
+subset of the prompt tokens and are billed at the cached input price.
+Image prices are USD per image by (quality, size).
+"""
+import logging
+from typing import NamedTuple, Optional
+
+from flask import current_app, has_app_context
+
+PRICE_TABLES = {
+    '2025-06': {
+        'tokens': {
+            # model: (input, cached input, output)
+            'gpt-4': (30.00, 30.00, 60.00),
+            'gpt-4-turbo': (10.00, 10.00, 30.00),
+            'gpt-4o': (2.50, 1.25, 10.00),
+            'gpt-4o-mini': (0.15, 0.075, 0.60),
+            'gpt-4.1': (2.00, 0.50, 8.00),
+            'gpt-4.1-mini': (0.40, 0.10, 1.60),
+            'gpt-4.1-nano': (0.10, 0.025, 0.40),
+            'gpt-3.5-turbo': (0.50, 0.50, 1.50),
+        },
+        'images': {
+            'dall-e-3': {
+                ('standard', '1024x1024'): 0.040,
+                ('standard', '1024x1792'): 0.080,
+                ('standard', '1792x1024'): 0.080,
+                ('hd', '1024x1024'): 0.080,
+                ('hd', '1024x1792'): 0.120,
+                ('hd', '1792x1024'): 0.120,
+            },
+            'dall-e-2': {
+                ('standard', '1024x1024'): 0.020,
+                ('standard', '512x512'): 0.018,
+                ('standard', '256x256'): 0.016,
+            },
+        },
+    },
+}
+
+DEFAULT_PRICE_VERSION = '2025-06'
+
+class ModelUsage(NamedTuple):
+    """What one upstream call consumed"""
+    model: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    image_count: int = 0
+    image_size: Optional[str] = None
+    image_quality: Optional[str] = None
+    prompt_version: Optional[str] = None  # services/prompts.py layout that produced the call
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    @classmethod
+    def from_completion(cls, model: str, usage, prompt_version: str = None) -> 'ModelUsage':
+        """Usage of a chat completion response's ``usage`` object"""
+        if usage is None:
+            return cls(model, prompt_version=prompt_version)
+        details = getattr(usage, 'prompt_tokens_details', None)
+        return cls(
+            model=model,
+            prompt_tokens=usage.prompt_tokens or 0,
+            completion_tokens=usage.completion_tokens or 0,
+            cached_tokens=(getattr(details, 'cached_tokens', None) or 0) if details is not None else 0,
+            prompt_version=prompt_version
+        )
+
+    def combined(self, other: 'ModelUsage') -> 'ModelUsage':
+        """Usage of this call plus a retry of it"""
+        return self._replace(
+            prompt_tokens=self.prompt_tokens + other.prompt_tokens,
+            completion_tokens=self.completion_tokens + other.completion_tokens,
+            cached_tokens=self.cached_tokens + other.cached_tokens,
+            image_count=self.image_count + other.image_count
+        )
+    
+    @classmethod
+    def for_images(cls, model: str, size: str, quality: str, count: int = 1) -> 'ModelUsage':
+        return cls(model=model, image_count=count, image_size=size, image_quality=quality)
+
+_warned_versions = set()
+
+def price_version(version: Optional[str]) -> str:
+    """version if PRICE_TABLES has it, else DEFAULT_PRICE_VERSION (with a warning, once per version)"""
+    if version in PRICE_TABLES:
+        return version
+    if version not in _warned_versions:
+        _warned_versions.add(version)
+        logging.warning(f"Unknown price version {version!r}, using {DEFAULT_PRICE_VERSION}")
+    return DEFAULT_PRICE_VERSION
+
+def current_price_version() -> str:
+    if has_app_context():
+        return price_version(current_app.config.get('PRICE_VERSION', DEFAULT_PRICE_VERSION))
+    return DEFAULT_PRICE_VERSION
+
+_warned = set()
+
+def _lookup(prices: dict, model: str):
+    """Price entry for a model, matching dated snapshots (gpt-4o-2024-08-06) by prefix"""
+    if model in prices:
+        return prices[model]
+    matches = [name for name in prices if model.startswith(name + '-')]
+    if matches:
+        return prices[max(matches, key=len)]
+    if model not in _warned:
+        _warned.add(model)
+        logging.warning(f"No price for model {model}, recording its cost as 0")
+    return None
+
+def cost_of(usage: ModelUsage, version: str = None) -> float:
+    """USD cost of a call under a price table version (default: the configured one)"""
+    table = PRICE_TABLES[price_version(version) if version else current_price_version()]
+
+    if usage.image_count:
+        prices = _lookup(table['images'], usage.model)
+        if prices is None:
+            return 0.0
+        price = prices.get((usage.image_quality or 'standard', usage.image_size or '1024x1024'))
+        if price is None:
+            logging.warning(f"No price for {usage.model} {usage.image_quality} {usage.image_size} images")
+            return 0.0
+        return round(price * usage.image_count, 6)
+
+    prices = _lookup(table['tokens'], usage.model)
+    if prices is None:
+        return 0.0
+    input_price, cached_price, output_price = prices
+    cached = min(usage.cached_tokens, usage.prompt_tokens)
+    return round(((usage.prompt_tokens - cached) * input_price +
+                  cached * cached_price +
+                  usage.completion_tokens * output_price) / 1_000_000, 6)
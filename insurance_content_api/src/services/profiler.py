@@ -0,0 +1,219 @@
+"""Opt-in per-request profiling with flame-graph-ready output.
+
+A request is profiled when it carries ``X-Profile: <PROFILER_TOKEN>`` or is
+picked at random with probability PROFILER_SAMPLE_RATE. The profiler wraps
+the whole WSGI call, including iterating the response body, so routing,
+auth, SQLAlchemy, the OpenAI client and JSON serialization are all covered.
+
+PROFILER_MODE = 'sampling' samples the request thread's stack every
+PROFILER_INTERVAL seconds and writes folded stacks (``a;b;c <count>``), the
+input format of flamegraph.pl, speedscope and inferno. 'cprofile' runs the
+deterministic cProfile and writes a .prof file (snakeviz, flameprof).
+
+Profiles are written to PROFILER_DIR with a JSON sidecar describing the
+request, and listed by GET /api/admin/profiles (same X-Profile header).
+When neither a token nor a sample rate is configured, init_app() installs
+nothing, so requests pay no cost at all.
+"""
+import cProfile
+import hmac
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from flask import abort, jsonify, request, send_from_directory
+
+PROFILE_HEADER = 'X-Profile'
+_ENVIRON_KEY = 'HTTP_' + PROFILE_HEADER.upper().replace('-', '_')
+
+class _StackSampler(threading.Thread):
+    """Samples one thread's Python stack at a fixed interval"""
+
+    def __init__(self, thread_id, interval, root_code=None):
+        super().__init__(name='profiler-sampler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.root_code = root_code  # stacks are cut above this frame (the server's own frames)
+        self.stacks = Counter()
+        self._labels = {}
+        self._stop_event = threading.Event()
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})"
+        return label
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and frame.f_code is not self.root_code:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+def _short_path(path):
+    for marker in ('site-packages' + os.sep, 'insurance_content_api' + os.sep):
+        index = path.rfind(marker)
+        if index != -1:
+            return path[index + len(marker):]
+    return os.path.basename(path)
+
+class ProfilerMiddleware:
+    """WSGI middleware that profiles the requests picked by the profiler"""
+
+    def __init__(self, wsgi_app, profiler):
+        self.wsgi_app = wsgi_app
+        self.profiler = profiler
+
+    def __call__(self, environ, start_response):
+        if not self.profiler.should_profile(environ):
+            return self.wsgi_app(environ, start_response)
+        return self.profiler.profile(self.wsgi_app, environ, start_response)
+
+class RequestProfiler:
+    def __init__(self):
+        self.app = None
+        self.directory = None
+
+    def init_app(self, app):
+        config = app.config
+        self.token = config.get('PROFILER_TOKEN')
+        self.sample_rate = config.get('PROFILER_SAMPLE_RATE', 0.0)
+        if not (self.token or self.sample_rate):
+            return  # disabled: no middleware, no routes
+
+        self.app = app
+        self.mode = config.get('PROFILER_MODE', 'sampling')
+        self.interval = config.get('PROFILER_INTERVAL', 0.005)
+        self.max_files = config.get('PROFILER_MAX_FILES', 200)
+        self.directory = config.get('PROFILER_DIR') or \
+            os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database', 'profiles')
+        os.makedirs(self.directory, exist_ok=True)
+
+        app.extensions['profiler'] = self
+        app.wsgi_app = ProfilerMiddleware(app.wsgi_app, self)
+        app.add_url_rule('/api/admin/profiles', 'profiles_index', self.index_view)
+        app.add_url_rule('/api/admin/profiles/<name>', 'profiles_download', self.download_view)
+
+    def _has_token(self, value):
+        # compare_digest rejects non-ASCII str; header values are latin-1 decoded bytes
+        return bool(self.token and value) and \
+            hmac.compare_digest(value.encode('latin-1', 'replace'), self.token.encode('utf-8'))
+
+    def should_profile(self, environ):
+        if environ.get('PATH_INFO', '').startswith('/api/admin/profiles'):
+            return False
+        if self._has_token(environ.get(_ENVIRON_KEY)):
+            return True
+        return bool(self.sample_rate) and random.random() < self.sample_rate
+
+    def profile(self, wsgi_app, environ, start_response):
+        status = {}
+
+        def capture_start_response(status_line, headers, exc_info=None):
+            status['code'] = int(status_line.split(' ', 1)[0])
+            return start_response(status_line, headers, exc_info)
+
+        if self.mode == 'cprofile':
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            profiler = _StackSampler(threading.get_ident(), self.interval, root_code=self.profile.__code__)
+            profiler.start()
+
+        started = time.perf_counter()
+        try:
+            result = wsgi_app(environ, capture_start_response)
+            try:
+                body = list(result)  # serialization happens here for streamed responses
+            finally:
+                if hasattr(result, 'close'):
+                    result.close()
+        finally:
+            elapsed = time.perf_counter() - started
+            if self.mode == 'cprofile':
+                profiler.disable()
+            else:
+                profiler.stop()
+            self._save(profiler, environ, status.get('code'), elapsed)
+        return body
+
+    def _save(self, profiler, environ, status_code, elapsed):
+        stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')
+        slug = re.sub(r'[^A-Za-z0-9]+', '-', environ.get('PATH_INFO', '')).strip('-') or 'root'
+        name = f"{stamp}-{environ.get('REQUEST_METHOD', 'GET').lower()}-{slug[:60]}"
+
+        if self.mode == 'cprofile':
+            filename = f'{name}.prof'
+            profiler.dump_stats(os.path.join(self.directory, filename))
+            samples = None
+        else:
+            filename = f'{name}.folded'
+            with open(os.path.join(self.directory, filename), 'w') as f:
+                for stack, count in profiler.stacks.most_common():
+                    f.write(f'{stack} {count}\n')
+            samples = sum(profiler.stacks.values())
+
+        with open(os.path.join(self.directory, f'{name}.json'), 'w') as f:
+            json.dump({
+                'name': name,
+                'file': filename,
+                'mode': self.mode,
+                'method': environ.get('REQUEST_METHOD'),
+                'path': environ.get('PATH_INFO'),
+                'query_string': environ.get('QUERY_STRING', ''),
+                'status': status_code,
+                'duration_ms': round(elapsed * 1000, 2),
+                'samples': samples,
+                'created_at': datetime.utcnow().isoformat()
+            }, f)
+        self._prune()
+
+    def _prune(self):
+        sidecars = sorted(n for n in os.listdir(self.directory) if n.endswith('.json'))
+        for sidecar in sidecars[:max(0, len(sidecars) - self.max_files)]:
+            base = sidecar[:-len('.json')]
+            for suffix in ('.json', '.folded', '.prof'):
+                try:
+                    os.remove(os.path.join(self.directory, base + suffix))
+                except FileNotFoundError:
+                    pass
+
+    def _require_admin(self):
+        if not self._has_token(request.headers.get(PROFILE_HEADER)):
+            abort(404)
+
+    def index_view(self):
+        """List stored profiles, newest first"""
+        self._require_admin()
+        profiles = []
+        for sidecar in sorted((n for n in os.listdir(self.directory) if n.endswith('.json')), reverse=True):
+            try:
+                with open(os.path.join(self.directory, sidecar)) as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                continue
+            entry['url'] = f"/api/admin/profiles/{entry['file']}"
+            profiles.append(entry)
+        return jsonify({'profiles': profiles})
+
+    def download_view(self, name):
+        """Download one profile file"""
+        self._require_admin()
+        mimetype = 'text/plain' if name.endswith('.folded') else 'application/octet-stream'
+        return send_from_directory(self.directory, name, mimetype=mimetype, as_attachment=True)
+
+request_profiler = RequestProfiler()
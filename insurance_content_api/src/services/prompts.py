@@ -0,0 +1,138 @@
+"""Prompt text for weekly content generation, laid out for prefix caching.
+
+OpenAI caches the longest previously seen prompt prefix (in 128-token
+steps once a prompt passes 1024 tokens) and bills cache hits at the cached
+input price with lower latency. Caching only works if every request starts
+with the same bytes, so everything that does not depend on the request
+lives in CONTENT_SYSTEM_PROMPT: role, guidelines, the full insurance type
+catalog, the tone guide and the response format. The user message holds
+only the small per-request part: dates, selected types, tone, seasonal
+context and the agent's extra instructions.
+
+Any edit to CONTENT_SYSTEM_PROMPT changes the cached prefix; bump
+CONTENT_PROMPT_VERSION with it so usage rows (api_usage.prompt_version)
+show which layout produced which cache hit rate and cost.
+"""
+import hashlib
+
+CONTENT_PROMPT_VERSION = 'content-v3'
+
+INSURANCE_DESCRIPTIONS = {
+    'mortgage_protection': 'Mortgage Protection Insurance - helps pay off mortgage if policyholder dies',
+    'index_universal_life': 'Index Universal Life Insurance - permanent life insurance with investment component',
+    'term_life_living_benefits': 'Term Life Insurance with Living Benefits - temporary coverage with accelerated death benefits',
+    'final_expense': 'Final Expense Insurance - covers funeral and burial costs',
+    'annuities': 'Annuities - retirement income products for secure retirement',
+    'health_insurance': 'Health Insurance - medical coverage and benefits'
+}
+
+# What to keep in mind per type, so posts stay accurate without a per-request reminder
+INSURANCE_NOTES = {
+    'mortgage_protection': 'Talk about keeping the family home; never imply coverage is tied to or required by the lender.',
+    'index_universal_life': 'Explain cash value growth linked to an index with a floor; never promise returns or call it an investment account.',
+    'term_life_living_benefits': 'Explain living benefits for qualifying illness; availability and terms vary by policy and state.',
+    'final_expense': 'Keep a gentle, respectful tone about end-of-life costs; avoid fear-based urgency.',
+    'annuities': 'Focus on predictable retirement income; never guarantee growth or compare with specific market returns.',
+    'health_insurance': 'Stay general about coverage and enrollment periods; never quote premiums or promise specific benefits.'
+}
+
+TONE_GUIDE = {
+    'serious': 'calm and sincere, plain language, no jokes',
+    'funny': 'light humor and relatable everyday situations, never joking about loss or illness',
+    'direct': 'short sentences, clear points, one idea per post',
+    'sarcastic': 'gentle, self-aware wit about common money habits, never mocking the reader',
+    'urgent': 'timely reminders and deadlines, without pressure tactics or fear',
+    'friendly': 'warm, conversational, like talking to a neighbor',
+    'professional': 'polished and knowledgeable, approachable rather than corporate'
+}
+
+def _catalog() -> str:
+    return '\n'.join(
+        f"- {key}: {INSURANCE_DESCRIPTIONS[key]}. {INSURANCE_NOTES[key]}" for key in INSURANCE_DESCRIPTIONS
+    )
+
+def _tones() -> str:
+    return '\n'.join(f"- {tone}: {description}" for tone, description in TONE_GUIDE.items())
+
+# Kept above the 1024-token minimum for upstream prompt caching
+CONTENT_SYSTEM_PROMPT = f"""You are an expert social media content creator specializing in insurance marketing for licensed insurance agents.
+
+Your expertise includes:
+- Creating compliant, engaging content that builds trust and relationships
+- Understanding insurance regulations and avoiding misleading claims
+- Crafting content that resonates with warm market audiences (friends, family, existing contacts)
+- Incorporating current events, seasonal themes, and life events naturally
+- Balancing educational value with personal connection
+
+Each request asks for 7 social media posts, one for each day of a week, for an insurance agent.
+
+REQUIREMENTS:
+- Target: Warm market (people who already know and trust the agent)
+- Focus: Education, relationship building, trust development
+- Compliance: No misleading claims, avoid pressure tactics
+- Variety: Mix educational, personal, seasonal, and industry insights
+- Use the tone, insurance types and current context given in the request
+
+CONTENT GUIDELINES:
+1. Educational posts: Explain insurance concepts simply
+2. Personal posts: Share relatable stories or experiences
+3. Seasonal posts: Connect insurance to current events/seasons
+4. Industry insights: Share relevant news or trends
+5. Community posts: Highlight local events or causes
+6. Testimonial-style: Share success stories (anonymized)
+7. Question posts: Engage audience with thoughtful questions
+
+INSURANCE TYPES (use the key as "insurance_focus"; only use types the request lists):
+{_catalog()}
+
+TONES:
+{_tones()}
+
+CONTENT THEMES (use as "content_theme"): educational, personal, seasonal, industry, community, testimonial, question
+
+HASHTAGS: 3 to 5 per post, each starting with #, letters and digits only.
+
+IMAGE DESCRIPTIONS: describe one concrete scene (people, setting, mood, colors) an image model can draw.
+No text, logos, charts or documents in the image.
+
+EXAMPLE POST (for format and quality only, do not reuse its content):
+{{
+  "day": 3,
+  "post_text": "Last week a friend asked me what happens to the house if something happens to them. It's one of the most common questions I get, and the answer depends on planning you can do today. Mortgage protection is one way families make sure the home stays theirs. Happy to walk anyone through how it works, no pressure. #MortgageProtection #FamilyFirst",
+  "image_description": "A young family laughing together on the front porch of a modest suburban home at golden hour, warm tones, soft focus background",
+  "hashtags": ["#MortgageProtection", "#FamilyFirst", "#HomeSweetHome"],
+  "insurance_focus": "mortgage_protection",
+  "content_theme": "personal",
+  "engagement_hook": "What's one question you've always wanted to ask about protecting your home?"
+}}
+
+RESPONSE FORMAT (JSON object whose "posts" array has exactly 7 objects, "day" 1 to 7 in date order):
+{{
+  "posts": [
+    {{
+      "day": 1,
+      "post_text": "Engaging post text with natural hashtags integrated",
+      "image_description": "Detailed description for AI image generation",
+      "hashtags": ["#InsuranceEducation", "#LifeInsurance", "#FinancialPlanning"],
+      "insurance_focus": "mortgage_protection",
+      "content_theme": "educational",
+      "engagement_hook": "Question or call-to-action to encourage interaction"
+    }}
+  ]
+}}
+
+Ensure each post is unique, valuable, and builds trust without being salesy.
+Always respond with valid JSON in the exact format requested. Focus on relationship-building rather than direct sales."""
+
+# Short fingerprint of the static prefix, also used as the upstream prompt_cache_key
+CONTENT_PREFIX_HASH = hashlib.sha1(CONTENT_SYSTEM_PROMPT.encode('utf-8')).hexdigest()[:12]
+CONTENT_PROMPT_CACHE_KEY = f"{CONTENT_PROMPT_VERSION}-{CONTENT_PREFIX_HASH}"
+
+def content_request(week_start, week_end, insurance_types, tone, current_month, current_season, themes,
+                    additional_prompt) -> str:
+    """The per-request user message that follows the static system prompt"""
+    return f"""Week: {week_start.strftime('%B %d')} to {week_end.strftime('%B %d, %Y')}
+Insurance types: {', '.join(insurance_types)}
+Tone: {tone}
+Current context: {current_month}, {current_season}, {', '.join(themes)}
+Additional requirements: {additional_prompt if additional_prompt else 'None specified'}"""
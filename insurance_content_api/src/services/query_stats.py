@@ -0,0 +1,181 @@
+"""Per-request SQL query counting and a slow-query log.
+
+SQLAlchemy cursor events count every statement and its time against the
+current request. The totals go out as X-DB-Query-Count / X-DB-Time-Ms
+response headers and into the log, with a warning when a request runs more
+than QUERY_COUNT_WARN_THRESHOLD statements (usually an N+1 pattern).
+
+Statements slower than SLOW_QUERY_THRESHOLD_MS are logged with their
+parameters redacted to type and length, plus the database's query plan
+(EXPLAIN QUERY PLAN on SQLite, EXPLAIN elsewhere) for SELECTs.
+
+In tests, assert_max_queries() fails when a block runs too many queries:
+
+    with assert_max_queries(3):
+        client.get('/api/content/schedules')
+"""
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from flask import current_app, g
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+class QueryCounter:
+    """Queries seen while it was active"""
+
+    def __init__(self, keep_statements=False):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = [] if keep_statements else None
+
+    def add(self, statement, elapsed):
+        self.count += 1
+        self.seconds += elapsed
+        if self.statements is not None:
+            self.statements.append(statement)
+
+# Every active counter receives every query (a test's counter wraps the request's)
+_active_counters = ContextVar('active_query_counters', default=())
+
+def current_counter():
+    """The current request's counter, or None outside a request"""
+    return g.get('query_counter') if g else None
+
+@contextmanager
+def count_queries(keep_statements=True):
+    """Count the queries run inside the block"""
+    counter = QueryCounter(keep_statements)
+    token = _active_counters.set(_active_counters.get() + (counter,))
+    try:
+        yield counter
+    finally:
+        _active_counters.reset(token)
+
+@contextmanager
+def assert_max_queries(limit):
+    """Fail if the block runs more than `limit` queries"""
+    with count_queries() as counter:
+        yield counter
+    if counter.count > limit:
+        statements = '\n'.join(f'  {i + 1}. {s}' for i, s in enumerate(counter.statements))
+        raise AssertionError(f"{counter.count} queries run, expected at most {limit}:\n{statements}")
+
+def redact_parameters(parameters):
+    """Replace parameter values with their type (and length for strings/bytes)"""
+    if isinstance(parameters, dict):
+        return {key: _redact(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [_redact(value) for value in parameters]
+    return _redact(parameters)
+
+def _redact(value):
+    if value is None:
+        return None
+    if isinstance(value, (str, bytes)):
+        return f'<{type(value).__name__} len={len(value)}>'
+    return f'<{type(value).__name__}>'
+
+class QueryStats:
+    def __init__(self):
+        self.app = None
+        self.slow_threshold = None
+        self._listeners = []
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['query_stats'] = self
+        if not app.config.get('QUERY_STATS_ENABLED', True):
+            return
+
+        threshold = app.config.get('SLOW_QUERY_THRESHOLD_MS', 100)
+        self.slow_threshold = threshold / 1000 if threshold is not None else None
+
+        app.before_request(_start_request)
+        app.after_request(_finish_request)
+        app.teardown_request(_end_request)
+
+        with app.app_context():
+            from src.models.insurance_models import db
+            event.listen(db.engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(db.engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        context._query_start = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._query_start
+        for counter in _active_counters.get():
+            counter.add(statement, elapsed)
+
+        for listener in self._listeners:
+            listener(statement, elapsed)
+
+        if self.slow_threshold is not None and elapsed >= self.slow_threshold:
+            self._log_slow_query(conn, statement, parameters, executemany, elapsed)
+
+    def add_listener(self, listener):
+        """Register listener(statement, seconds), called after every query"""
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def _log_slow_query(self, conn, statement, parameters, executemany, elapsed):
+        plan = None
+        if not executemany and statement.lstrip()[:6].upper() == 'SELECT':
+            plan = self._explain(conn, statement, parameters)
+
+        logger.warning(
+            "Slow query (%.1f ms): %s | params=%s%s",
+            elapsed * 1000,
+            ' '.join(statement.split()),
+            '<executemany>' if executemany else redact_parameters(parameters),
+            f"\n  plan: {plan}" if plan else ''
+        )
+
+    def _explain(self, conn, statement, parameters):
+        """Query plan for a statement, via a raw DBAPI cursor so no events fire"""
+        prefix = 'EXPLAIN QUERY PLAN ' if conn.dialect.name == 'sqlite' else 'EXPLAIN '
+        try:
+            cursor = conn.connection.dbapi_connection.cursor()
+            try:
+                cursor.execute(prefix + statement, parameters)
+                return ' | '.join(' '.join(str(col) for col in row) for row in cursor.fetchall())
+            finally:
+                cursor.close()
+        except Exception as e:
+            return f'unavailable ({str(e)})'
+
+def _start_request():
+    counter = QueryCounter()
+    g.query_counter = counter
+    g.query_counter_token = _active_counters.set(_active_counters.get() + (counter,))
+
+def _finish_request(response):
+    counter = g.get('query_counter')
+    if counter is None:
+        return response
+
+    config = current_app.config
+    if config.get('QUERY_STATS_HEADERS', True):
+        response.headers['X-DB-Query-Count'] = str(counter.count)
+        response.headers['X-DB-Time-Ms'] = f'{counter.seconds * 1000:.2f}'
+
+    from flask import request
+    route = request.url_rule.rule if request.url_rule else request.path
+    warn_threshold = config.get('QUERY_COUNT_WARN_THRESHOLD', 30)
+    if warn_threshold and counter.count > warn_threshold:
+        logger.warning(f"{request.method} {route} ran {counter.count} queries "
+                       f"({counter.seconds * 1000:.1f} ms), possible N+1")
+    else:
+        logger.debug(f"{request.method} {route}: {counter.count} queries, {counter.seconds * 1000:.1f} ms")
+    return response
+
+def _end_request(exc=None):
+    token = g.pop('query_counter_token', None)
+    if token is not None:
+        _active_counters.reset(token)
+
+query_stats = QueryStats()
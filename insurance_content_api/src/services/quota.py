@@ -0,0 +1,137 @@
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from flask import current_app
+from src.models.insurance_models import APIUsageDaily
+from src.services.async_bridge import run_blocking
+from src.services.usage_recorder import usage_recorder
+
+PERIODS = ('day', 'month')
+
+# How much of each quota metric a usage event consumes, by endpoint.
+# 'cost' is the priced upstream spend in USD (services/pricing.py).
+ENDPOINT_METRICS = {
+    'generate_content': (('tokens', 'tokens_used'), ('cost', 'cost')),
+    'generate_image': (('images', 'request_count'), ('cost', 'cost')),
+    'regenerate_image': (('regenerations', 'request_count'), ('cost', 'cost')),
+}
+
+class QuotaTracker:
+    """Per-agent usage counters for quota enforcement.
+
+    Counters live in process memory and are seeded from the api_usage_daily
+    rollup the first time an agent is checked, then re-seeded every
+    QUOTA_RESEED_INTERVAL seconds so usage recorded by other workers is
+    picked up. Between re-seeds every check is a dictionary lookup.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._agents: Dict[int, Dict] = {}
+
+    def limits(self, plan: str, metric: str) -> Dict[str, Optional[int]]:
+        """Configured limits for a plan and metric, None meaning unlimited"""
+        plan_quotas = current_app.config.get('PLAN_QUOTAS', {}).get(plan, {})
+        metric_limits = plan_quotas.get(metric, {})
+        return {period: metric_limits.get(period) for period in PERIODS}
+
+    def usage(self, agent_id: int, metric: str) -> Dict[str, int]:
+        """Current day and month usage for an agent"""
+        state = self._state(agent_id)
+        with self._lock:
+            return {period: state['counts'].get((metric, period), 0) for period in PERIODS}
+
+    def remaining(self, agent, metric: str) -> Dict[str, Optional[int]]:
+        """Remaining quota per period for an agent, None meaning unlimited"""
+        limits = self.limits(agent.subscription_status.value, metric)
+        used = self.usage(agent.id, metric)
+        return {
+            period: None if limits[period] is None else max(0, limits[period] - used[period])
+            for period in PERIODS
+        }
+
+    def check(self, agent, metric: str, amount: int = 1) -> Optional[Tuple[str, int]]:
+        """Return the (period, limit) that would be exceeded by `amount`, or None"""
+        limits = self.limits(agent.subscription_status.value, metric)
+        if all(limit is None for limit in limits.values()):
+            return None
+
+        used = self.usage(agent.id, metric)
+        for period in PERIODS:
+            if limits[period] is not None and used[period] + amount > limits[period]:
+                return period, limits[period]
+        return None
+
+    def consume(self, event):
+        """Usage recorder listener: count a recorded event against the agent's quotas"""
+        metrics = ENDPOINT_METRICS.get(event.endpoint)
+        if not metrics:
+            return
+
+        with self._lock:
+            state = self._agents.get(event.agent_id)
+            if state is None or state['day'] != event.created_at.date():
+                # Not seeded yet, or a different day: the next check re-seeds
+                return
+            for metric, field in metrics:
+                amount = 1 if field == 'request_count' else getattr(event, field)
+                for period in PERIODS:
+                    key = (metric, period)
+                    state['counts'][key] = state['counts'].get(key, 0) + amount
+
+    def reset(self, agent_id: int = None):
+        """Drop cached counters for one agent, or for everyone"""
+        with self._lock:
+            if agent_id is None:
+                self._agents.clear()
+            else:
+                self._agents.pop(agent_id, None)
+
+    def _state(self, agent_id: int) -> Dict:
+        today = datetime.utcnow().date()
+        reseed_interval = current_app.config.get('QUOTA_RESEED_INTERVAL', 60)
+
+        with self._lock:
+            state = self._agents.get(agent_id)
+            if state and state['day'] == today and time.monotonic() - state['seeded_at'] < reseed_interval:
+                return state
+
+        state = {'day': today, 'counts': run_blocking(self._seed, agent_id, today), 'seeded_at': time.monotonic()}
+        with self._lock:
+            self._agents[agent_id] = state
+        return state
+
+    def _seed(self, agent_id: int, today) -> Dict[Tuple[str, str], int]:
+        """Load this month's usage from the daily rollup (at most 31 rows)"""
+        # Make sure our own buffered events are visible to the seed query
+        usage_recorder.flush()
+
+        rows = APIUsageDaily.query.filter(
+            APIUsageDaily.agent_id == agent_id,
+            APIUsageDaily.day >= today.replace(day=1),
+            APIUsageDaily.day <= today
+        ).all()
+
+        counts: Dict[Tuple[str, str], int] = {}
+        for row in rows:
+            for metric, field in ENDPOINT_METRICS.get(row.endpoint, ()):
+                amount = getattr(row, field) or 0
+                periods = PERIODS if row.day == today else ('month',)
+                for period in periods:
+                    counts[(metric, period)] = counts.get((metric, period), 0) + amount
+        return counts
+
+def seconds_until_reset(period: str) -> int:
+    """Seconds until the given quota period rolls over (UTC)"""
+    now = datetime.utcnow()
+    if period == 'day':
+        reset_at = datetime(now.year, now.month, now.day) + timedelta(days=1)
+    else:
+        reset_at = datetime(now.year + now.month // 12, now.month % 12 + 1, 1)
+    return math.ceil((reset_at - now).total_seconds())
+
+quota_tracker = QuotaTracker()
+usage_recorder.add_listener(quota_tracker.consume)
@@ -0,0 +1,190 @@
+"""Dated events and observances for the seasonal context of a week's posts.
+
+calendar_for(year) builds, once per year, every event from EVENT_RULES:
+fixed-date holidays, movable ones (nth weekday of a month, last weekday,
+Easter and days relative to it) and multi-day observances such as
+awareness months and open enrollment periods. Each year's calendar also
+holds the neighbouring years' events that reach within a week of it, so
+weeks spanning New Year and periods like ACA open enrollment (Nov 1 to
+Jan 15) come out right.
+
+Events are stored in a static centered interval tree, so "events
+overlapping this week" costs O(log n + k). events_for_week() caches the
+answer per week; both caches are small and live for the process.
+"""
+import calendar
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import List, NamedTuple, Optional, Tuple
+
+class Event(NamedTuple):
+    start: date
+    end: date  # inclusive
+    name: str
+
+    def describe(self) -> str:
+        """Prompt text: single days carry their date so posts can land on the right day"""
+        if self.start == self.end:
+            return f"{self.name} ({self.start.strftime('%a %b')} {self.start.day})"
+        return self.name
+
+# Date rules, each year -> a date
+
+def fixed(month: int, day: int):
+    return lambda year: date(year, month, day)
+
+def nth_weekday(n: int, weekday: int, month: int):
+    """nth (1-based) weekday (0 = Monday) of a month"""
+    def rule(year):
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    return rule
+
+def last_weekday(weekday: int, month: int):
+    def rule(year):
+        last = date(year, month, calendar.monthrange(year, month)[1])
+        return last - timedelta(days=(last.weekday() - weekday) % 7)
+    return rule
+
+def easter(year: int) -> date:
+    """Western Easter Sunday (anonymous Gregorian algorithm)"""
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = b // 4, b % 4
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+def after(rule, days: int):
+    return lambda year: rule(year) + timedelta(days=days)
+
+def month_end(month: int):
+    return lambda year: date(year, month, calendar.monthrange(year, month)[1])
+
+def next_year(rule):
+    """For periods that end in the following year"""
+    return lambda year: rule(year + 1)
+
+MON, TUE, WED, THU, FRI, SAT, SUN = range(7)
+
+# (name, start rule, end rule or None for a single day)
+EVENT_RULES = [
+    # Holidays
+    ("New Year's Day", fixed(1, 1), None),
+    ("Martin Luther King Jr. Day", nth_weekday(3, MON, 1), None),
+    ("Valentine's Day", fixed(2, 14), None),
+    ("Presidents' Day", nth_weekday(3, MON, 2), None),
+    ("St. Patrick's Day", fixed(3, 17), None),
+    ("Daylight saving time begins", nth_weekday(2, SUN, 3), None),
+    ("Good Friday", after(easter, -2), None),
+    ("Easter", easter, None),
+    ("Tax Day", fixed(4, 15), None),
+    ("Mother's Day", nth_weekday(2, SUN, 5), None),
+    ("Memorial Day", last_weekday(MON, 5), None),
+    ("Father's Day", nth_weekday(3, SUN, 6), None),
+    ("Juneteenth", fixed(6, 19), None),
+    ("Independence Day", fixed(7, 4), None),
+    ("Labor Day", nth_weekday(1, MON, 9), None),
+    ("Grandparents Day", after(nth_weekday(1, MON, 9), 6), None),
+    ("Halloween", fixed(10, 31), None),
+    ("Daylight saving time ends", nth_weekday(1, SUN, 11), None),
+    ("Veterans Day", fixed(11, 11), None),
+    ("Thanksgiving", nth_weekday(4, THU, 11), None),
+    ("Small Business Saturday", after(nth_weekday(4, THU, 11), 2), None),
+    ("Christmas", fixed(12, 25), None),
+    ("New Year's Eve", fixed(12, 31), None),
+
+    # Awareness periods
+    ("American Heart Month", fixed(2, 1), month_end(2)),
+    ("Women's History Month", fixed(3, 1), month_end(3)),
+    ("Financial Literacy Month", fixed(4, 1), month_end(4)),
+    ("Disability Insurance Awareness Month", fixed(5, 1), month_end(5)),
+    ("Annuity Awareness Month", fixed(6, 1), month_end(6)),
+    ("Life Insurance Awareness Month", fixed(9, 1), month_end(9)),
+    ("Breast Cancer Awareness Month", fixed(10, 1), month_end(10)),
+    ("National Estate Planning Awareness Week", nth_weekday(3, MON, 10), after(nth_weekday(3, MON, 10), 6)),
+
+    # Enrollment periods
+    ("Medicare Annual Enrollment Period", fixed(10, 15), fixed(12, 7)),
+    ("ACA Open Enrollment", fixed(11, 1), next_year(fixed(1, 15))),
+
+    # Seasons of the year
+    ("New Year resolutions and fresh starts", fixed(1, 1), fixed(1, 21)),
+    ("tax season", fixed(1, 27), fixed(4, 15)),
+    ("spring cleaning", fixed(3, 15), fixed(4, 30)),
+    ("graduation season", fixed(5, 1), fixed(6, 15)),
+    ("wedding season", fixed(6, 1), fixed(9, 30)),
+    ("summer vacation and family travel", nth_weekday(3, SUN, 6), fixed(8, 15)),
+    ("back to school", fixed(8, 1), fixed(9, 10)),
+    ("holiday season and family gatherings", after(nth_weekday(4, THU, 11), 1), fixed(12, 31)),
+    ("year-end financial planning", fixed(12, 1), fixed(12, 31)),
+]
+
+class IntervalTree:
+    """Static centered interval tree over inclusive (start, end) intervals"""
+
+    __slots__ = ('center', 'by_start', 'by_end', 'left', 'right')
+
+    def __init__(self, events: List[Event]):
+        points = sorted(p for event in events for p in (event.start, event.end))
+        self.center = points[len(points) // 2] if points else None
+        here = [e for e in events if e.start <= self.center <= e.end] if points else []
+        self.by_start = sorted(here, key=lambda e: e.start)
+        self.by_end = sorted(here, key=lambda e: e.end, reverse=True)
+        left = [e for e in events if e.end < self.center] if points else []
+        right = [e for e in events if e.start > self.center] if points else []
+        self.left = IntervalTree(left) if left else None
+        self.right = IntervalTree(right) if right else None
+
+    def overlapping(self, start: date, end: date, found: Optional[list] = None) -> list:
+        """Intervals overlapping [start, end]"""
+        if found is None:
+            found = []
+        if self.center is None:
+            return found
+        if end < self.center:
+            # Intervals here all reach the center, so only their starts matter
+            for event in self.by_start:
+                if event.start > end:
+                    break
+                found.append(event)
+            if self.left is not None:
+                self.left.overlapping(start, end, found)
+        elif start > self.center:
+            for event in self.by_end:
+                if event.end < start:
+                    break
+                found.append(event)
+            if self.right is not None:
+                self.right.overlapping(start, end, found)
+        else:
+            found.extend(self.by_start)
+            if self.left is not None:
+                self.left.overlapping(start, end, found)
+            if self.right is not None:
+                self.right.overlapping(start, end, found)
+        return found
+
+@lru_cache(maxsize=4)
+def calendar_for(year: int) -> IntervalTree:
+    """All events within a week of the given year"""
+    window_start, window_end = date(year, 1, 1) - timedelta(days=7), date(year, 12, 31) + timedelta(days=7)
+    events = []
+    for rule_year in (year - 1, year, year + 1):
+        for name, start_rule, end_rule in EVENT_RULES:
+            start = start_rule(rule_year)
+            end = end_rule(rule_year) if end_rule is not None else start
+            if start <= window_end and end >= window_start:
+                events.append(Event(start, end, name))
+    return IntervalTree(events)
+
+@lru_cache(maxsize=512)
+def events_for_week(week_start: date) -> Tuple[Event, ...]:
+    """Events overlapping the 7 days from week_start: dated days first, then longer periods"""
+    week_end = week_start + timedelta(days=6)
+    events = calendar_for(week_start.year).overlapping(week_start, week_end)
+    return tuple(sorted(events, key=lambda e: (e.start != e.end, e.start, e.name)))
@@ -0,0 +1,246 @@
+"""Key/value storage backends for the standalone demo servers (main.py, main_local.py).
+
+Both backends expose the same small dict-like interface, so the servers can
+swap ``users = {}`` for ``users = create_store('users')``:
+
+- MemoryStore keeps values in process memory with optional TTL expiry, an
+  LRU size cap and a background sweep of expired entries.
+- SQLiteStore persists values as JSON in a SQLite file (WAL mode), so data
+  survives restarts and is shared by several worker processes.
+
+Pick the backend with SESSION_STORE_BACKEND=memory|sqlite and the file with
+SESSION_STORE_PATH.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+_MISSING = object()
+
+class MemoryStore:
+    """In-process store with TTL expiry and LRU eviction"""
+
+    def __init__(self, ttl=None, max_size=None, sweep_interval=60):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.sweep_interval = sweep_interval
+        self._data = OrderedDict()  # key -> (expires_at or None, value)
+        self._lock = threading.RLock()
+        self._sweeper = None
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=_MISSING):
+        ttl = self.ttl if ttl is _MISSING else ttl
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            if self.max_size:
+                while len(self._data) > self.max_size:
+                    self._data.popitem(last=False)
+        self._start_sweeper()
+
+    def delete(self, key):
+        with self._lock:
+            return self._data.pop(key, None) is not None
+
+    @contextmanager
+    def transaction(self):
+        """Make the block's reads and writes on this store atomic (read-modify-write)"""
+        with self._lock:
+            yield
+
+    def items(self):
+        """Snapshot of live (key, value) pairs"""
+        now = time.time()
+        with self._lock:
+            return [(k, v) for k, (expires_at, v) in self._data.items()
+                    if expires_at is None or expires_at > now]
+
+    def keys(self):
+        return [k for k, _ in self.items()]
+
+    def values(self):
+        return [v for _, v in self.items()]
+
+    def sweep(self):
+        """Remove expired entries, returns how many were dropped"""
+        now = time.time()
+        with self._lock:
+            expired = [k for k, (expires_at, _) in self._data.items()
+                       if expires_at is not None and expires_at <= now]
+            for key in expired:
+                del self._data[key]
+        return len(expired)
+
+    def _start_sweeper(self):
+        if self._sweeper is not None or not self.ttl or not self.sweep_interval:
+            return
+        with self._lock:
+            if self._sweeper is None:
+                self._sweeper = threading.Thread(target=self._sweep_loop, name='session-store-sweep', daemon=True)
+                self._sweeper.start()
+
+    def _sweep_loop(self):
+        while True:
+            time.sleep(self.sweep_interval)
+            self.sweep()
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def __delitem__(self, key):
+        if not self.delete(key):
+            raise KeyError(key)
+
+    def __len__(self):
+        return len(self.items())
+
+class SQLiteStore(MemoryStore):
+    """SQLite-backed store; values must be JSON serializable"""
+
+    def __init__(self, path, namespace, ttl=None, max_size=None, sweep_interval=60):
+        super().__init__(ttl=ttl, max_size=max_size, sweep_interval=sweep_interval)
+        self.path = path
+        self.namespace = namespace
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS kv_store (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    expires_at REAL,
+                    accessed_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_kv_store_expires ON kv_store (namespace, expires_at)")
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """Run the block's reads and writes on this store in one SQLite transaction.
+
+        BEGIN IMMEDIATE takes the write lock up front, so read-modify-write
+        blocks are serialized across threads and processes. Only this store's
+        calls on this thread join the transaction; writing another store that
+        shares the file from inside the block would wait on this lock.
+        """
+        conn = self._connect()
+        if conn.in_transaction:
+            yield
+            return
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def get(self, key, default=None):
+        now = time.time()
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT value FROM kv_store WHERE namespace = ? AND key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (self.namespace, key, now)
+        ).fetchone()
+        if row is None:
+            return default
+        if self.max_size:
+            # Recency only matters when the sweep has a size cap to enforce
+            conn.execute("UPDATE kv_store SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                         (now, self.namespace, key))
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl=_MISSING):
+        ttl = self.ttl if ttl is _MISSING else ttl
+        now = time.time()
+        self._connect().execute(
+            "INSERT OR REPLACE INTO kv_store (namespace, key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+            (self.namespace, key, json.dumps(value), now + ttl if ttl else None, now)
+        )
+        self._start_sweeper()
+
+    def delete(self, key):
+        cursor = self._connect().execute(
+            "DELETE FROM kv_store WHERE namespace = ? AND key = ?", (self.namespace, key))
+        return cursor.rowcount > 0
+
+    def items(self):
+        rows = self._connect().execute(
+            "SELECT key, value FROM kv_store WHERE namespace = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (self.namespace, time.time())
+        ).fetchall()
+        return [(key, json.loads(value)) for key, value in rows]
+
+    def sweep(self):
+        conn = self._connect()
+        removed = conn.execute(
+            "DELETE FROM kv_store WHERE namespace = ? AND expires_at IS NOT NULL AND expires_at <= ?",
+            (self.namespace, time.time())
+        ).rowcount
+        if self.max_size:
+            removed += conn.execute("""
+                DELETE FROM kv_store WHERE namespace = ? AND key IN (
+                    SELECT key FROM kv_store WHERE namespace = ?
+                    ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.namespace, self.namespace, self.max_size)).rowcount
+        return removed
+
+    def _start_sweeper(self):
+        # Size caps are enforced by the sweep here, so run it even without a TTL
+        if self._sweeper is not None or not (self.ttl or self.max_size) or not self.sweep_interval:
+            return
+        with self._lock:
+            if self._sweeper is None:
+                self._sweeper = threading.Thread(target=self._sweep_loop, name='session-store-sweep', daemon=True)
+                self._sweeper.start()
+
+def create_store(namespace, ttl=None, max_size=None):
+    """Create a store for `namespace` using the backend selected by the environment"""
+    backend = os.environ.get('SESSION_STORE_BACKEND', 'memory')
+    sweep_interval = int(os.environ.get('SESSION_STORE_SWEEP_INTERVAL', 60))
+
+    if backend == 'sqlite':
+        path = os.environ.get('SESSION_STORE_PATH') or \
+            os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database', 'demo_store.db')
+        return SQLiteStore(path, namespace, ttl=ttl, max_size=max_size, sweep_interval=sweep_interval)
+
+    if backend != 'memory':
+        raise ValueError(f"Unknown SESSION_STORE_BACKEND: {backend}")
+    return MemoryStore(ttl=ttl, max_size=max_size, sweep_interval=sweep_interval)
@@ -0,0 +1,142 @@
+"""In-memory static file serving for the bundled React frontend.
+
+At startup the static folder is read once into a manifest: bytes, content
+type, ETag and gzip/brotli variants for every file. Variants shipped next to
+a file by the frontend build (``app.js.gz``, ``app.js.br``) are used as-is;
+otherwise they are compressed once here (brotli only when the ``brotli``
+package is installed). Requests never touch the filesystem.
+
+Cache policy:
+- ``assets/*`` files have content hashes in their names, so they are sent
+  with a one-year ``immutable`` Cache-Control.
+- ``index.html`` (also served for every client-side route) is ``no-cache``,
+  so browsers revalidate it with If-None-Match and get a 304 when unchanged.
+- Anything else gets a short STATIC_MAX_AGE.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+from typing import Dict, NamedTuple
+
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:  # optional, gzip only
+    brotli = None
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+INDEX_CACHE_CONTROL = 'no-cache'
+COMPRESS_MIN_SIZE = 1024  # bytes; smaller files are not worth compressing
+COMPRESSED_SUFFIXES = {'.gz': 'gzip', '.br': 'br'}
+
+class StaticAsset(NamedTuple):
+    path: str
+    mimetype: str
+    etag: str
+    cache_control: str
+    variants: Dict[str, bytes]  # content-coding -> body ('identity' is always present)
+
+def _compress(data: bytes, encoding: str):
+    if encoding == 'gzip':
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    if encoding == 'br' and brotli is not None:
+        return brotli.compress(data, quality=11)
+    return None
+
+class StaticAssets:
+    """Serves the frontend from an in-memory manifest, with SPA fallback to index.html"""
+
+    def __init__(self):
+        self.root = None
+        self.max_age = 3600
+        self.manifest = {}
+
+    def init_app(self, app, root=None):
+        self.root = root or app.static_folder
+        self.max_age = app.config.get('STATIC_MAX_AGE', 3600)
+        self.reload()
+        app.extensions['static_assets'] = self
+
+        app.add_url_rule('/', 'index', self.serve)
+        app.add_url_rule('/<path:path>', 'serve_static', self.serve)
+
+    def reload(self):
+        """(Re)build the manifest from the static folder"""
+        manifest = {}
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                full_path = os.path.join(directory, name)
+                path = os.path.relpath(full_path, self.root).replace(os.sep, '/')
+                base, suffix = os.path.splitext(path)
+                if suffix in COMPRESSED_SUFFIXES and os.path.exists(os.path.join(self.root, base)):
+                    continue  # picked up as a variant of `base`
+                manifest[path] = self._load(path, full_path)
+        self.manifest = manifest
+        return len(manifest)
+
+    def _load(self, path, full_path):
+        with open(full_path, 'rb') as f:
+            data = f.read()
+
+        variants = {'identity': data}
+        for suffix, encoding in COMPRESSED_SUFFIXES.items():
+            if os.path.exists(full_path + suffix):
+                with open(full_path + suffix, 'rb') as f:
+                    variants[encoding] = f.read()
+            elif len(data) >= COMPRESS_MIN_SIZE:
+                compressed = _compress(data, encoding)
+                # Keep only variants that actually save something (skips images, fonts...)
+                if compressed is not None and len(compressed) < len(data) * 0.9:
+                    variants[encoding] = compressed
+
+        if path.startswith('assets/'):
+            cache_control = IMMUTABLE_CACHE_CONTROL
+        elif path == 'index.html':
+            cache_control = INDEX_CACHE_CONTROL
+        else:
+            cache_control = f'public, max-age={self.max_age}'
+
+        mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        return StaticAsset(
+            path=path,
+            mimetype=mimetype,
+            etag=hashlib.sha1(data).hexdigest()[:20],
+            cache_control=cache_control,
+            variants=variants
+        )
+
+    def _choose_encoding(self, asset):
+        best, best_quality = 'identity', 0
+        for encoding in ('br', 'gzip'):
+            quality = request.accept_encodings[encoding]
+            if encoding in asset.variants and quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+
+    def serve(self, path='index.html'):
+        """Serve a static file, or index.html for client-side routes"""
+        asset = self.manifest.get(path) or self.manifest.get('index.html')
+        if asset is None:
+            return Response('Not Found', status=404, mimetype='text/plain')
+
+        encoding = self._choose_encoding(asset)
+        # Each encoding is a different representation, so it needs its own strong ETag
+        etag = asset.etag if encoding == 'identity' else f'{asset.etag}-{encoding}'
+
+        headers = {
+            'Cache-Control': asset.cache_control,
+            'Vary': 'Accept-Encoding'
+        }
+        if request.if_none_match.contains(etag):
+            response = Response(status=304, headers=headers)
+        else:
+            body = asset.variants[encoding]
+            response = Response(body, mimetype=asset.mimetype, headers=headers)
+            if encoding != 'identity':
+                response.headers['Content-Encoding'] = encoding
+        response.set_etag(etag)
+        return response
+
+static_assets = StaticAssets()
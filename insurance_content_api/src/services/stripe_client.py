@@ -0,0 +1,51 @@
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+from flask import current_app, has_app_context
+
+from src.services.tracing import tracer, outbound_headers
+
+class _StripeProxy:
+    """Stand-in for the ``stripe`` module that resolves the configured backend on use.
+
+    STRIPE_BACKEND = 'stripe' (default) uses the real SDK, imported on first
+    use; 'fake' uses the in-process FakeStripe from services/fake_stripe.py.
+    Call sites keep the SDK's shape: ``stripe.Customer.create(...)``,
+    ``except stripe.error.InvalidRequestError``.
+    """
+
+    def __getattr__(self, name):
+        return getattr(get_stripe(), name)
+
+def get_stripe():
+    """Return the Stripe API object for the current app"""
+    backend = current_app.config.get('STRIPE_BACKEND', 'stripe') if has_app_context() else 'stripe'
+    if backend == 'fake':
+        from src.services.fake_stripe import fake_stripe
+        return fake_stripe
+
+    import stripe as stripe_sdk
+    if not isinstance(stripe_sdk.default_http_client, _tracing_http_client_class(stripe_sdk)):
+        stripe_sdk.default_http_client = _tracing_http_client_class(stripe_sdk)()
+    if has_app_context() and current_app.config.get('STRIPE_SECRET_KEY'):
+        stripe_sdk.api_key = current_app.config['STRIPE_SECRET_KEY']
+    elif stripe_sdk.api_key is None:
+        stripe_sdk.api_key = 'sk_test_placeholder'
+    return stripe_sdk
+
+@lru_cache(maxsize=1)
+def _tracing_http_client_class(stripe_sdk):
+    """The SDK's requests-based HTTP client, with a span and traceparent per API call"""
+    class TracingRequestsClient(stripe_sdk.RequestsClient):
+        def request(self, method, url, headers, post_data=None):
+            path = urlsplit(url).path
+            with tracer.span(f"stripe {method.upper()} {path}", {'http.method': method.upper(), 'http.url': path},
+                             kind='client') as span:
+                headers = dict(headers or {}, **outbound_headers())
+                content, status_code, response_headers = super().request(method, url, headers, post_data)
+                span.set_attribute('http.status_code', status_code)
+                return content, status_code, response_headers
+
+    return TracingRequestsClient
+
+stripe = _StripeProxy()
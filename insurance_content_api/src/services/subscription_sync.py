@@ -0,0 +1,145 @@
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from src.models.insurance_models import db, Agent, SubscriptionMirror
+from src.services.lease import acquire_lease
+from src.services.stripe_client import stripe
+
+def _field(obj, key, default=None):
+    """Read a key from a webhook dict or a StripeObject alike"""
+    if obj is None:
+        return default
+    return obj[key] if key in obj else default
+
+def _timestamp(value):
+    return datetime.utcfromtimestamp(value) if value else None
+
+def mirror_fields(subscription):
+    """Extract the mirrored fields from a Stripe subscription object"""
+    items = _field(_field(subscription, 'items'), 'data') or []
+    item = items[0] if items else None
+    price = _field(item, 'price')
+
+    # Newer API versions report the billing period per item
+    period_end = _field(subscription, 'current_period_end') or _field(item, 'current_period_end')
+
+    return {
+        'stripe_subscription_id': _field(subscription, 'id'),
+        'status': _field(subscription, 'status'),
+        'current_period_end': _timestamp(period_end),
+        'cancel_at_period_end': bool(_field(subscription, 'cancel_at_period_end', False)),
+        'amount': _field(price, 'unit_amount'),
+        'interval': _field(_field(price, 'recurring'), 'interval')
+    }
+
+def upsert_mirror(agent_id, subscription):
+    """Create or update an agent's mirror row from a Stripe subscription (caller commits)"""
+    mirror = SubscriptionMirror.query.filter_by(agent_id=agent_id).first()
+    if mirror is None:
+        mirror = SubscriptionMirror(agent_id=agent_id)
+        db.session.add(mirror)
+
+    for key, value in mirror_fields(subscription).items():
+        if value is not None:
+            setattr(mirror, key, value)
+    mirror.synced_at = datetime.utcnow()
+    mirror.sync_failures = 0
+    mirror.next_sync_attempt_at = None
+    return mirror
+
+def refresh_mirror(agent_id, stripe_subscription_id):
+    """Fetch a subscription from Stripe and store it in the mirror"""
+    subscription = stripe.Subscription.retrieve(stripe_subscription_id)
+    mirror = upsert_mirror(agent_id, subscription)
+    db.session.commit()
+    return mirror
+
+class SubscriptionReconciler:
+    """Periodically re-syncs stale or missing subscription mirrors from Stripe.
+
+    Webhooks keep mirrors current; this repairs whatever they missed (lost
+    deliveries, failed events, changes made in the Stripe dashboard).
+    Never-synced mirrors go first, then the oldest. A failed sync is retried
+    with exponential backoff (SUBSCRIPTION_RECONCILE_RETRY_BACKOFF, capped at
+    SUBSCRIPTION_MIRROR_MAX_AGE), so a few broken subscriptions cannot take
+    the whole batch every run. Every web and worker process starts the
+    thread, but a lease lets only one of them reconcile at a time.
+    """
+
+    def __init__(self):
+        self.app = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['subscription_reconciler'] = self
+
+    def start(self):
+        """Start the reconcile thread if SUBSCRIPTION_RECONCILE_INTERVAL is set"""
+        interval = self.app.config.get('SUBSCRIPTION_RECONCILE_INTERVAL', 3600)
+        if interval and self._thread is None:
+            self._thread = threading.Thread(target=self._run, args=(interval,),
+                                            name='subscription-reconciler', daemon=True)
+            self._thread.start()
+
+    def reconcile(self, max_age=None, batch_size=None):
+        """Refresh mirrors older than max_age and create missing ones; returns the count"""
+        config = self.app.config
+        max_age = max_age or timedelta(seconds=config.get('SUBSCRIPTION_MIRROR_MAX_AGE', 6 * 3600))
+        batch_size = batch_size or config.get('SUBSCRIPTION_RECONCILE_BATCH_SIZE', 100)
+        now = datetime.utcnow()
+        stale_before = now - max_age
+
+        rows = db.session.query(Agent.id, Agent.stripe_subscription_id).outerjoin(
+            SubscriptionMirror, SubscriptionMirror.agent_id == Agent.id
+        ).filter(
+            Agent.stripe_subscription_id.isnot(None),
+            db.or_(SubscriptionMirror.id.is_(None),
+                   SubscriptionMirror.synced_at.is_(None),
+                   SubscriptionMirror.synced_at < stale_before),
+            db.or_(SubscriptionMirror.next_sync_attempt_at.is_(None),
+                   SubscriptionMirror.next_sync_attempt_at <= now)
+        ).order_by(
+            SubscriptionMirror.synced_at.asc().nulls_first()
+        ).limit(batch_size).all()
+
+        refreshed = 0
+        for agent_id, stripe_subscription_id in rows:
+            try:
+                refresh_mirror(agent_id, stripe_subscription_id)
+                refreshed += 1
+            except Exception as e:
+                db.session.rollback()
+                logging.error(f"Error reconciling subscription {stripe_subscription_id}: {str(e)}")
+                self._record_failure(agent_id, max_age)
+        return refreshed
+
+    def _record_failure(self, agent_id, max_age):
+        """Back off before the next attempt; a missing mirror gets an unsynced placeholder row"""
+        try:
+            mirror = SubscriptionMirror.query.filter_by(agent_id=agent_id).first()
+            if mirror is None:
+                mirror = SubscriptionMirror(agent_id=agent_id)
+                db.session.add(mirror)
+            mirror.sync_failures = (mirror.sync_failures or 0) + 1
+            backoff = self.app.config.get('SUBSCRIPTION_RECONCILE_RETRY_BACKOFF', 300) * 2 ** (mirror.sync_failures - 1)
+            mirror.next_sync_attempt_at = datetime.utcnow() + min(timedelta(seconds=backoff), max_age)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f"Error recording reconcile failure for agent {agent_id}: {str(e)}")
+
+    def _run(self, interval):
+        # Outlives one missed run of the holder, then another process takes over
+        lease_ttl = timedelta(seconds=2 * interval)
+        while not self._stop.wait(interval):
+            try:
+                with self.app.app_context():
+                    if acquire_lease('subscription_reconciler', lease_ttl):
+                        self.reconcile()
+            except Exception as e:
+                logging.error(f"Subscription reconciler error: {str(e)}")
+
+subscription_reconciler = SubscriptionReconciler()
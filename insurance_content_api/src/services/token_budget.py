@@ -0,0 +1,85 @@
+"""Completion token budgets (max_tokens) learned from past responses.
+
+The provider reserves capacity for the full max_tokens of a request and
+latency grows with it, so asking for a fixed 3500 tokens when a week of
+posts usually takes ~1800 wastes both. budget(shape) returns the
+TOKEN_BUDGET_PERCENTILE of the completion tokens recently used by requests
+of the same shape (task, model, number of insurance types, whether the
+agent added instructions) plus TOKEN_BUDGET_MARGIN, clamped to
+[TOKEN_BUDGET_FLOOR, TOKEN_BUDGET_CEILING]. Until a shape has
+TOKEN_BUDGET_MIN_SAMPLES responses, TOKEN_BUDGET_DEFAULT is used.
+
+A response cut off by the budget (finish_reason 'length') is retried once
+with retry_budget(), and its token count is still recorded so the learned
+budget grows.
+
+estimate_tokens() approximates prompt size (about 4 characters per token
+for English text, no tokenizer needed); check_prompt() warns when a prompt
+passes PROMPT_TOKEN_WARN_LIMIT, e.g. after system prompt edits or very
+long agent instructions.
+"""
+import logging
+import math
+import threading
+from collections import deque
+from typing import Optional, Tuple
+
+from flask import current_app
+
+class TokenBudget:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._history = {}  # shape -> deque of completion token counts
+
+    def record(self, shape: Tuple, completion_tokens: Optional[int]):
+        """Record the completion tokens one response of this shape used"""
+        if not completion_tokens:
+            return
+        with self._lock:
+            history = self._history.get(shape)
+            if history is None:
+                history = self._history[shape] = deque(maxlen=current_app.config.get('TOKEN_BUDGET_HISTORY', 200))
+            history.append(completion_tokens)
+
+    def percentile(self, shape: Tuple, q: float) -> Optional[int]:
+        with self._lock:
+            history = sorted(self._history.get(shape, ()))
+        if not history:
+            return None
+        return history[min(len(history) - 1, math.ceil(q * len(history)) - 1)]
+
+    def budget(self, shape: Tuple) -> int:
+        """max_tokens for the next request of this shape"""
+        config = current_app.config
+        with self._lock:
+            samples = len(self._history.get(shape, ()))
+        if samples < config.get('TOKEN_BUDGET_MIN_SAMPLES', 20):
+            return config.get('TOKEN_BUDGET_DEFAULT', 3500)
+        observed = self.percentile(shape, config.get('TOKEN_BUDGET_PERCENTILE', 0.99))
+        budget = math.ceil(observed * (1 + config.get('TOKEN_BUDGET_MARGIN', 0.15)))
+        return max(config.get('TOKEN_BUDGET_FLOOR', 1000), min(config.get('TOKEN_BUDGET_CEILING', 4096), budget))
+
+    def retry_budget(self, budget: int) -> Optional[int]:
+        """A larger budget after a truncated response, or None if already at the ceiling"""
+        ceiling = current_app.config.get('TOKEN_BUDGET_CEILING', 4096)
+        if budget >= ceiling:
+            return None
+        return min(ceiling, budget * 2)
+
+    def reset(self):
+        with self._lock:
+            self._history.clear()
+
+token_budget = TokenBudget()
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count of English text"""
+    return math.ceil(len(text) / 4)
+
+def check_prompt(shape: Tuple, *parts: str) -> int:
+    """Estimated prompt tokens, with a warning when over PROMPT_TOKEN_WARN_LIMIT"""
+    estimate = sum(estimate_tokens(part) for part in parts)
+    limit = current_app.config.get('PROMPT_TOKEN_WARN_LIMIT', 2500)
+    if estimate > limit:
+        logging.warning(f"Prompt for {shape} is ~{estimate} tokens, over the {limit} token warning limit")
+    return estimate
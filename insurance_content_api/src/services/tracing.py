@@ -0,0 +1,343 @@
+"""Lightweight request tracing with W3C trace context.
+
+Every request gets a root span named after its route; code inside it opens
+child spans with tracer.span('name') or the @traced('name') decorator
+(AIContentService stages, OpenAI and Stripe calls, DB statements, jobs).
+Spans live in a context variable, so nesting follows the call stack and
+greenlet-bridged views keep their own trace.
+
+Trace context propagates:
+
+* in: an incoming ``traceparent`` header continues the caller's trace and
+  its sampling decision;
+* out: outbound_headers() gives the ``traceparent`` for upstream calls
+  (OpenAI requests, the Stripe HTTP client); queued jobs carry the trace of
+  the request that enqueued them;
+* logs: every log record has ``trace_id`` and ``span_id`` attributes, for
+  use in a format string such as ``%(trace_id)s``;
+* clients: responses carry an X-Trace-Id header.
+
+Trace ids are always assigned; spans are only recorded for sampled traces,
+with probability TRACING_SAMPLE_RATE, and only when TRACING_EXPORTER is
+set: 'jsonl' appends one JSON object per span to TRACING_FILE, 'otlp' posts
+batches in the OTLP/HTTP JSON encoding to TRACING_OTLP_ENDPOINT (a local
+OpenTelemetry Collector, Jaeger or Tempo). Spans are exported in batches
+from a background thread; if the exporter falls behind, spans are dropped
+rather than buffered without limit.
+"""
+import atexit
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from flask import g, request
+
+from src.services.query_stats import current_counter, query_stats
+
+OTLP_SPAN_KINDS = {'internal': 1, 'server': 2, 'client': 3}
+TRACEPARENT_RE = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+
+_current_span = ContextVar('current_span', default=None)
+
+class Span:
+    """One timed operation within a trace"""
+
+    __slots__ = ('name', 'kind', 'trace_id', 'span_id', 'parent_id', 'sampled', 'attributes',
+                 'start_ns', 'end_ns', 'error')
+
+    def __init__(self, name, trace_id, parent_id, sampled, attributes=None, start_ns=None, kind='internal'):
+        self.name = name
+        self.kind = kind  # 'server', 'client' (upstream calls) or 'internal'
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.attributes = dict(attributes) if sampled and attributes else {}
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns = None
+        self.error = None
+
+    @property
+    def traceparent(self):
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def set_attribute(self, key, value):
+        if self.sampled:
+            self.attributes[key] = value
+
+    def record_exception(self, exc):
+        self.error = f"{type(exc).__name__}: {exc}"
+
+    def to_dict(self):
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'kind': self.kind,
+            'start_ns': self.start_ns,
+            'end_ns': self.end_ns,
+            'duration_ms': round((self.end_ns - self.start_ns) / 1e6, 3),
+            'status': 'error' if self.error else 'ok',
+            'error': self.error,
+            'attributes': self.attributes
+        }
+
+def parse_traceparent(value):
+    """(trace_id, parent span_id, sampled) from a traceparent header, or None"""
+    match = TRACEPARENT_RE.match((value or '').strip().lower())
+    if not match or match.group(1) == '0' * 32 or match.group(2) == '0' * 16:
+        return None
+    return match.group(1), match.group(2), bool(int(match.group(3), 16) & 1)
+
+def current_span():
+    return _current_span.get()
+
+def outbound_headers():
+    """Headers that carry the current trace to an upstream service"""
+    span = _current_span.get()
+    return {'traceparent': span.traceparent} if span is not None else {}
+
+class JsonlExporter:
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def export(self, spans, service_name):
+        lines = ''.join(json.dumps(dict(span.to_dict(), service=service_name)) + '\n' for span in spans)
+        with open(self.path, 'a') as f:
+            f.write(lines)
+
+class OtlpHttpExporter:
+    def __init__(self, endpoint, timeout=5):
+        import requests
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def export(self, spans, service_name):
+        payload = {'resourceSpans': [{
+            'resource': {'attributes': _otlp_attributes({'service.name': service_name})},
+            'scopeSpans': [{
+                'scope': {'name': 'insurecontent.tracing'},
+                'spans': [self._span(span) for span in spans]
+            }]
+        }]}
+        response = self.session.post(self.endpoint, json=payload, timeout=self.timeout)
+        response.raise_for_status()
+
+    def _span(self, span):
+        encoded = {
+            'traceId': span.trace_id,
+            'spanId': span.span_id,
+            'name': span.name,
+            'kind': OTLP_SPAN_KINDS[span.kind],
+            'startTimeUnixNano': str(span.start_ns),
+            'endTimeUnixNano': str(span.end_ns),
+            'attributes': _otlp_attributes(span.attributes),
+            'status': {'code': 2, 'message': span.error} if span.error else {'code': 1}
+        }
+        if span.parent_id:
+            encoded['parentSpanId'] = span.parent_id
+        return encoded
+
+def _otlp_attributes(attributes):
+    encoded = []
+    for key, value in attributes.items():
+        if isinstance(value, bool):
+            encoded.append({'key': key, 'value': {'boolValue': value}})
+        elif isinstance(value, int):
+            encoded.append({'key': key, 'value': {'intValue': str(value)}})
+        elif isinstance(value, float):
+            encoded.append({'key': key, 'value': {'doubleValue': value}})
+        else:
+            encoded.append({'key': key, 'value': {'stringValue': str(value)}})
+    return encoded
+
+class Tracer:
+    def __init__(self):
+        self.app = None
+        self.exporter = None
+        self.sample_rate = 0.0
+        self.service_name = 'insurecontent-api'
+        self.flush_interval = 2.0
+        self.batch_size = 256
+        self.max_buffer = 10000
+        self.dropped = 0
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['tracer'] = self
+        config = app.config
+
+        exporter = config.get('TRACING_EXPORTER')
+        if exporter == 'jsonl':
+            self.exporter = JsonlExporter(config.get('TRACING_FILE') or os.path.join(
+                os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database', 'traces.jsonl'))
+        elif exporter == 'otlp':
+            self.exporter = OtlpHttpExporter(config.get('TRACING_OTLP_ENDPOINT', 'http://localhost:4318/v1/traces'))
+        elif exporter:
+            raise ValueError(f"Unknown TRACING_EXPORTER: {exporter}")
+
+        self.sample_rate = config.get('TRACING_SAMPLE_RATE', 0.1) if self.exporter else 0.0
+        self.service_name = config.get('TRACING_SERVICE_NAME', self.service_name)
+        self.flush_interval = config.get('TRACING_FLUSH_INTERVAL', self.flush_interval)
+        self.max_buffer = config.get('TRACING_MAX_BUFFER', self.max_buffer)
+
+        app.before_request(_start_request)
+        app.after_request(_finish_request)
+        app.teardown_request(_end_request)
+        if self.exporter and config.get('TRACING_DB_SPANS', True):
+            query_stats.add_listener(_record_query)
+
+    def start(self):
+        """Start the span exporter thread; until then spans stay buffered (up to TRACING_MAX_BUFFER)"""
+        if self.exporter and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='span-exporter', daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+
+    # Spans
+
+    def start_span(self, name, attributes=None, traceparent=None, kind='internal', start_ns=None):
+        """Start a span under `traceparent`, else under the current span, else as a new trace"""
+        parent = parse_traceparent(traceparent) if traceparent else None
+        if parent is not None:
+            trace_id, parent_id, sampled = parent
+            sampled = sampled and self.exporter is not None
+        else:
+            current = _current_span.get()
+            if current is not None:
+                trace_id, parent_id, sampled = current.trace_id, current.span_id, current.sampled
+            else:
+                trace_id, parent_id = os.urandom(16).hex(), None
+                sampled = bool(self.sample_rate) and random.random() < self.sample_rate
+        return Span(name, trace_id, parent_id, sampled, attributes, start_ns, kind)
+
+    def end_span(self, span, end_ns=None):
+        span.end_ns = end_ns or time.time_ns()
+        if not span.sampled or self.exporter is None:
+            return
+        with self._lock:
+            if len(self._buffer) >= self.max_buffer:
+                self.dropped += 1
+                return
+            self._buffer.append(span)
+            buffered = len(self._buffer)
+        if buffered >= self.batch_size:
+            self._wakeup.set()
+
+    @contextmanager
+    def span(self, name, attributes=None, traceparent=None, kind='internal'):
+        """Run the block inside a child span of the current one"""
+        span = self.start_span(name, attributes, traceparent, kind)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            self.end_span(span)
+
+    # Export
+
+    def flush(self):
+        """Export all buffered spans"""
+        with self._flush_lock:
+            with self._lock:
+                spans, self._buffer = self._buffer, []
+            for start in range(0, len(spans), self.batch_size):
+                try:
+                    self.exporter.export(spans[start:start + self.batch_size], self.service_name)
+                except Exception as e:
+                    logging.error(f"Error exporting spans: {str(e)}")
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+tracer = Tracer()
+
+def traced(name):
+    """Decorator running the function inside a span"""
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            with tracer.span(name):
+                return f(*args, **kwargs)
+        return wrapper
+    return decorator
+
+# Log records
+
+_base_record_factory = logging.getLogRecordFactory()
+
+def _record_factory(*args, **kwargs):
+    record = _base_record_factory(*args, **kwargs)
+    span = _current_span.get()
+    record.trace_id = span.trace_id if span is not None else '-'
+    record.span_id = span.span_id if span is not None else '-'
+    return record
+
+logging.setLogRecordFactory(_record_factory)
+
+# Request and query hooks
+
+def _start_request():
+    rule = request.url_rule.rule if request.url_rule else 'unmatched'
+    span = tracer.start_span(f"{request.method} {rule}", {
+        'http.method': request.method,
+        'http.route': rule,
+        'http.target': request.path
+    }, traceparent=request.headers.get('traceparent'), kind='server')
+    g.trace_span = span
+    g.trace_token = _current_span.set(span)
+
+def _finish_request(response):
+    span = g.get('trace_span')
+    if span is None:
+        return response
+    span.set_attribute('http.status_code', response.status_code)
+    counter = current_counter()
+    if counter is not None:
+        span.set_attribute('db.query_count', counter.count)
+        span.set_attribute('db.time_ms', round(counter.seconds * 1000, 3))
+    if response.status_code >= 500:
+        span.error = f"HTTP {response.status_code}"
+    response.headers['X-Trace-Id'] = span.trace_id
+    return response
+
+def _end_request(exc=None):
+    span = g.pop('trace_span', None)
+    if span is None:
+        return
+    if exc is not None:
+        span.record_exception(exc)
+    _current_span.reset(g.pop('trace_token'))
+    tracer.end_span(span)
+
+def _record_query(statement, elapsed):
+    current = _current_span.get()
+    if current is None or not current.sampled:
+        return
+    end_ns = time.time_ns()
+    span = Span(f"db {statement.lstrip().split(' ', 1)[0].upper()}", current.trace_id, current.span_id, True,
+                {'db.statement': ' '.join(statement.split())[:1000]}, start_ns=end_ns - int(elapsed * 1e9),
+                kind='client')
+    tracer.end_span(span, end_ns)
@@ -0,0 +1,221 @@
+import atexit
+import logging
+import threading
+from collections import namedtuple
+from datetime import datetime, date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from flask import current_app
+from sqlalchemy import func
+from src.models.insurance_models import db, APIUsage, APIUsageDaily
+from src.services.pricing import ModelUsage, cost_of, current_price_version
+
+UsageEvent = namedtuple('UsageEvent', [
+    'agent_id', 'endpoint', 'tokens_used', 'cost', 'created_at',
+    'model', 'prompt_tokens', 'completion_tokens', 'cached_tokens', 'image_size', 'image_quality', 'price_version',
+    'prompt_version'
+], defaults=(None, 0, 0, 0, None, None, None, None))
+
+# Per-event columns summed into the daily rollup
+ROLLUP_FIELDS = ('tokens_used', 'prompt_tokens', 'completion_tokens', 'cached_tokens', 'cost')
+
+class UsageRecorder:
+    """Write-behind recorder for API usage events.
+
+    Events are buffered in memory and written in batches on a background
+    thread, together with an incremental upsert into the api_usage_daily
+    rollup. Writes go through their own connection so they never share a
+    transaction with the request that produced them.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.batch_size = 100
+        self.flush_interval = 5.0
+        self.max_buffer = 10000
+        self._buffer: List[UsageEvent] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._listeners = []
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Bind the recorder to an app; until start() it writes through"""
+        self.app = app
+        self.batch_size = app.config.get('USAGE_FLUSH_BATCH_SIZE', self.batch_size)
+        self.flush_interval = app.config.get('USAGE_FLUSH_INTERVAL', self.flush_interval)
+        self.max_buffer = app.config.get('USAGE_MAX_BUFFER', self.max_buffer)
+        app.extensions['usage_recorder'] = self
+
+    def start(self):
+        """Start the background flusher if USAGE_WRITE_BEHIND is set"""
+        if self.app.config.get('USAGE_WRITE_BEHIND', True) and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='usage-recorder', daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+
+    def add_listener(self, listener):
+        """Register a callable invoked as listener(event) for every recorded event"""
+        self._listeners.append(listener)
+
+    @property
+    def pending(self) -> int:
+        """Number of buffered events not yet written"""
+        return len(self._buffer)
+
+    def record(self, agent_id: int, endpoint: str, tokens_used: int = 0, cost: float = 0.0,
+               created_at: Optional[datetime] = None, usage: Optional[ModelUsage] = None):
+        """Buffer a usage event; it is persisted by the next flush.
+
+        With `usage` (what the upstream call reported) the tokens and cost
+        are taken from it and priced with the current price table.
+        """
+        if self.app is None:
+            self.app = current_app._get_current_object()
+
+        if usage is not None:
+            price_version = current_price_version()
+            event = UsageEvent(agent_id, endpoint, usage.total_tokens, cost_of(usage, price_version),
+                               created_at or datetime.utcnow(), usage.model, usage.prompt_tokens,
+                               usage.completion_tokens, usage.cached_tokens, usage.image_size,
+                               usage.image_quality, price_version, usage.prompt_version)
+        else:
+            event = UsageEvent(agent_id, endpoint, tokens_used or 0, cost or 0.0,
+                               created_at or datetime.utcnow())
+        with self._lock:
+            self._buffer.append(event)
+            buffered = len(self._buffer)
+
+        for listener in self._listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                logging.error(f"Error in usage listener: {str(e)}")
+
+        if self._thread is None:
+            # No background flusher (tests, scripts): write through
+            self.flush()
+        elif buffered >= self.batch_size:
+            self._wakeup.set()
+
+    def flush(self) -> int:
+        """Write all buffered events and their rollups, returns the number written"""
+        with self._flush_lock:
+            with self._lock:
+                events, self._buffer = self._buffer, []
+            if not events or self.app is None:
+                return 0
+
+            try:
+                with self.app.app_context():
+                    with db.engine.begin() as conn:
+                        conn.execute(APIUsage.__table__.insert(), [e._asdict() for e in events])
+                        _upsert_daily(conn, _rollup(events))
+                return len(events)
+
+            except Exception as e:
+                logging.error(f"Error flushing API usage: {str(e)}")
+                # Keep the events for the next attempt, dropping the oldest on overflow
+                with self._lock:
+                    self._buffer = (events + self._buffer)[-self.max_buffer:]
+                return 0
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+def _rollup(events: List[UsageEvent]) -> List[Dict]:
+    """Aggregate events per (agent, endpoint, day)"""
+    totals: Dict[Tuple[int, str, date], Dict] = {}
+    for e in events:
+        key = (e.agent_id, e.endpoint, e.created_at.date())
+        bucket = totals.get(key)
+        if bucket is None:
+            bucket = totals[key] = dict.fromkeys(('request_count',) + ROLLUP_FIELDS, 0)
+        bucket['request_count'] += 1
+        for field in ROLLUP_FIELDS:
+            bucket[field] += getattr(e, field)
+
+    now = datetime.utcnow()
+    return [
+        dict(bucket, agent_id=agent_id, endpoint=endpoint, day=day, updated_at=now)
+        for (agent_id, endpoint, day), bucket in totals.items()
+    ]
+
+def _upsert_daily(conn, rows: List[Dict]):
+    """Add rollup rows onto api_usage_daily with INSERT ... ON CONFLICT DO UPDATE"""
+    table = APIUsageDaily.__table__
+    dialect = conn.dialect.name
+
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['agent_id', 'endpoint', 'day'],
+            set_=dict(
+                {field: table.c[field] + stmt.excluded[field] for field in ('request_count',) + ROLLUP_FIELDS},
+                updated_at=stmt.excluded.updated_at
+            )
+        )
+        conn.execute(stmt, rows)
+        return
+
+    # Generic fallback: update in place, insert when the row does not exist yet
+    for row in rows:
+        key = (table.c.agent_id == row['agent_id']) & (table.c.endpoint == row['endpoint']) & \
+            (table.c.day == row['day'])
+        values = {field: table.c[field] + row[field] for field in ('request_count',) + ROLLUP_FIELDS}
+        values['updated_at'] = row['updated_at']
+        result = conn.execute(table.update().where(key).values(values))
+        if result.rowcount == 0:
+            conn.execute(table.insert(), [row])
+
+def get_usage_by_model(agent_id: int, days: int = 30) -> List[Dict]:
+    """Per-model request, token and cost totals from an agent's api_usage rows of the last `days` days"""
+    since = datetime.combine(datetime.utcnow().date() - timedelta(days=days - 1), datetime.min.time())
+    rows = db.session.query(
+        APIUsage.model,
+        func.count(APIUsage.id),
+        func.coalesce(func.sum(APIUsage.prompt_tokens), 0),
+        func.coalesce(func.sum(APIUsage.completion_tokens), 0),
+        func.coalesce(func.sum(APIUsage.cached_tokens), 0),
+        func.coalesce(func.sum(APIUsage.cost), 0.0)
+    ).filter(
+        APIUsage.agent_id == agent_id,
+        APIUsage.created_at >= since
+    ).group_by(APIUsage.model).all()
+
+    return [
+        {
+            'model': model,
+            'request_count': count,
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'cached_tokens': cached_tokens,
+            'cache_hit_ratio': round(cached_tokens / prompt_tokens, 4) if prompt_tokens else None,
+            'cost': round(cost, 6)
+        }
+        for model, count, prompt_tokens, completion_tokens, cached_tokens, cost in rows
+    ]
+
+def get_daily_usage(agent_id: int, days: int = 30, endpoint: str = None) -> List[APIUsageDaily]:
+    """Read an agent's rollup rows for the last `days` days, newest first"""
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+    query = APIUsageDaily.query.filter(
+        APIUsageDaily.agent_id == agent_id,
+        APIUsageDaily.day >= since
+    )
+    if endpoint:
+        query = query.filter(APIUsageDaily.endpoint == endpoint)
+    return query.order_by(APIUsageDaily.day.desc(), APIUsageDaily.endpoint).all()
+
+usage_recorder = UsageRecorder()
@@ -0,0 +1,196 @@
+import logging
+import queue
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import exists, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
+from src.models.insurance_models import db, StripeEvent
+
+UNFINISHED_STATUSES = ('pending', 'processing')
+
+class WebhookProcessor:
+    """Applies recorded Stripe webhook events on a pool of worker threads.
+
+    The webhook endpoint only verifies an event, records it in stripe_events
+    (the event id is the primary key, so redeliveries are rejected there) and
+    hands it to submit(). Events are routed to a worker by customer id.
+
+    Every server process runs workers against the same table, so an event is
+    claimed with a compare-and-swap UPDATE (pending -> processing) before it
+    is applied, and only one process applies it. A claim is refused while an
+    older event of the same customer is unfinished, so each customer's
+    events are applied in the order they were received. A failed event is
+    put back to pending with next_attempt_at set by exponential backoff,
+    rather than sleeping on the worker; after STRIPE_WEBHOOK_MAX_ATTEMPTS it
+    is marked failed. A poller thread re-submits events whose retry is due,
+    events held back behind an older one, and events whose claim expired
+    because the claiming process died (this also covers events left over
+    from a restart). With STRIPE_WEBHOOK_WORKERS = 0 events are applied
+    inline, once; their retries wait for a process that runs workers.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.handler = None
+        self._queues = []
+        self._queued = set()  # event ids waiting in a worker queue
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['webhook_processor'] = self
+
+    def start(self):
+        """Start the STRIPE_WEBHOOK_WORKERS worker threads and the retry poller"""
+        workers = self.app.config.get('STRIPE_WEBHOOK_WORKERS', 4)
+        if workers and not self._queues:
+            for index in range(workers):
+                worker_queue = queue.Queue()
+                self._queues.append(worker_queue)
+                threading.Thread(target=self._run, args=(worker_queue,),
+                                 name=f'stripe-webhook-{index}', daemon=True).start()
+            threading.Thread(target=self._poll, args=(self.app.config.get('STRIPE_WEBHOOK_POLL_INTERVAL', 1.0),),
+                             name='stripe-webhook-poller', daemon=True).start()
+
+    def set_handler(self, handler):
+        """Set the callable that applies one event payload (a dict)"""
+        self.handler = handler
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(q.qsize() for q in self._queues)
+
+    def record(self, event_id: str, event_type: str, customer_id: str, payload: str) -> bool:
+        """Store a verified event; returns False if it was already received"""
+        try:
+            db.session.add(StripeEvent(
+                id=event_id,
+                type=event_type,
+                customer_id=customer_id,
+                payload=payload
+            ))
+            db.session.commit()
+            return True
+        except IntegrityError:
+            db.session.rollback()
+            return False
+
+    def submit(self, event_id: str, customer_id: str = None):
+        """Queue a recorded event for processing"""
+        if not self._queues:
+            self.process(event_id)
+            return
+
+        with self._lock:
+            if event_id in self._queued:
+                return
+            self._queued.add(event_id)
+        key = (customer_id or event_id).encode('utf-8')
+        self._queues[zlib.crc32(key) % len(self._queues)].put(event_id)
+
+    def claim(self, event_id: str) -> bool:
+        """Mark a due event as processing by this process; False if it is not due or already claimed"""
+        now = datetime.utcnow()
+        older = aliased(StripeEvent)
+        claimed = db.session.execute(update(StripeEvent).where(
+            StripeEvent.id == event_id,
+            db.or_(
+                db.and_(StripeEvent.status == 'pending',
+                        db.or_(StripeEvent.next_attempt_at.is_(None), StripeEvent.next_attempt_at <= now)),
+                db.and_(StripeEvent.status == 'processing', StripeEvent.next_attempt_at < now)
+            ),
+            ~exists().where(
+                older.customer_id == StripeEvent.customer_id,
+                older.received_at < StripeEvent.received_at,
+                older.status.in_(UNFINISHED_STATUSES)
+            )
+        ).values(
+            status='processing',
+            next_attempt_at=now + timedelta(seconds=current_app.config.get('STRIPE_WEBHOOK_CLAIM_TIMEOUT', 60))
+        )).rowcount
+        db.session.commit()
+        return bool(claimed)
+
+    def process(self, event_id: str) -> bool:
+        """Claim and apply one event; returns True if it was processed now.
+
+        A failure schedules the next attempt instead of waiting for it.
+        """
+        if not self.claim(event_id):
+            return False
+        event = StripeEvent.query.get(event_id)
+
+        try:
+            self.handler(event.get_payload())
+            event.attempts += 1
+            event.status = 'processed'
+            event.last_error = None
+            event.next_attempt_at = None
+            event.processed_at = datetime.utcnow()
+            db.session.commit()
+            return True
+
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f"Error processing Stripe event {event_id}: {str(e)}")
+
+            config = current_app.config
+            max_attempts = config.get('STRIPE_WEBHOOK_MAX_ATTEMPTS', 5)
+            backoff = config.get('STRIPE_WEBHOOK_RETRY_BACKOFF', 1.0)
+
+            event = StripeEvent.query.get(event_id)
+            event.attempts += 1
+            event.last_error = str(e)
+            if event.attempts >= max_attempts:
+                event.status = 'failed'
+                event.next_attempt_at = None
+                logging.error(f"Giving up on Stripe event {event_id} after {event.attempts} attempts")
+            else:
+                event.status = 'pending'
+                event.next_attempt_at = datetime.utcnow() + timedelta(
+                    seconds=min(backoff * 2 ** (event.attempts - 1), 60))
+            db.session.commit()
+            return False
+
+    def submit_due(self, limit: int = 500) -> int:
+        """Submit unfinished events that are due: retries, held-back events and expired claims"""
+        now = datetime.utcnow()
+        due = db.session.query(StripeEvent.id, StripeEvent.customer_id).filter(db.or_(
+            db.and_(StripeEvent.status == 'pending',
+                    db.or_(StripeEvent.next_attempt_at.is_(None), StripeEvent.next_attempt_at <= now)),
+            db.and_(StripeEvent.status == 'processing', StripeEvent.next_attempt_at < now)
+        )).order_by(StripeEvent.received_at).limit(limit).all()
+        db.session.commit()
+
+        for event_id, customer_id in due:
+            self.submit(event_id, customer_id)
+        return len(due)
+
+    def _run(self, worker_queue):
+        while True:
+            event_id = worker_queue.get()
+            with self._lock:
+                self._queued.discard(event_id)
+            try:
+                with self.app.app_context():
+                    self.process(event_id)
+            except Exception as e:
+                logging.error(f"Stripe webhook worker error: {str(e)}")
+            finally:
+                worker_queue.task_done()
+
+    def _poll(self, interval):
+        while True:
+            try:
+                with self.app.app_context():
+                    self.submit_due()
+            except Exception as e:
+                logging.error(f"Error submitting due Stripe events: {str(e)}")
+            time.sleep(interval)
+
+webhook_processor = WebhookProcessor()
@@ -0,0 +1,44 @@
+"""Background job worker process.
+
+Claims and runs jobs from the jobs table (see services/job_queue.py). With
+JOB_QUEUE_MODE = 'worker' the web servers only enqueue jobs; run as many of
+these as needed next to them, from insurance_content_api/:
+
+    JOB_QUEUE_MODE=worker python -m src.worker --threads 4
+
+On SIGTERM/SIGINT the worker stops claiming jobs and waits for running ones;
+a worker that is killed outright loses nothing, since its jobs are claimed
+again once their visibility timeout passes.
+"""
+import argparse
+import logging
+import signal
+import threading
+
+from src.app import create_app, start_background_services
+from src.services.job_queue import job_queue
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--config', default=None, help='config name (default: FLASK_CONFIG or default)')
+    parser.add_argument('--threads', type=int, default=None, help='worker threads (default: JOB_WORKER_THREADS)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s [%(trace_id)s] %(message)s')
+    app = create_app(args.config)
+    threads = args.threads or app.config.get('JOB_WORKER_THREADS', 2)
+
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+    signal.signal(signal.SIGINT, lambda *_: stopping.set())
+
+    job_queue.start(threads)
+    start_background_services(app)
+    logging.info(f"Job worker {job_queue.worker_id} running with {threads} threads")
+    stopping.wait()
+
+    logging.info("Stopping job worker, waiting for running jobs")
+    job_queue.stop()
+
+if __name__ == '__main__':
+    main()
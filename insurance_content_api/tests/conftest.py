@@ -0,0 +1,65 @@
+import os
+import sys
+from datetime import date, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.app import create_app
+from src.models.insurance_models import db, Agent, ContentSchedule, SocialMediaPost, ToneType, InsuranceType
+from src.services.agent_cache import agent_cache
+from src.services.pricing import ModelUsage
+from src.services.quota import quota_tracker
+from src.services.ai_service import AIContentService
+
+@pytest.fixture
+def app():
+    app = create_app('testing')
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.drop_all()
+    agent_cache.clear()
+    quota_tracker.reset()
+
+@pytest.fixture
+def client(app):
+    """Test client logged in as a newly registered (trial) agent"""
+    client = app.test_client()
+    response = client.post('/api/auth/register', json={
+        'email': 'agent@example.com',
+        'password': 'correct-horse-1',
+        'first_name': 'Test',
+        'last_name': 'Agent'
+    })
+    assert response.status_code == 201, response.get_json()
+    return client
+
+@pytest.fixture
+def schedules(client):
+    """Four weekly schedules of seven posts each for the logged-in agent, without images"""
+    agent = Agent.query.filter_by(email='agent@example.com').one()
+    created = []
+    for week in range(4):
+        start = date(2025, 1, 6) + timedelta(weeks=week)
+        schedule = ContentSchedule(agent_id=agent.id, week_start_date=start, week_end_date=start + timedelta(days=6),
+                                   tone=ToneType.PROFESSIONAL)
+        schedule.set_insurance_types([InsuranceType.FINAL_EXPENSE.value])
+        db.session.add(schedule)
+        db.session.flush()
+        for day in range(7):
+            db.session.add(SocialMediaPost(schedule_id=schedule.id, post_date=start + timedelta(days=day),
+                                           post_text=f'Post {day + 1}', image_description='A family at home',
+                                           insurance_type_focus=InsuranceType.FINAL_EXPENSE))
+        created.append(schedule)
+    db.session.commit()
+    return created
+
+@pytest.fixture
+def fake_images(monkeypatch):
+    """Image generation without calling OpenAI"""
+    def generate_image_for_post(self, post_text, image_description, insurance_type=None):
+        return 'https://images.example.com/post.png', ModelUsage(model='dall-e-3', image_count=1,
+                                                                 image_size='1024x1024', image_quality='standard')
+    monkeypatch.setattr(AIContentService, 'generate_image_for_post', generate_image_for_post)
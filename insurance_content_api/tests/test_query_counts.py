@@ -0,0 +1,47 @@
+"""Query budgets for the schedule and image routes, to catch N+1 regressions.
+
+The read routes must not depend on how many schedules or posts exist. The
+bulk image route runs its job inline under the testing config, so it has
+a fixed part plus a budget per generated image (the image write, the
+usage rows, written through without the background flusher, and the job
+progress update).
+"""
+from src.services.query_stats import assert_max_queries
+
+def test_list_schedules(client, schedules):
+    with assert_max_queries(3):
+        response = client.get('/api/content/schedules')
+
+    assert response.status_code == 200
+    assert len(response.get_json()['schedules']) == len(schedules)
+
+def test_get_schedule(client, schedules):
+    with assert_max_queries(4):
+        response = client.get(f'/api/content/schedules/{schedules[0].id}')
+
+    assert response.status_code == 200
+    assert len(response.get_json()['schedule']['posts']) == 7
+
+def test_generate_image(client, schedules, fake_images):
+    post_id = schedules[0].posts[0].id
+    with assert_max_queries(6):
+        response = client.post(f'/api/images/generate-image/{post_id}')
+
+    assert response.status_code == 200, response.get_json()
+
+def test_regenerate_image(client, schedules, fake_images):
+    post_id = schedules[0].posts[0].id
+    with assert_max_queries(6):
+        response = client.post(f'/api/images/regenerate-image/{post_id}', json={'image_description': 'A porch'})
+
+    assert response.status_code == 200, response.get_json()
+
+def test_generate_all_images(client, schedules, fake_images):
+    posts = len(schedules[0].posts)
+    with assert_max_queries(14 + 6 * posts):
+        response = client.post(f'/api/images/generate-all-images/{schedules[0].id}')
+
+    assert response.status_code == 202, response.get_json()
+    job = response.get_json()['job']
+    assert job['status'] == 'succeeded'
+    assert len(job['result']['generated_images']) == posts